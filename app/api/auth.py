@@ -127,7 +127,6 @@ class APIKeyMiddleware(BaseHTTPMiddleware):
 def _get_tenant(api_key: str):
     try:
         from app.services.tenant import TenantService
-        ts = TenantService()
-        return ts.get_tenant(api_key)
+        return TenantService().get_tenant_cached(api_key)
     except Exception:
         return None
@@ -21,9 +21,7 @@ logger = logging.getLogger(__name__)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     from app.config import settings
-    from app.services.storage import StorageService
-    from app.services.tenant import TenantService
-    from app.services.analytics import AnalyticsService
+    from app.services import migrations
     from app.services.scheduler import start_scheduler, stop_scheduler
 
     logger.info("=" * 55)
@@ -39,12 +37,21 @@ async def lifespan(app: FastAPI):
     logger.info(f"  OpenAI:       {'OK' if settings.openai_api_key else 'not configured'}")
     logger.info("=" * 55)
 
-    # Init all storage tables
-    StorageService()
-    TenantService()
-    AnalyticsService()
-    from app.services.citation_tracker import CitationService
-    CitationService()  # creates citation_queries + citation_results tables
+    # Create / upgrade all tables once, before serving traffic
+    migrations.run_all()
+    migrations.start_online_migrations()
+
+    # Batched writer for /api/v1/analytics/event
+    from app.services.analytics_ingest import get_ingest_queue
+    await get_ingest_queue().start()
+
+    # In-memory sliding-window counters for /api/v1/analytics/{domain}/live
+    from app.services.analytics_live import get_live_counters
+    get_live_counters().rebuild()
+
+    # Ingestion worker pool — also resumes jobs interrupted by the last shutdown
+    from app.services.job_queue import get_job_queue
+    await get_job_queue().start()
 
     # Start auto-refresh scheduler
     start_scheduler()
@@ -52,6 +59,14 @@ async def lifespan(app: FastAPI):
     yield
 
     stop_scheduler()
+    await get_job_queue().stop()
+    await get_ingest_queue().stop()
+    migrations.stop_online_migrations()
+
+    from app.services.usage_buffer import stop_all as flush_usage
+    from app.services.db import close_all
+    flush_usage()
+    close_all()
     logger.info("Galuli shut down")
 
 
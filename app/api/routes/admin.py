@@ -1,9 +1,10 @@
 import logging
-from fastapi import APIRouter, HTTPException, BackgroundTasks, Request
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
 
 from app.services.storage import StorageService
-from app.api.routes.ingest import _run_ingestion_pipeline
+from app.services.job_events import get_job_events
+from app.services.job_queue import get_job_queue
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -15,11 +16,11 @@ class RefreshRequest(BaseModel):
 
 
 @router.post("/refresh", summary="Trigger re-crawl for a domain")
-async def refresh_registry(req: RefreshRequest, background_tasks: BackgroundTasks):
+async def refresh_registry(req: RefreshRequest):
     """Re-crawl and update the registry for an existing domain."""
     import uuid
     from datetime import datetime
-    from app.models.jobs import IngestJob, JobStatus
+    from app.models.jobs import IngestJob
     from app.config import settings
 
     domain = req.domain.replace("www.", "").lower().strip()
@@ -33,24 +34,15 @@ async def refresh_registry(req: RefreshRequest, background_tasks: BackgroundTask
         job_id=job_id,
         domain=domain,
         url=url,
-        status=JobStatus.PENDING,
         created_at=datetime.utcnow(),
     )
-    storage.save_job(job)
-
-    background_tasks.add_task(
-        _run_ingestion_pipeline,
-        job_id=job_id,
-        url=url,
-        domain=domain,
-        use_playwright=False,
-    )
+    queued = get_job_queue().enqueue(job, "ingest", {"use_playwright": False})
 
     return {
-        "job_id": job_id,
+        "job_id": queued.job_id,
         "domain": domain,
-        "status": "refresh_queued",
-        "poll_url": f"{settings.base_api_url}/api/v1/jobs/{job_id}",
+        "status": "refresh_queued" if queued.job_id == job_id else "refresh_in_progress",
+        "poll_url": f"{settings.base_api_url}/api/v1/jobs/{queued.job_id}",
     }
 
 
@@ -101,8 +93,23 @@ async def get_stats():
         s = j.get("status", "unknown")
         job_counts[s] = job_counts.get(s, 0) + 1
 
+    from app.services.usage_buffer import all_stats as usage_buffer_stats
+    from app.services.analytics_ingest import get_ingest_queue
+    from app.services.analytics import get_dashboard_cache
+    from app.services.analytics_live import get_live_counters
+    from app.services.llm_cache import get_llm_cache
+    from app.services.scheduler import refresh_stats
+
     return {
         "registries_indexed": len(registries),
         "jobs": job_counts,
         "recent_domains": [r["domain"] for r in registries[:10]],
+        "usage_buffer": usage_buffer_stats(),
+        "analytics_ingest": get_ingest_queue().stats(),
+        "analytics_dashboard_cache": get_dashboard_cache().stats(),
+        "analytics_live": get_live_counters().stats(),
+        "llm_cache": get_llm_cache().stats(),
+        "job_queue": get_job_queue().stats(),
+        "job_events": get_job_events().stats(),
+        "auto_refresh": refresh_stats(),
     }
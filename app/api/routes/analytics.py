@@ -5,6 +5,10 @@ POST /api/v1/analytics/event              ← AI agent hit events from snippet
 GET  /api/v1/analytics/{domain}           ← customer dashboard data
 GET  /api/v1/analytics/{domain}/agents    ← agent breakdown
 GET  /api/v1/analytics/{domain}/pages     ← per-page breakdown
+GET  /api/v1/analytics/{domain}/dashboard ← all dashboard views in one response (cached)
+GET  /api/v1/analytics/{domain}/live      ← hits in the last 5m / 1h / 24h from in-memory counters
+GET  /api/v1/analytics/{domain}/export    ← raw hits as streamed NDJSON / CSV (Agency)
+GET  /api/v1/analytics/attention/bulk     ← AI Attention Score for every domain, ranked (admin)
 
 Sprint 1 — AI Analytics ROI Engine:
 GET  /api/v1/analytics/{domain}/topics        ← topic-level AI attention map
@@ -14,16 +18,75 @@ GET  /api/v1/analytics/{domain}/agent-trend   ← daily trend for a specific age
 """
 import logging
 from fastapi import APIRouter, Request, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime
 
-from app.services.analytics import AnalyticsService
+from app.services.analytics import AnalyticsService, EXPORT_FORMATS, _to_epoch
+from app.services.analytics_ingest import get_ingest_queue
+from app.services.analytics_live import get_live_counters
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 analytics = AnalyticsService()
 
+# Unique page / agent counts are HyperLogLog estimates by default
+_EXACT = Query(False, description="Exact distinct counts (slower on large domains)")
+# Single-domain views are small enough to count exactly, which keeps their
+# unique_pages in line with /{domain}/agents and the dashboard bundle
+_EXACT_DOMAIN = Query(True, description="Exact distinct counts; false = HyperLogLog estimates")
+
+
+_EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def _require_admin(request: Request):
+    """Cross-tenant views = master key only; tenant keys are refused even in dev mode."""
+    from app.config import settings
+    api_key = getattr(request.state, "api_key", "")
+    tenant = getattr(request.state, "tenant", None)
+    if tenant is not None or (settings.registry_api_key and api_key != settings.registry_api_key):
+        raise HTTPException(status_code=403, detail="Admin key required for this operation")
+
+
+def _require_agency(request: Request, domain: str):
+    """
+    Raw export is an Agency / Enterprise feature, and only for the tenant's
+    own domains; the master key bypasses both checks.
+    """
+    tenant = getattr(request.state, "tenant", None)
+    api_key = getattr(request.state, "api_key", None)
+    if not tenant and api_key:
+        return
+    if not tenant:
+        raise HTTPException(
+            status_code=403,
+            detail="Authentication required. Add your API key via X-API-Key header.",
+        )
+    if tenant.plan not in ("agency", "enterprise"):
+        raise HTTPException(
+            status_code=403,
+            detail="Raw analytics export requires an Agency plan. Upgrade at galuli.io/dashboard/#settings",
+        )
+    from app.services.tenant import TenantService
+    own = {d.replace("www.", "").lower().strip() for d in TenantService().get_tenant_domains(tenant.api_key)}
+    if domain not in own:
+        raise HTTPException(status_code=403, detail=f"'{domain}' is not registered to this account")
+
+
+def _parse_ts(value: Optional[str], name: str) -> Optional[int]:
+    """ISO-8601 (naive = UTC) or epoch seconds → epoch seconds; 400 if neither."""
+    if value is None:
+        return None
+    if value.isdigit():
+        return int(value)
+    try:
+        datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid '{name}': expected ISO-8601 or epoch seconds")
+    return _to_epoch(value)
+
 
 class AgentEventPayload(BaseModel):
     domain: str
@@ -37,24 +100,57 @@ class AgentEventPayload(BaseModel):
 
 @router.post("/event", summary="Log an AI agent hit event")
 async def log_event(payload: AgentEventPayload, request: Request):
-    """Called by the galui.js snippet when an AI agent is detected."""
-    analytics.record_event(
-        domain=payload.domain,
-        page_url=payload.page_url,
-        agent_name=payload.agent_name,
-        agent_type=payload.agent_type,
-        user_agent=payload.user_agent,
-        referrer=payload.referrer,
-        ts=payload.ts or datetime.utcnow().isoformat(),
-    )
-    return {"ok": True}
+    """
+    Called by the galui.js snippet when an AI agent is detected.
+    Only enqueues — the ingest queue writes events to SQLite in batches.
+    """
+    event = {
+        "domain": payload.domain,
+        "page_url": payload.page_url,
+        "agent_name": payload.agent_name,
+        "agent_type": payload.agent_type,
+        "user_agent": payload.user_agent,
+        "referrer": payload.referrer,
+        "ts": payload.ts or datetime.utcnow().isoformat(),
+    }
+    queue = get_ingest_queue()
+    if not queue.running:
+        # Writer not started (e.g. app run without lifespan) — write inline
+        accepted = analytics.record_events([event]) > 0
+        response = {"ok": True}
+    else:
+        accepted = await queue.enqueue(event)
+        response = {"ok": True, "queued": accepted}
+    if accepted:
+        get_live_counters().record(
+            payload.domain, payload.agent_name, payload.agent_type, _to_epoch(event["ts"])
+        )
+    return response
+
+
+@router.get("/attention/bulk", summary="AI Attention Score for every domain (admin)")
+async def get_bulk_attention_scores(
+    request: Request,
+    days: int = 30,
+    exact: bool = _EXACT,
+    limit: Optional[int] = Query(None, ge=1, description="Top N domains by score"),
+    live: bool = Query(False, description="Recompute now instead of serving the last materialized scores"),
+):
+    """
+    Every domain's AI Attention Score, best first — each entry shaped like
+    /{domain}/attention. Served from the periodically materialized table
+    when it covers `days` (approximate counts); otherwise computed in one pass.
+    Ranks every customer's domains, so it needs the admin key.
+    """
+    _require_admin(request)
+    return analytics.get_bulk_attention_scores(days=days, exact=exact, limit=limit, live=live)
 
 
 @router.get("/{domain}", summary="Analytics summary for a domain")
-async def get_analytics(domain: str, days: int = 30):
+async def get_analytics(domain: str, days: int = 30, exact: bool = _EXACT):
     """Full analytics summary: agent hits, top pages, trends."""
     domain = domain.replace("www.", "").lower().strip()
-    data = analytics.get_summary(domain, days=days)
+    data = analytics.get_summary(domain, days=days, exact=exact)
     if not data:
         raise HTTPException(status_code=404, detail=f"No analytics for '{domain}'")
     return data
@@ -74,6 +170,59 @@ async def get_pages(domain: str, days: int = 30):
     return analytics.get_page_breakdown(domain, days=days)
 
 
+@router.get("/{domain}/dashboard", summary="All dashboard views in one response")
+async def get_dashboard(domain: str, days: int = 30):
+    """
+    Summary, agents, pages, topics, attention and llm-depth in one payload —
+    each keyed the same as its standalone endpoint's response. Computed from
+    a single scan of the window and cached briefly.
+    """
+    domain = domain.replace("www.", "").lower().strip()
+    return analytics.get_dashboard(domain, days=days)
+
+
+@router.get("/{domain}/live", summary="Live AI agent activity (last 5m / 1h / 24h)")
+async def get_live(domain: str):
+    """
+    Hit counts, hits per minute and last-seen times over sliding windows,
+    overall and per agent — read from in-process counters, no database scan.
+    """
+    domain = domain.replace("www.", "").lower().strip()
+    return get_live_counters().snapshot(domain)
+
+
+@router.get("/{domain}/export", summary="Stream raw AI agent hits (NDJSON or CSV)")
+async def export_events(
+    domain: str,
+    request: Request,
+    format: str = Query("ndjson", description="ndjson | csv"),
+    start: Optional[str] = Query(None, description="Inclusive lower bound (ISO-8601 or epoch seconds)"),
+    end: Optional[str] = Query(None, description="Exclusive upper bound (ISO-8601 or epoch seconds)"),
+    agent: Optional[str] = Query(None, description="Only this agent, e.g. GPTBot"),
+):
+    """
+    Every recorded hit in the range, oldest first. Streamed in fixed-size
+    chunks straight from the database — suitable for millions of rows.
+
+    Hits still waiting in the legacy agent_events table for the background
+    copy are not included; while any remain for the domain the response
+    carries X-Export-Complete: false and X-Export-Pending-Rows.
+    """
+    domain = domain.replace("www.", "").lower().strip()
+    _require_agency(request, domain)
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    headers = {"Content-Disposition": f'attachment; filename="{domain}-ai-hits.{format}"'}
+    pending = analytics.legacy_pending_count(domain)
+    headers["X-Export-Complete"] = "false" if pending else "true"
+    if pending:
+        headers["X-Export-Pending-Rows"] = str(pending)
+    rows = analytics.export_events(
+        domain, fmt=format, start=_parse_ts(start, "start"), end=_parse_ts(end, "end"), agent_name=agent,
+    )
+    return StreamingResponse(rows, media_type=_EXPORT_MEDIA_TYPES[format], headers=headers)
+
+
 # ── Sprint 1: AI Analytics ROI Engine ─────────────────────────────────────────
 
 @router.get("/{domain}/topics", summary="AI Attention by content topic")
@@ -89,7 +238,7 @@ async def get_topics(domain: str, days: int = 30):
 
 
 @router.get("/{domain}/attention", summary="AI Attention Score (0-100)")
-async def get_attention_score(domain: str, days: int = 30):
+async def get_attention_score(domain: str, days: int = 30, exact: bool = _EXACT_DOMAIN):
     """
     AI Attention Score — composite 0-100 metric.
 
@@ -102,11 +251,11 @@ async def get_attention_score(domain: str, days: int = 30):
     Benchmarks: 500 hits/30d, 20+ unique pages = score 100.
     """
     domain = domain.replace("www.", "").lower().strip()
-    return analytics.get_ai_attention_score(domain, days=days)
+    return analytics.get_ai_attention_score(domain, days=days, exact=exact)
 
 
 @router.get("/{domain}/llm-depth", summary="Per-LLM crawl depth analysis")
-async def get_llm_depth(domain: str, days: int = 30):
+async def get_llm_depth(domain: str, days: int = 30, exact: bool = _EXACT_DOMAIN):
     """
     Per-LLM crawl depth and trend.
 
@@ -114,7 +263,7 @@ async def get_llm_depth(domain: str, days: int = 30):
     first/last seen, and whether attention is growing or declining.
     """
     domain = domain.replace("www.", "").lower().strip()
-    return analytics.get_per_llm_depth(domain, days=days)
+    return analytics.get_per_llm_depth(domain, days=days, exact=exact)
 
 
 @router.get("/{domain}/agent-trend", summary="Daily trend for a specific AI agent")
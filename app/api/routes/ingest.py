@@ -1,13 +1,18 @@
+import asyncio
+import json
 import uuid
 import logging
 from datetime import datetime
 from urllib.parse import urlparse
 
-from fastapi import APIRouter, BackgroundTasks, HTTPException
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 from app.models.jobs import IngestJob, JobStatus
-from app.services.crawler import CrawlerService
+from app.services.crawler import CrawlerService, content_fingerprint
+from app.services.job_events import TERMINAL_EVENTS, get_job_events, publish_status
+from app.services.job_queue import get_job_queue
 from app.services.comprehension import ComprehensionService
 from app.services.registry_builder import RegistryBuilder, calculate_confidence
 from app.services.storage import StorageService
@@ -21,6 +26,8 @@ storage = StorageService()
 comprehension_service = ComprehensionService()
 registry_builder = RegistryBuilder()
 
+_TERMINAL = (JobStatus.COMPLETE, JobStatus.FAILED)
+
 
 class IngestRequest(BaseModel):
     url: str
@@ -36,6 +43,7 @@ class IngestResponse(BaseModel):
     message: str
     registry_url: str
     poll_url: str
+    events_url: str
 
 
 def _parse_domain(url: str) -> str:
@@ -47,12 +55,12 @@ def _parse_domain(url: str) -> str:
 
 
 @router.post("/ingest", response_model=IngestResponse)
-async def ingest_url(req: IngestRequest, background_tasks: BackgroundTasks):
+async def ingest_url(req: IngestRequest):
     """
     Trigger async ingestion of a domain.
 
     Returns immediately with job_id.
-    Poll GET /api/v1/jobs/{job_id} for status.
+    Follow GET /api/v1/jobs/{job_id}/events (SSE), or poll GET /api/v1/jobs/{job_id}.
     Full registry at GET /registry/{domain} when status=complete.
     """
     from app.config import settings
@@ -72,6 +80,7 @@ async def ingest_url(req: IngestRequest, background_tasks: BackgroundTasks):
                 message="Registry already exists. Use force_refresh=true to re-crawl.",
                 registry_url=f"{settings.base_api_url}/registry/{domain}",
                 poll_url=f"{settings.base_api_url}/api/v1/jobs/cached",
+                events_url=f"{settings.base_api_url}/api/v1/jobs/cached/events",
             )
 
     job_id = f"job_{uuid.uuid4().hex[:12]}"
@@ -79,27 +88,25 @@ async def ingest_url(req: IngestRequest, background_tasks: BackgroundTasks):
         job_id=job_id,
         domain=domain,
         url=req.url if req.url.startswith("http") else f"https://{req.url}",
-        status=JobStatus.PENDING,
         created_at=datetime.utcnow(),
     )
-    storage.save_job(job)
-
-    background_tasks.add_task(
-        _run_ingestion_pipeline,
-        job_id=job_id,
-        url=job.url,
-        domain=domain,
-        use_playwright=req.use_playwright,
-        max_pages=req.max_pages or None,
-    )
+    queued = get_job_queue().enqueue(job, "ingest", {
+        "use_playwright": req.use_playwright,
+        "max_pages": req.max_pages or None,
+    })
+    if queued.job_id != job_id:
+        message = "Ingestion already in progress for this domain. Poll poll_url for status updates."
+    else:
+        message = "Ingestion queued. Poll poll_url for status updates."
 
     return IngestResponse(
-        job_id=job_id,
+        job_id=queued.job_id,
         domain=domain,
-        status="pending",
-        message="Ingestion started. Poll poll_url for status updates.",
+        status=queued.status.value,
+        message=message,
         registry_url=f"{settings.base_api_url}/registry/{domain}",
-        poll_url=f"{settings.base_api_url}/api/v1/jobs/{job_id}",
+        poll_url=f"{settings.base_api_url}/api/v1/jobs/{queued.job_id}",
+        events_url=f"{settings.base_api_url}/api/v1/jobs/{queued.job_id}/events",
     )
 
 
@@ -115,103 +122,165 @@ async def get_job_status(job_id: str):
     return job
 
 
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """
+    Server-Sent Events for one job: a `snapshot` of the job row, then
+    `claimed`, `stage` / `stage_done` (with duration_ms), `retry`, `status`
+    and `crawled` (page count) as they happen, ending with `complete` or
+    `failed`. Replaces polling GET /jobs/{job_id}.
+    """
+    from app.config import settings
+
+    if job_id == "cached":
+        return StreamingResponse(
+            iter([_sse("complete", {"job_id": "cached", "type": "complete"})]),
+            media_type="text/event-stream",
+        )
+    job = storage.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        status = job.status
+        yield _sse("snapshot", job.model_dump(mode="json"))
+        if status in _TERMINAL:
+            return
+        async for event in get_job_events().stream(job_id, settings.job_events_idle_seconds):
+            if event is not None:
+                yield _sse(event["type"], event)
+                if event["type"] in TERMINAL_EVENTS:
+                    return
+                continue
+            # Idle: the job may be running in another process — check its row
+            current = await asyncio.to_thread(storage.get_job, job_id)
+            if current is None:
+                return
+            if current.status != status:
+                status = current.status
+                yield _sse("status", {"job_id": job_id, "type": "status", "status": status.value,
+                                      "pages_crawled": current.pages_crawled})
+            if status in _TERMINAL:
+                yield _sse(status.value, {"job_id": job_id, "type": status.value, "error": current.error})
+                return
+            yield ": keepalive\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/jobs")
 async def list_jobs(limit: int = 20):
     """List recent ingestion jobs."""
     return {"jobs": storage.list_jobs(limit=limit)}
 
 
-async def _run_ingestion_pipeline(
-    job_id: str, url: str, domain: str, use_playwright: bool, max_pages: int = None
-):
-    """
-    Background pipeline: Crawl → Comprehend → Build → Store
+def _checkpoint(job: IngestJob):
+    """Persist the job and publish its status to /jobs/{job_id}/events subscribers."""
+    storage.save_job(job)
+    publish_status(job)
+
 
-    Each stage updates job status. Failures are caught and recorded.
+async def _run_ingestion_pipeline(job: IngestJob, payload: dict):
     """
-    job = storage.get_job(job_id)
-    if not job:
-        logger.error(f"Job {job_id} not found at pipeline start")
-        return
+    Job queue handler (kind "ingest"): Crawl → Comprehend → Build → Store
 
+    Each stage updates job status; crawl, comprehension and storage are
+    retried on their own by the queue. A stage that keeps failing fails the
+    job — the queue records the error.
+    """
     from app.config import settings
 
-    try:
-        # Stage 1: Crawl
-        logger.info(f"[{job_id}] Stage 1: crawling {url}")
-        job.status = JobStatus.CRAWLING
-        storage.save_job(job)
+    queue = get_job_queue()
+    job_id, url, domain = job.job_id, job.url, job.domain
 
-        crawler = CrawlerService(use_playwright=use_playwright, max_pages=max_pages)
-        crawl_result = await crawler.crawl(url)
-        job.pages_crawled = crawl_result.total_pages
-        logger.info(f"[{job_id}] Crawled {crawl_result.total_pages} pages")
+    # Stage 1: Crawl
+    logger.info(f"[{job_id}] Stage 1: crawling {url}")
+    job.status = JobStatus.CRAWLING
+    _checkpoint(job)
 
-        if crawl_result.total_pages == 0:
+    async def crawl():
+        crawler = CrawlerService(
+            use_playwright=payload.get("use_playwright", False),
+            max_pages=payload.get("max_pages"),
+        )
+        result = await crawler.crawl(url)
+        if result.total_pages == 0:
             raise ValueError("Crawler returned zero pages — site may be unreachable or JS-only")
+        return result
 
-        # Stage 1b: Robots.txt + Schema.org audit (parallel with crawl data)
-        logger.info(f"[{job_id}] Stage 1b: robots.txt + schema audit")
-        robots_result = {}
-        schema_result = {}
-        try:
-            robots_checker = RobotsChecker()
-            schema_checker = SchemaChecker()
-            import asyncio
-            robots_result, schema_result = await asyncio.gather(
-                robots_checker.check(domain),
-                schema_checker.check(domain),
-                return_exceptions=True,
-            )
-            if isinstance(robots_result, Exception):
-                logger.warning(f"[{job_id}] robots check failed: {robots_result}")
-                robots_result = {}
-            if isinstance(schema_result, Exception):
-                logger.warning(f"[{job_id}] schema check failed: {schema_result}")
-                schema_result = {}
-        except Exception as e:
-            logger.warning(f"[{job_id}] robots/schema audit error: {e}")
-
-        # Stage 2: Comprehend
-        logger.info(f"[{job_id}] Stage 2: comprehension (4 LLM passes)")
-        job.status = JobStatus.COMPREHENDING
-        storage.save_job(job)
-
-        raw = await comprehension_service.extract(crawl_result)
-
-        # Stage 3: Build registry
-        logger.info(f"[{job_id}] Stage 3: building registry schema")
-        confidence = calculate_confidence(raw)
-        registry = registry_builder.build(
-            domain=domain,
-            raw=raw,
-            confidence_score=confidence,
-            base_api_url=settings.base_api_url,
-            robots_result=robots_result,
-            schema_result=schema_result,
+    crawl_result = await queue.run_stage(job, "crawl", crawl)
+    job.pages_crawled = crawl_result.total_pages
+    logger.info(f"[{job_id}] Crawled {crawl_result.total_pages} pages")
+    get_job_events().publish(job_id, "crawled", pages_crawled=crawl_result.total_pages)
+
+    # Stage 1b: Robots.txt + Schema.org audit (parallel with crawl data)
+    logger.info(f"[{job_id}] Stage 1b: robots.txt + schema audit")
+    robots_result = {}
+    schema_result = {}
+    try:
+        robots_checker = RobotsChecker()
+        schema_checker = SchemaChecker()
+        robots_result, schema_result = await asyncio.gather(
+            robots_checker.check(domain),
+            schema_checker.check(domain),
+            return_exceptions=True,
         )
+        if isinstance(robots_result, Exception):
+            logger.warning(f"[{job_id}] robots check failed: {robots_result}")
+            robots_result = {}
+        if isinstance(schema_result, Exception):
+            logger.warning(f"[{job_id}] schema check failed: {schema_result}")
+            schema_result = {}
+    except Exception as e:
+        logger.warning(f"[{job_id}] robots/schema audit error: {e}")
 
-        # Stage 4: Store
-        logger.info(f"[{job_id}] Stage 4: storing registry")
-        job.status = JobStatus.STORING
-        storage.save_job(job)
+    # Stage 2: Comprehend
+    logger.info(f"[{job_id}] Stage 2: comprehension (4 LLM passes)")
+    job.status = JobStatus.COMPREHENDING
+    _checkpoint(job)
 
-        storage.save_registry(registry)
+    raw = await queue.run_stage(job, "comprehend", comprehension_service.extract, crawl_result, job_id=job_id)
+    job.boilerplate_bytes_removed = raw.get("boilerplate_bytes_removed", 0)
 
-        # Done
-        job.status = JobStatus.COMPLETE
-        job.completed_at = datetime.utcnow()
-        job.confidence_score = confidence
-        storage.save_job(job)
+    # Stage 3: Build registry
+    logger.info(f"[{job_id}] Stage 3: building registry schema")
+    confidence = calculate_confidence(raw)
+    registry = registry_builder.build(
+        domain=domain,
+        raw=raw,
+        confidence_score=confidence,
+        base_api_url=settings.base_api_url,
+        robots_result=robots_result,
+        schema_result=schema_result,
+    )
 
-        logger.info(
-            f"[{job_id}] Complete: {domain} | "
-            f"pages={crawl_result.total_pages} | confidence={confidence}"
-        )
+    # Stage 4: Store
+    logger.info(f"[{job_id}] Stage 4: storing registry")
+    job.status = JobStatus.STORING
+    _checkpoint(job)
 
-    except Exception as e:
-        logger.error(f"[{job_id}] Pipeline failed for {domain}: {e}", exc_info=True)
-        job.status = JobStatus.FAILED
-        job.error = str(e)
-        job.completed_at = datetime.utcnow()
-        storage.save_job(job)
+    await queue.run_stage(job, "store", storage.save_registry, registry)
+    # On-demand ingests restart the refresh clock; only scheduled refreshes adapt the interval
+    storage.record_crawl(domain, content_fingerprint(crawl_result.pages), adapt=False)
+
+    # Done
+    job.status = JobStatus.COMPLETE
+    job.completed_at = datetime.utcnow()
+    job.confidence_score = confidence
+    _checkpoint(job)
+
+    logger.info(
+        f"[{job_id}] Complete: {domain} | "
+        f"pages={crawl_result.total_pages} | confidence={confidence}"
+    )
+
+
+get_job_queue().register_handler("ingest", _run_ingestion_pipeline)
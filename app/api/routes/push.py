@@ -9,13 +9,17 @@ Score/badge endpoints live in score.py (prefix /api/v1/score).
 """
 import hashlib
 import logging
+import uuid
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
-from fastapi import APIRouter, BackgroundTasks, HTTPException
+from fastapi import APIRouter, HTTPException
 from fastapi.responses import Response
 from pydantic import BaseModel
 
+from app.api.routes.ingest import _checkpoint
+from app.models.jobs import IngestJob, JobStatus
+from app.services.job_queue import get_job_queue
 from app.services.storage import StorageService
 from app.services.score import calculate_score
 
@@ -58,20 +62,19 @@ class PushResponse(BaseModel):
 # ── Push endpoint ─────────────────────────────────────────────────────────
 
 @router.post("/push", response_model=PushResponse)
-async def push_page(payload: PushPayload, background_tasks: BackgroundTasks):
+async def push_page(payload: PushPayload):
     """
     Called by galui.js on every page load.
-    Receives page structure + content, updates registry asynchronously.
+    Receives page structure + content, queues a registry update job.
     Returns current AI Readiness Score.
     """
-    from app.config import settings
     from app.services.tenant import TenantService
 
     domain = payload.domain.replace("www.", "").lower().strip()
 
     # Verify tenant key
     tenant_svc = TenantService()
-    tenant = tenant_svc.get_tenant(payload.tenant_key)
+    tenant = tenant_svc.get_tenant_cached(payload.tenant_key)
     if not tenant:
         raise HTTPException(status_code=401, detail="Invalid tenant key — get your key at galuli dashboard")
 
@@ -101,15 +104,16 @@ async def push_page(payload: PushPayload, background_tasks: BackgroundTasks):
             score=score,
         )
 
-    # Store hash + queue background pipeline
+    # Store hash + queue the registry update (the tenant key is not needed past this point)
     storage.save_page_hash(domain, payload.page.url, page_hash)
 
-    background_tasks.add_task(
-        _run_push_pipeline,
+    job = IngestJob(
+        job_id=f"push_{uuid.uuid4().hex[:12]}",
         domain=domain,
-        payload=payload,
-        base_api_url=settings.base_api_url,
+        url=payload.page.url,
+        created_at=datetime.utcnow(),
     )
+    get_job_queue().enqueue(job, "push", payload.model_dump(exclude={"tenant_key"}))
 
     # Return current score while pipeline runs in background
     registry = storage.get_registry(domain)
@@ -123,75 +127,88 @@ async def push_page(payload: PushPayload, background_tasks: BackgroundTasks):
     )
 
 
-async def _run_push_pipeline(domain: str, payload: PushPayload, base_api_url: str):
+async def _run_push_pipeline(job: IngestJob, data: dict):
     """
-    Background: takes pushed page data, merges with existing registry,
-    re-runs LLM comprehension if enough new data accumulated.
+    Job queue handler (kind "push"): takes pushed page data, merges with
+    existing registry, re-runs LLM comprehension if enough new data accumulated.
     """
+    from app.config import settings
     from app.services.comprehension import ComprehensionService
     from app.services.registry_builder import RegistryBuilder, calculate_confidence
     from app.models.crawl import CrawlResult, PageContent
 
-    logger.info(f"[push] Processing {payload.page.url} for {domain}")
-
-    try:
-        # Build a minimal CrawlResult from the pushed page data
-        page_text = _build_page_text(payload.page)
-        page = PageContent(
-            url=payload.page.url,
-            title=payload.page.title or "",
-            text=page_text,
-            html="",
-            status_code=200,
-        )
+    queue = get_job_queue()
+    domain = job.domain
+    page_data = PageData(**data["page"])
+    logger.info(f"[push] Processing {page_data.url} for {domain}")
+
+    # Build a minimal CrawlResult from the pushed page data
+    page_text = _build_page_text(page_data)
+    page = PageContent(
+        url=page_data.url,
+        title=page_data.title or "",
+        text=page_text,
+        html="",
+        status_code=200,
+    )
 
-        # Check if we have an existing registry to merge with
-        existing = storage.get_registry(domain)
+    # Check if we have an existing registry to merge with
+    existing = storage.get_registry(domain)
 
-        # Build a CrawlResult with this page + any stored context
-        crawl_result = CrawlResult(
-            domain=domain,
-            seed_url=f"https://{domain}",
-            pages=[page],
-            total_pages=1,
-            duration=0.0,
-            used_playwright=False,
-        )
+    # Build a CrawlResult with this page + any stored context
+    crawl_result = CrawlResult(
+        domain=domain,
+        seed_url=f"https://{domain}",
+        pages=[page],
+        total_pages=1,
+        crawl_duration_ms=0,
+        used_playwright=False,
+    )
 
-        # Run LLM comprehension
-        comp = ComprehensionService()
-        raw = await comp.extract(crawl_result)
+    # Run LLM comprehension
+    job.status = JobStatus.COMPREHENDING
+    _checkpoint(job)
+    comp = ComprehensionService()
+    raw = await queue.run_stage(job, "comprehend", comp.extract, crawl_result, job_id=job.job_id)
+
+    # Inject WebMCP data into ai_metadata
+    raw["webmcp_tools_count"] = len(page_data.webmcp_tools or [])
+    raw["webmcp_enabled"] = page_data.webmcp_supported or False
+    raw["forms_exposed"] = len(page_data.forms or [])
+
+    # Build registry
+    builder = RegistryBuilder()
+    confidence = calculate_confidence(raw)
+    registry = builder.build(
+        domain=domain,
+        raw=raw,
+        confidence_score=confidence,
+        base_api_url=settings.base_api_url,
+        webmcp_meta={
+            "tools_count": len(page_data.webmcp_tools or []),
+            "enabled": page_data.webmcp_supported or False,
+            "forms_exposed": len(page_data.forms or []),
+            "tools": page_data.webmcp_tools or [],
+        }
+    )
 
-        # Inject WebMCP data into ai_metadata
-        raw["webmcp_tools_count"] = len(payload.page.webmcp_tools or [])
-        raw["webmcp_enabled"] = payload.page.webmcp_supported or False
-        raw["forms_exposed"] = len(payload.page.forms or [])
+    # If we have an existing registry, merge — don't overwrite good data
+    if existing:
+        registry = _merge_registries(existing, registry)
 
-        # Build registry
-        builder = RegistryBuilder()
-        confidence = calculate_confidence(raw)
-        registry = builder.build(
-            domain=domain,
-            raw=raw,
-            confidence_score=confidence,
-            base_api_url=base_api_url,
-            webmcp_meta={
-                "tools_count": len(payload.page.webmcp_tools or []),
-                "enabled": payload.page.webmcp_supported or False,
-                "forms_exposed": len(payload.page.forms or []),
-                "tools": payload.page.webmcp_tools or [],
-            }
-        )
+    job.status = JobStatus.STORING
+    _checkpoint(job)
+    await queue.run_stage(job, "store", storage.save_registry, registry)
 
-        # If we have an existing registry, merge — don't overwrite good data
-        if existing:
-            registry = _merge_registries(existing, registry)
+    job.status = JobStatus.COMPLETE
+    job.completed_at = datetime.utcnow()
+    job.pages_crawled = 1
+    job.confidence_score = confidence
+    _checkpoint(job)
+    logger.info(f"[push] Registry updated for {domain} | confidence={confidence:.2f}")
 
-        storage.save_registry(registry)
-        logger.info(f"[push] Registry updated for {domain} | confidence={confidence:.2f}")
 
-    except Exception as e:
-        logger.error(f"[push] Pipeline failed for {domain}: {e}", exc_info=True)
+get_job_queue().register_handler("push", _run_push_pipeline)
 
 
 def _build_page_text(page: PageData) -> str:
@@ -19,6 +19,64 @@ class Settings(BaseSettings):
     # --- Storage ---
     database_url: str = "data/registry.db"
 
+    # --- SQLite tuning (app/services/db.py connection pool) ---
+    sqlite_journal_mode: str = "WAL"       # WAL = readers don't block the writer
+    sqlite_synchronous: str = "NORMAL"     # NORMAL is durable enough under WAL
+    sqlite_busy_timeout_ms: int = 5000     # wait this long on a locked DB before failing
+    sqlite_cache_size_kb: int = 16384      # per-connection page cache (16 MB)
+    sqlite_mmap_size_mb: int = 128         # memory-mapped I/O window; 0 disables
+
+    # --- Auth tenant cache (api_key → Tenant, per process) ---
+    tenant_cache_ttl_seconds: int = 60
+    tenant_cache_negative_ttl_seconds: int = 30   # unknown / inactive keys
+    tenant_cache_max_entries: int = 10000
+
+    # --- Usage accounting (write-behind buffer for usage_log + tenant counters) ---
+    usage_flush_interval_ms: int = 1000
+    usage_flush_max_events: int = 500      # flush early once this many are pending
+    usage_buffer_max_pending: int = 50000  # drop (and count) beyond this
+
+    # --- Analytics ingest queue (POST /api/v1/analytics/event) ---
+    analytics_queue_max_size: int = 10000
+    analytics_batch_size: int = 500
+    analytics_flush_interval_ms: int = 500
+    analytics_queue_policy: str = "drop_newest"  # drop_newest | drop_oldest | block
+    analytics_enqueue_timeout_ms: int = 50       # only used by the "block" policy
+
+    # --- Analytics retention (monthly partitions; whole months are dropped) ---
+    analytics_retention_months: int = 13   # current month + 12 previous; 0 = keep forever
+
+    # --- Bulk AI Attention Scores (GET /api/v1/analytics/attention/bulk) ---
+    analytics_attention_days: int = 30                 # window the scheduled job materializes
+    analytics_attention_refresh_minutes: int = 15      # 0 disables the job
+
+    # --- Live analytics counters (GET /api/v1/analytics/{domain}/live) ---
+    analytics_live_window_minutes: int = 1440   # per-minute buckets kept per (domain, agent)
+
+    # --- Raw analytics export (GET /api/v1/analytics/{domain}/export) ---
+    analytics_export_chunk_size: int = 1000   # rows fetched and sent per chunk
+
+    # --- Analytics dashboard bundle (GET /api/v1/analytics/{domain}/dashboard) ---
+    analytics_dashboard_cache_ttl_seconds: int = 30   # 0 disables caching
+    analytics_dashboard_cache_max_entries: int = 1000
+
+    # --- Online migration of legacy agent_events into the compact layout ---
+    analytics_legacy_copy_batch: int = 5000      # rows moved per transaction
+    analytics_legacy_copy_pause_ms: int = 50     # sleep between batches so live writers get the lock
+
+    # --- Ingest job queue (ingest_jobs rows worked by a bounded pool) ---
+    job_workers: int = 2                   # concurrent pipelines per process
+    job_lease_seconds: int = 60            # lapsed lease (dead worker) → job requeued; renewed every third
+    job_poll_interval_seconds: float = 5.0 # idle workers re-check for due / orphaned jobs
+    job_stage_retries: int = 2             # retries of a failed step (crawl, comprehend, store)
+    job_retry_backoff_seconds: float = 5.0 # doubled per retry
+    job_max_attempts: int = 3              # claims before a repeatedly lost job is failed
+    job_events_history: int = 50           # events kept per job for late SSE subscribers
+    job_events_retain_seconds: int = 300   # ...for this long after the job finishes
+    job_events_stale_seconds: int = 3600   # ...or after its last event, if it never finished (restart, lost worker)
+    job_events_max_jobs: int = 1000        # jobs with retained history; least recently active dropped first
+    job_events_idle_seconds: float = 5.0   # idle SSE stream: keepalive + re-read the job row
+
     # --- Service Identity ---
     base_api_url: str = "http://localhost:8000"
 
@@ -30,6 +88,12 @@ class Settings(BaseSettings):
     # --- LLM Models ---
     fast_model: str = "claude-haiku-4-5-20251001"
     deep_model: str = "claude-sonnet-4-5-20250929"
+    llm_max_concurrency: int = 4           # concurrent Anthropic calls per process (job workers + scheduled refreshes)
+    comprehension_boilerplate_share: float = 0.5   # lines on this share of crawled pages are dropped after first use (0 = off)
+    comprehension_fast_token_budget: int = 6000    # corpus for the Haiku passes (metadata, pricing)
+    comprehension_deep_token_budget: int = 12000   # corpus for the Sonnet passes (capabilities, limitations)
+    llm_cache_enabled: bool = True         # reuse pass results for byte-identical content
+    llm_cache_max_entries: int = 20000     # LRU-evicted beyond this
 
     # --- Stripe (legacy — not used for new signups) ---
     stripe_secret_key: str = ""            # sk_live_... or sk_test_...
@@ -54,7 +118,17 @@ class Settings(BaseSettings):
     app_url: str = "https://galuli.io"     # used in email links + Stripe redirect
 
     # --- Refresh ---
-    auto_refresh_interval_hours: int = 168  # 7 days
+    auto_refresh_interval_hours: int = 168  # 7 days — starting interval for a newly scheduled domain
+    refresh_min_interval_hours: int = 24    # adaptive interval floor (content changes every crawl)
+    refresh_max_interval_hours: int = 720   # adaptive interval ceiling (content never changes)
+    refresh_jitter: float = 0.1             # next crawl lands at interval × uniform(1-j, 1+j)
+    refresh_check_interval_minutes: int = 60  # how often the scheduler looks for due domains
+    refresh_batch_size: int = 200           # max due domains taken per check
+    refresh_failure_backoff_hours: int = 6  # a failed refresh is retried after this, interval unchanged
+    refresh_probe_enabled: bool = True      # conditional-GET change probe before a scheduled re-crawl
+    refresh_probe_pages: int = 6            # pages probed per domain: seed + top priority pages
+    refresh_concurrency: int = 8            # domains refreshed at once per scheduled run
+    refresh_run_deadline_minutes: int = 50  # a run stops starting / cuts off refreshes after this (checks are hourly)
 
     # --- Citation Tracker ---
     perplexity_api_key: str = ""           # Required for Perplexity citation checks (sonar model)
@@ -23,3 +23,7 @@ class IngestJob(BaseModel):
     error: Optional[str] = None
     pages_crawled: int = 0
     confidence_score: float = 0.0
+    boilerplate_bytes_removed: int = 0
+    kind: str = "ingest"            # job_queue handler: ingest | push
+    attempts: int = 0               # times a worker has claimed it
+    stage: Optional[str] = None     # pipeline step currently (or last) running
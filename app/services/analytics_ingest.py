@@ -0,0 +1,214 @@
+"""
+Batched asynchronous ingestion for AI-agent hit events.
+
+POST /api/v1/analytics/event used to run a synchronous INSERT + COMMIT inside
+the async route, blocking the event loop for every AI-agent hit. The route now
+only enqueues; a single background writer task drains the queue into
+`executemany` batches (one transaction each) on a worker thread.
+
+Queue is bounded (analytics_queue_max_size). When it is full the policy decides:
+  drop_newest  — reject the incoming event (default; cheapest)
+  drop_oldest  — evict the oldest queued event to make room
+  block        — wait up to analytics_enqueue_timeout_ms for room, then drop
+
+Counters (accepted / dropped / flushed / batches / failed) are exposed via
+stats() and reported in /api/v1/admin/stats.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+POLICIES = ("drop_newest", "drop_oldest", "block")
+
+_STOP = object()  # wakes an idle writer so it can see the stop flag
+
+
+class AnalyticsIngestQueue:
+
+    def __init__(
+        self,
+        max_size: int,
+        batch_size: int,
+        flush_interval_ms: int,
+        policy: str = "drop_newest",
+        enqueue_timeout_ms: int = 50,
+    ):
+        if policy not in POLICIES:
+            logger.warning(f"Unknown analytics queue policy '{policy}' — using drop_newest")
+            policy = "drop_newest"
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.policy = policy
+        self.enqueue_timeout = enqueue_timeout_ms / 1000
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._service = None
+        self._stopping = False
+
+        self.accepted = 0
+        self.dropped = 0
+        self.flushed = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_batch_size = 0
+        self.last_flush_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self, service=None):
+        """Start the writer task on the running loop. Called from app lifespan."""
+        if self.running:
+            return
+        if service is None:
+            from app.services.analytics import AnalyticsService
+            service = AnalyticsService()
+        self._service = service
+        self._stopping = False
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._task = asyncio.create_task(self._run(), name="analytics-ingest-writer")
+        logger.info(
+            f"Analytics ingest queue started (max={self.max_size}, batch={self.batch_size}, "
+            f"policy={self.policy})"
+        )
+
+    async def stop(self):
+        """
+        Stop the writer and flush whatever is still queued. The writer is
+        signalled rather than cancelled so the batch it is collecting gets
+        written too.
+        """
+        if self._task is None:
+            return
+        self._stopping = True
+        try:
+            self._queue.put_nowait(_STOP)
+        except asyncio.QueueFull:
+            pass  # writer is busy, not waiting on the queue — it sees the flag next loop
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        remaining = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not _STOP:
+                remaining.append(item)
+        for i in range(0, len(remaining), self.batch_size):
+            await self._write(remaining[i:i + self.batch_size])
+        logger.info(f"Analytics ingest queue stopped ({len(remaining)} events flushed on shutdown)")
+
+    # ── Producer side ───────────────────────────────────────────────────────
+
+    async def enqueue(self, event: Dict[str, Any]) -> bool:
+        """Queue one event. Returns False if it was dropped."""
+        q = self._queue
+        try:
+            q.put_nowait(event)
+            self.accepted += 1
+            return True
+        except asyncio.QueueFull:
+            pass
+
+        if self.policy == "drop_oldest":
+            try:
+                q.get_nowait()
+                self.dropped += 1
+            except asyncio.QueueEmpty:
+                pass
+            try:
+                q.put_nowait(event)
+                self.accepted += 1
+                return True
+            except asyncio.QueueFull:
+                pass
+        elif self.policy == "block":
+            try:
+                await asyncio.wait_for(q.put(event), timeout=self.enqueue_timeout)
+                self.accepted += 1
+                return True
+            except asyncio.TimeoutError:
+                pass
+
+        self.dropped += 1
+        return False
+
+    # ── Writer ──────────────────────────────────────────────────────────────
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while not self._stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+                    except asyncio.TimeoutError:
+                        break
+                if item is _STOP:
+                    break
+                batch.append(item)
+            await self._write(batch)
+
+    async def _write(self, batch: List[Dict[str, Any]]):
+        if not batch:
+            return
+        start = time.monotonic()
+        try:
+            # sqlite3 is blocking — keep it off the event loop
+            written = await asyncio.to_thread(self._service.record_events, batch)
+        except Exception as e:
+            logger.error(f"Analytics batch write failed: {e}")
+            written = 0
+        self.batches += 1
+        self.last_batch_size = len(batch)
+        self.last_flush_ms = round((time.monotonic() - start) * 1000, 2)
+        if written:
+            self.flushed += written
+        else:
+            self.failed += len(batch)
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "policy": self.policy,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "max_size": self.max_size,
+            "accepted": self.accepted,
+            "dropped": self.dropped,
+            "flushed": self.flushed,
+            "failed": self.failed,
+            "batches": self.batches,
+            "last_batch_size": self.last_batch_size,
+            "last_flush_ms": self.last_flush_ms,
+        }
+
+
+_ingest_queue: Optional[AnalyticsIngestQueue] = None
+
+
+def get_ingest_queue() -> AnalyticsIngestQueue:
+    global _ingest_queue
+    if _ingest_queue is None:
+        from app.config import settings
+        _ingest_queue = AnalyticsIngestQueue(
+            max_size=settings.analytics_queue_max_size,
+            batch_size=settings.analytics_batch_size,
+            flush_interval_ms=settings.analytics_flush_interval_ms,
+            policy=settings.analytics_queue_policy,
+            enqueue_timeout_ms=settings.analytics_enqueue_timeout_ms,
+        )
+    return _ingest_queue
@@ -0,0 +1,201 @@
+"""
+In-process sliding-window hit counters for the live analytics view.
+
+Every event accepted by POST /api/v1/analytics/event is also counted here, so
+"hits in the last 5 min / hour / day" and "last seen" come from memory instead
+of a SQLite scan. Per (domain, agent) there is one ring of per-minute buckets
+(analytics_live_window_minutes of them) plus a running total per reported
+window: recording a hit is O(1), and so is reading a window total — rolling
+the ring forward touches one bucket per elapsed minute.
+
+Counters are per process and start empty, so on startup rebuild() refills
+them from the raw rows of the last window. Events are counted when accepted
+by the ingest queue, before they are written.
+"""
+import logging
+import threading
+import time
+from array import array
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Reported windows: (label, minutes). Windows longer than the ring are dropped.
+WINDOWS = (("5m", 5), ("1h", 60), ("24h", 1440))
+
+_SWEEP_INTERVAL = 600  # seconds between sweeps of idle rings
+
+
+def _iso(ts: Optional[int]) -> Optional[str]:
+    if ts is None:
+        return None
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+
+
+class _Ring:
+    """Per-minute hit counts for one (domain, agent) over the last `size` minutes."""
+
+    __slots__ = ("counts", "head", "sums", "last_seen", "agent_type")
+
+    def __init__(self, size: int, windows: int, minute: int, agent_type: str):
+        self.counts = array("I", bytes(4 * size))
+        self.head = minute           # newest minute the ring covers
+        self.sums = [0] * windows    # running total per window
+        self.last_seen = 0
+        self.agent_type = agent_type
+
+    def advance(self, minute: int, spans: Tuple[int, ...]):
+        """Roll forward to `minute`, expiring buckets that leave each window."""
+        size = len(self.counts)
+        if minute <= self.head:
+            return
+        if minute - self.head >= size:
+            self.counts = array("I", bytes(4 * size))
+            self.sums = [0] * len(spans)
+            self.head = minute
+            return
+        counts, sums = self.counts, self.sums
+        for m in range(self.head + 1, minute + 1):
+            for i, span in enumerate(spans):
+                sums[i] -= counts[(m - span) % size]
+            counts[m % size] = 0
+        self.head = minute
+
+    def add(self, minute: int, n: int, spans: Tuple[int, ...]):
+        size = len(self.counts)
+        if minute <= self.head - size:
+            return
+        self.counts[minute % size] += n
+        for i, span in enumerate(spans):
+            if minute > self.head - span:
+                self.sums[i] += n
+
+
+class LiveCounters:
+
+    def __init__(self, window_minutes: int = 1440):
+        self.window_minutes = max(1, window_minutes)
+        self.windows = tuple((label, m) for label, m in WINDOWS if m <= self.window_minutes)
+        self._spans = tuple(m for _, m in self.windows)
+        self._rings: Dict[str, Dict[str, _Ring]] = {}
+        self._lock = threading.Lock()
+        self._last_sweep = time.time()
+        self.recorded = 0
+        self.rebuilt_from = 0
+
+    def _ring(self, domain: str, agent_name: str, agent_type: str, minute: int) -> _Ring:
+        agents = self._rings.setdefault(domain, {})
+        ring = agents.get(agent_name)
+        if ring is None:
+            ring = agents[agent_name] = _Ring(self.window_minutes, len(self._spans), minute, agent_type)
+        return ring
+
+    def _add(self, domain: str, agent_name: str, agent_type: str, ts: int, n: int, now: float) -> _Ring:
+        """Caller holds the lock."""
+        now_minute = int(now) // 60
+        ring = self._ring(domain, agent_name, agent_type, now_minute)
+        ring.advance(now_minute, self._spans)
+        ring.add(ts // 60, n, self._spans)
+        if ts > ring.last_seen:
+            ring.last_seen = ts
+        return ring
+
+    def record(self, domain: str, agent_name: str, agent_type: str, ts: int, now: Optional[float] = None):
+        """Count one hit at epoch second ts. Future timestamps count as now."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._add(domain, agent_name, agent_type, min(int(ts), int(now)), 1, now)
+            self.recorded += 1
+            if now - self._last_sweep >= _SWEEP_INTERVAL:
+                self._sweep(now)
+
+    def _sweep(self, now: float):
+        """Drop rings with no hit inside the window. Caller holds the lock."""
+        horizon = int(now) - self.window_minutes * 60
+        for domain in list(self._rings):
+            agents = self._rings[domain]
+            for name in [n for n, r in agents.items() if r.last_seen <= horizon]:
+                del agents[name]
+            if not agents:
+                del self._rings[domain]
+        self._last_sweep = now
+
+    def snapshot(self, domain: str, now: Optional[float] = None) -> Dict[str, Any]:
+        """Window totals, per-minute rates and last-seen for one domain, per agent and overall."""
+        now = time.time() if now is None else now
+        minute = int(now) // 60
+        agents: List[Dict[str, Any]] = []
+        totals = [0] * len(self._spans)
+        last_seen = None
+        with self._lock:
+            for name, ring in self._rings.get(domain, {}).items():
+                ring.advance(minute, self._spans)
+                if not any(ring.sums):
+                    continue
+                totals = [t + s for t, s in zip(totals, ring.sums)]
+                last_seen = max(last_seen or 0, ring.last_seen)
+                agents.append({
+                    "agent_name": name,
+                    "agent_type": ring.agent_type,
+                    "hits": dict(zip((label for label, _ in self.windows), ring.sums)),
+                    "last_seen": _iso(ring.last_seen),
+                })
+        agents.sort(key=lambda a: [-a["hits"][label] for label, _ in reversed(self.windows)])
+        return {
+            "domain": domain,
+            "as_of": _iso(int(now)),
+            "hits": {label: t for (label, _), t in zip(self.windows, totals)},
+            "hits_per_minute": {
+                label: round(t / span, 2) for (label, span), t in zip(self.windows, totals)
+            },
+            "last_seen": _iso(last_seen),
+            "agents": agents,
+        }
+
+    def forget(self, *domains: str):
+        with self._lock:
+            for domain in domains:
+                self._rings.pop(domain, None)
+
+    def rebuild(self, service=None) -> int:
+        """
+        Refill from the raw hits of the last window (per-minute aggregates).
+        Replaces current contents. Returns the number of hits loaded.
+        """
+        if service is None:
+            from app.services.analytics import AnalyticsService
+            service = AnalyticsService()
+        now = time.time()
+        rows = service.get_minute_counts(int(now) - self.window_minutes * 60)
+        loaded = 0
+        with self._lock:
+            self._rings = {}
+            for domain, agent_name, agent_type, minute, hits, last_ts in rows:
+                ring = self._add(domain, agent_name, agent_type, minute * 60, hits, now)
+                ring.last_seen = max(ring.last_seen, last_ts)
+                loaded += hits
+        self.rebuilt_from = loaded
+        logger.info(f"Live analytics counters rebuilt from {loaded} recent hit(s)")
+        return loaded
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "domains": len(self._rings),
+                "rings": sum(len(a) for a in self._rings.values()),
+                "window_minutes": self.window_minutes,
+                "recorded": self.recorded,
+                "rebuilt_from": self.rebuilt_from,
+            }
+
+
+_live_counters: Optional[LiveCounters] = None
+
+
+def get_live_counters() -> LiveCounters:
+    global _live_counters
+    if _live_counters is None:
+        from app.config import settings
+        _live_counters = LiveCounters(window_minutes=settings.analytics_live_window_minutes)
+    return _live_counters
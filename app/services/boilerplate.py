@@ -0,0 +1,63 @@
+"""
+Cross-page boilerplate removal for crawled text.
+
+Both crawl paths repeat site chrome on every page: Firecrawl markdown keeps
+the nav menu and footer, the BeautifulSoup fallback also picks up cookie
+banners. Before the comprehension corpus is built, every line is normalized
+(lowercased, whitespace collapsed) and hashed; a line found on at least
+`min_share` of the crawled pages is boilerplate. It is kept where it first
+appears — product names in the nav are still worth one mention — and
+removed from every later page.
+
+Crawls of fewer than MIN_PAGES pages are left alone: with two pages,
+"appears on most pages" just means "appears twice".
+"""
+import hashlib
+import re
+from typing import Dict, List, Set, Tuple
+
+from app.models.crawl import PageContent
+
+MIN_PAGES = 3
+
+_WS_RE = re.compile(r"\s+")
+
+
+def _line_key(line: str) -> bytes:
+    return hashlib.blake2b(_WS_RE.sub(" ", line.strip().lower()).encode("utf-8"), digest_size=8).digest()
+
+
+def strip_boilerplate(pages: List[PageContent], min_share: float = 0.5) -> Tuple[List[PageContent], int]:
+    """
+    Pages with repeated lines removed after their first occurrence, and the
+    number of UTF-8 bytes dropped. min_share <= 0 disables.
+    """
+    if min_share <= 0 or len(pages) < MIN_PAGES:
+        return pages, 0
+
+    page_lines: List[List[Tuple[str, bytes]]] = []
+    df: Dict[bytes, int] = {}
+    for page in pages:
+        lines = [(line, _line_key(line)) for line in (page.text or "").splitlines()]
+        page_lines.append(lines)
+        for key in {k for line, k in lines if line.strip()}:
+            df[key] = df.get(key, 0) + 1
+
+    threshold = max(2, min_share * len(pages))
+    common = {key for key, n in df.items() if n >= threshold}
+    if not common:
+        return pages, 0
+
+    seen: Set[bytes] = set()
+    out: List[PageContent] = []
+    saved = 0
+    for page, lines in zip(pages, page_lines):
+        kept = []
+        for line, key in lines:
+            if key in common and key in seen:
+                saved += len(line.encode("utf-8")) + 1
+                continue
+            kept.append(line)
+        seen.update(key for _, key in lines)
+        out.append(page.model_copy(update={"text": "\n".join(kept)}) if len(kept) < len(lines) else page)
+    return out, saved
@@ -0,0 +1,201 @@
+"""
+Cheap "has anything changed?" check run before a scheduled re-crawl.
+
+A full refresh is a crawl (Firecrawl credits or ~20 fetches) plus four LLM
+passes, and most registered sites are the same week to week. Before
+committing to that, the scheduler probes a handful of pages:
+
+- the seed URL and the highest-priority pages of the last crawl
+  (PRIORITY_PATH_KEYWORDS order) are fetched with If-None-Match /
+  If-Modified-Since from the validators saved last time. A 304 means
+  unchanged; a 200 is reduced to visible text and its hash compared with
+  page_hashes.probe_hash.
+- the site's /sitemap.xml is checked for a <lastmod> newer than the last
+  full crawl (crawl_schedule.last_crawl, which probe-only passes leave
+  alone). A sitemap the baseline saw that can no longer be fetched counts
+  as changed.
+
+Anything that doesn't positively look unchanged — no baseline yet, a fetch
+error, a different page set — counts as changed, so the probe can only
+skip work, never hide an update. The baseline is written by snapshot()
+after a full refresh succeeds, from the pages that crawl found.
+"""
+import asyncio
+import hashlib
+import logging
+import re
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+import httpx
+from bs4 import BeautifulSoup
+
+from app.models.crawl import PageContent
+from app.services.crawler import CONCURRENCY, CRAWLER_UA, PRIORITY_PATH_KEYWORDS, REQUEST_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+_WS_RE = re.compile(r"\s+")
+_LASTMOD_RE = re.compile(r"<lastmod>\s*([^<\s]+)\s*</lastmod>", re.IGNORECASE)
+
+
+@dataclass
+class ProbeResult:
+    changed: bool
+    reason: str
+    pages_probed: int = 0
+    not_modified: int = 0           # answered 304 to the conditional GET
+    pages: Dict[str, dict] = field(default_factory=dict)
+
+
+def _text_hash(html: str) -> str:
+    """Hash of the page's visible text, so per-request nonces in scripts don't count as changes."""
+    soup = BeautifulSoup(html, "lxml")
+    for tag in soup(["script", "style", "noscript", "template"]):
+        tag.decompose()
+    text = _WS_RE.sub(" ", soup.get_text(" ")).strip()
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _priority(url: str) -> int:
+    path = urlparse(url).path.lower()
+    for i, keyword in enumerate(PRIORITY_PATH_KEYWORDS):
+        if keyword in path:
+            return len(PRIORITY_PATH_KEYWORDS) - i
+    return 0
+
+
+def _parse_lastmod(value: str) -> Optional[datetime]:
+    """W3C datetime (date-only or full) → naive UTC, like our stored timestamps."""
+    try:
+        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+class ChangeProbe:
+
+    def __init__(self, storage, max_pages: int = None):
+        if max_pages is None:
+            from app.config import settings
+            max_pages = settings.refresh_probe_pages
+        self.storage = storage
+        self.max_pages = max(1, max_pages)
+
+    def _client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            timeout=REQUEST_TIMEOUT,
+            follow_redirects=True,
+            headers={"User-Agent": CRAWLER_UA},
+        )
+
+    async def check(self, domain: str, seed_url: str) -> ProbeResult:
+        baseline = self.storage.get_probe_state(domain)
+        if not baseline:
+            return ProbeResult(changed=True, reason="no probe baseline")
+
+        async with self._client() as client:
+            sem = asyncio.Semaphore(CONCURRENCY)
+
+            async def probe(url: str, prev: dict):
+                async with sem:
+                    return url, await self._fetch(client, url, prev)
+
+            results = await asyncio.gather(*(probe(u, p) for u, p in baseline.items()))
+            schedule = self.storage.get_crawl_schedule(domain)
+            sitemap = await self._fetch_sitemap(client, seed_url)
+        sitemap_changed = self._sitemap_changed(sitemap, schedule)
+
+        result = ProbeResult(changed=False, reason="unchanged", pages_probed=len(results))
+        for url, page in results:
+            if page is None:
+                return ProbeResult(True, f"fetch failed: {url}", len(results))
+            if page.pop("not_modified", False):
+                result.not_modified += 1
+            if page["probe_hash"] != baseline[url]["probe_hash"]:
+                return ProbeResult(True, f"page changed: {url}", len(results))
+            result.pages[url] = page
+        if sitemap_changed:
+            return ProbeResult(True, sitemap_changed, len(results))
+        return result
+
+    async def snapshot(self, domain: str, seed_url: str, pages: List[PageContent]):
+        """
+        Record the probe baseline after a full refresh: the seed plus the
+        crawl's highest-priority pages, fetched once for their validators.
+        """
+        urls = [seed_url]
+        for page in sorted(pages, key=lambda p: _priority(p.url), reverse=True):
+            if len(urls) >= self.max_pages:
+                break
+            if _priority(page.url) and page.url not in urls:
+                urls.append(page.url)
+
+        async with self._client() as client:
+            fetched = await asyncio.gather(*(self._fetch(client, u, {}) for u in urls))
+            sitemap = await self._fetch_sitemap(client, seed_url)
+        state = {}
+        for url, page in zip(urls, fetched):
+            if page is not None:
+                page.pop("not_modified", None)
+                state[url] = page
+        self.storage.save_probe_state(domain, state)
+        self.storage.set_sitemap_seen(domain, sitemap is not None)
+        logger.info(f"Change probe baseline for {domain}: {len(state)}/{len(urls)} pages, "
+                    f"sitemap {'found' if sitemap is not None else 'not found'}")
+
+    async def _fetch(self, client: httpx.AsyncClient, url: str, prev: dict) -> Optional[dict]:
+        headers = {}
+        if prev.get("etag"):
+            headers["If-None-Match"] = prev["etag"]
+        if prev.get("last_modified"):
+            headers["If-Modified-Since"] = prev["last_modified"]
+        try:
+            resp = await client.get(url, headers=headers)
+        except Exception as e:
+            logger.warning(f"Change probe fetch failed for {url}: {e}")
+            return None
+        if resp.status_code == 304 and prev:
+            return {**prev, "not_modified": True}
+        if resp.status_code >= 400:
+            return None
+        content_type = resp.headers.get("content-type", "")
+        if "html" in content_type:
+            probe_hash = _text_hash(resp.text)
+        else:
+            probe_hash = hashlib.sha256(resp.content).hexdigest()
+        return {
+            "probe_hash": probe_hash,
+            "etag": resp.headers.get("etag"),
+            "last_modified": resp.headers.get("last-modified"),
+        }
+
+    async def _fetch_sitemap(self, client: httpx.AsyncClient, seed_url: str) -> Optional[str]:
+        """The site's /sitemap.xml body, or None if it couldn't be fetched."""
+        parsed = urlparse(seed_url)
+        sitemap_url = f"{parsed.scheme}://{parsed.netloc}/sitemap.xml"
+        try:
+            resp = await client.get(sitemap_url)
+        except Exception as e:
+            logger.debug(f"Change probe sitemap fetch failed for {sitemap_url}: {e}")
+            return None
+        return resp.text if resp.status_code == 200 else None
+
+    def _sitemap_changed(self, sitemap: Optional[str], schedule: Optional[dict]) -> Optional[str]:
+        """Why the sitemap says the site changed since the last crawl, or None."""
+        if not schedule or not schedule.get("last_crawl"):
+            return None
+        if sitemap is None:
+            # Gone or failing since the baseline saw it — the site moved under us
+            return "sitemap no longer fetchable" if schedule.get("sitemap_seen") else None
+        last_crawl = datetime.fromisoformat(schedule["last_crawl"])
+        for value in _LASTMOD_RE.findall(sitemap):
+            lastmod = _parse_lastmod(value)
+            if lastmod is not None and lastmod > last_crawl:
+                return f"sitemap lastmod {value} after last crawl"
+        return None
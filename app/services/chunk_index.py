@@ -0,0 +1,157 @@
+"""
+In-process BM25 index over crawled page text, for choosing what to send to
+the LLM.
+
+The comprehension passes used to see the first 5,000 characters of every page,
+concatenated and then cut at a fixed length — so whichever pages came last were
+dropped whatever they contained. Pages are now split into paragraph-aligned
+chunks and each pass's query terms ("pricing", "rate limit", "sdk", ...) rank
+them; the corpus is the best chunks that fit a token budget, put back in page
+order.
+
+Deliberately small: a regex tokenizer, a short stopword list and Okapi BM25
+(k1=1.5, b=0.75). A crawl is a few dozen pages at most, so the index is built
+per job and thrown away.
+"""
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was "
+    "we were will with you your our".split()
+)
+_K1 = 1.5
+_B = 0.75
+_CHARS_PER_TOKEN = 4   # rough estimate, good enough for budgeting
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // _CHARS_PER_TOKEN + 1
+
+
+class Chunk:
+
+    __slots__ = ("page", "url", "seq", "text", "terms", "length")
+
+    def __init__(self, page: int, url: str, seq: int, text: str):
+        self.page = page        # index of the page in the crawl
+        self.url = url
+        self.seq = seq          # position within the page
+        self.text = text
+        self.terms = Counter(tokenize(text))
+        self.length = sum(self.terms.values())
+
+
+def _split(text: str, chunk_chars: int) -> Iterable[str]:
+    """Paragraph-aligned pieces of roughly chunk_chars (hard-split only for huge lines)."""
+    buf: List[str] = []
+    size = 0
+    for line in text.splitlines():
+        line = line.rstrip()
+        if not line:
+            continue
+        while len(line) > chunk_chars:
+            if buf:
+                yield "\n".join(buf)
+                buf, size = [], 0
+            yield line[:chunk_chars]
+            line = line[chunk_chars:]
+        if size + len(line) > chunk_chars and buf:
+            yield "\n".join(buf)
+            buf, size = [], 0
+        buf.append(line)
+        size += len(line) + 1
+    if buf:
+        yield "\n".join(buf)
+
+
+class ChunkIndex:
+
+    def __init__(self, pages: Sequence, chunk_chars: int = 1200):
+        """pages: objects with .url and .text (PageContent)."""
+        self.chunks: List[Chunk] = []
+        for p, page in enumerate(pages):
+            for seq, text in enumerate(_split(page.text or "", chunk_chars)):
+                self.chunks.append(Chunk(p, page.url, seq, text))
+        n = len(self.chunks)
+        self._avg_len = (sum(c.length for c in self.chunks) / n) if n else 0.0
+        df: Counter = Counter()
+        for c in self.chunks:
+            df.update(c.terms.keys())
+        self._idf: Dict[str, float] = {
+            term: math.log(1 + (n - d + 0.5) / (d + 0.5)) for term, d in df.items()
+        }
+
+    def scores(self, query: str) -> List[float]:
+        """BM25 score of every chunk for a query (tokenized like the text)."""
+        terms = tokenize(query)
+        out = []
+        for c in self.chunks:
+            norm = _K1 * (1 - _B + _B * c.length / self._avg_len) if self._avg_len else _K1
+            s = 0.0
+            for t in terms:
+                tf = c.terms.get(t)
+                if tf:
+                    s += self._idf[t] * tf * (_K1 + 1) / (tf + norm)
+            out.append(s)
+        return out
+
+    def select(self, queries: Sequence[str], budget_tokens: int) -> List[Chunk]:
+        """
+        Chunks for a set of queries within budget_tokens, in page order.
+        Everything if it fits; otherwise the opening chunk of the first page
+        (usually the homepage lead), then the queries' rankings taken in
+        turn — so each query gets its share — skipping chunks that would
+        overflow the budget. Budget left after that goes to unmatched chunks,
+        page openings first.
+        """
+        if sum(estimate_tokens(c.text) for c in self.chunks) <= budget_tokens:
+            return list(self.chunks)
+
+        rankings = []
+        for query in queries:
+            scored = self.scores(query)
+            rankings.append([i for i in sorted(range(len(scored)), key=lambda i: -scored[i]) if scored[i] > 0])
+
+        chosen: Dict[int, None] = {}
+        used = 0
+
+        def take(i: int) -> None:
+            nonlocal used
+            cost = estimate_tokens(self.chunks[i].text)
+            if i not in chosen and used + cost <= budget_tokens:
+                chosen[i] = None
+                used += cost
+
+        if self.chunks:
+            take(0)
+        for depth in range(max((len(r) for r in rankings), default=0)):
+            for ranking in rankings:
+                if depth < len(ranking):
+                    take(ranking[depth])
+        for i in sorted(range(len(self.chunks)), key=lambda i: (self.chunks[i].seq, i)):
+            take(i)
+        return [self.chunks[i] for i in sorted(chosen)]
+
+
+def render(chunks: Sequence[Chunk], header: str = "=== PAGE: {url} ===") -> str:
+    """Selected chunks grouped under their page header; gaps within a page marked with […]."""
+    parts: List[str] = []
+    prev: Optional[Chunk] = None
+    for c in chunks:
+        if prev is None or c.page != prev.page:
+            parts.append(("\n\n" if parts else "") + header.format(url=c.url) + "\n")
+        elif c.seq != prev.seq + 1:
+            parts.append("\n[…]\n")
+        else:
+            parts.append("\n")
+        parts.append(c.text)
+        prev = c
+    return "".join(parts)
@@ -21,6 +21,8 @@ import uuid
 from datetime import datetime, timedelta
 from typing import Optional
 
+from app.services.db import get_conn
+
 logger = logging.getLogger(__name__)
 
 # Deterministic question templates — same keyword always → same question → comparable trends
@@ -34,63 +36,56 @@ QUESTION_TEMPLATES = [
 
 ENGINES = ("perplexity", "openai", "claude")
 
+# Citations live in their own DB file, next to the main registry DB
+DEFAULT_DB_PATH = str(pathlib.Path(__file__).resolve().parent.parent.parent / "data" / "citations.db")
+
+CREATE_CITATION_QUERIES = """
+CREATE TABLE IF NOT EXISTS citation_queries (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    api_key     TEXT NOT NULL,
+    domain      TEXT NOT NULL,
+    type        TEXT NOT NULL DEFAULT 'keyword',
+    value       TEXT NOT NULL,
+    created_at  TEXT NOT NULL,
+    UNIQUE(api_key, domain, value)
+)
+"""
+
+CREATE_CITATION_RESULTS = """
+CREATE TABLE IF NOT EXISTS citation_results (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    api_key       TEXT NOT NULL,
+    domain        TEXT NOT NULL,
+    query_id      INTEGER NOT NULL,
+    question      TEXT NOT NULL,
+    engine        TEXT NOT NULL,
+    cited         INTEGER NOT NULL DEFAULT 0,
+    snippet       TEXT,
+    full_response TEXT,
+    checked_at    TEXT NOT NULL,
+    run_id        TEXT NOT NULL,
+    engine_model  TEXT,
+    error         TEXT,
+    status        TEXT DEFAULT 'complete'
+)
+"""
+
+CREATE_CITATION_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_cq_key_domain ON citation_queries(api_key, domain)",
+    "CREATE INDEX IF NOT EXISTS idx_cr_key_domain ON citation_results(api_key, domain)",
+    "CREATE INDEX IF NOT EXISTS idx_cr_checked_at ON citation_results(checked_at)",
+    "CREATE INDEX IF NOT EXISTS idx_cr_run_id     ON citation_results(run_id)",
+]
+
 
 class CitationService:
     def __init__(self, db_path: Optional[str] = None):
         from app.config import settings
         self._settings = settings
-        if db_path is None:
-            root = pathlib.Path(__file__).resolve().parent.parent.parent
-            db_path = str(root / "data" / "citations.db")
-        self._db_path = db_path
-        pathlib.Path(db_path).parent.mkdir(parents=True, exist_ok=True)
-        self._init_db()
-
-    # ── DB init ───────────────────────────────────────────────────────────────
-
-    def _init_db(self):
-        with self._conn() as conn:
-            conn.executescript("""
-                CREATE TABLE IF NOT EXISTS citation_queries (
-                    id          INTEGER PRIMARY KEY AUTOINCREMENT,
-                    api_key     TEXT NOT NULL,
-                    domain      TEXT NOT NULL,
-                    type        TEXT NOT NULL DEFAULT 'keyword',
-                    value       TEXT NOT NULL,
-                    created_at  TEXT NOT NULL,
-                    UNIQUE(api_key, domain, value)
-                );
-                CREATE INDEX IF NOT EXISTS idx_cq_key_domain
-                    ON citation_queries(api_key, domain);
-
-                CREATE TABLE IF NOT EXISTS citation_results (
-                    id            INTEGER PRIMARY KEY AUTOINCREMENT,
-                    api_key       TEXT NOT NULL,
-                    domain        TEXT NOT NULL,
-                    query_id      INTEGER NOT NULL,
-                    question      TEXT NOT NULL,
-                    engine        TEXT NOT NULL,
-                    cited         INTEGER NOT NULL DEFAULT 0,
-                    snippet       TEXT,
-                    full_response TEXT,
-                    checked_at    TEXT NOT NULL,
-                    run_id        TEXT NOT NULL,
-                    engine_model  TEXT,
-                    error         TEXT,
-                    status        TEXT DEFAULT 'complete'
-                );
-                CREATE INDEX IF NOT EXISTS idx_cr_key_domain
-                    ON citation_results(api_key, domain);
-                CREATE INDEX IF NOT EXISTS idx_cr_checked_at
-                    ON citation_results(checked_at);
-                CREATE INDEX IF NOT EXISTS idx_cr_run_id
-                    ON citation_results(run_id);
-            """)
+        self._db_path = db_path or DEFAULT_DB_PATH
 
     def _conn(self):
-        conn = sqlite3.connect(self._db_path, timeout=10)
-        conn.row_factory = sqlite3.Row
-        return conn
+        return get_conn(self._db_path)
 
     # ── Query management ──────────────────────────────────────────────────────
 
@@ -1,27 +1,33 @@
+import asyncio
 import json
 import logging
-from typing import Any, Dict
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
 
 import anthropic
 
 from app.models.crawl import CrawlResult
+from app.services.boilerplate import strip_boilerplate
+from app.services.chunk_index import ChunkIndex, render
+from app.services.llm_cache import content_hash, get_llm_cache
 
 logger = logging.getLogger(__name__)
 
 # ── Prompts ──────────────────────────────────────────────────────────────────
 # Each targets one section of the schema. Haiku for structured extraction,
 # Sonnet for sections requiring genuine product comprehension.
+# Instructions only: the page corpus goes ahead of them in its own content
+# block (see ComprehensionService._run_pass), so they are not format strings.
 
 METADATA_PROMPT = """
-You are extracting structured business information from website content.
+You are extracting structured business information from the website content above.
 Extract ONLY what is explicitly stated. Use null for unknown fields.
 Return valid JSON only — no explanation, no markdown fences.
 
-Website content (multiple pages):
-{content}
-
 Return this exact JSON structure:
-{{
+{
   "name": "Company/product name",
   "description": "One sentence value proposition (what it does and for whom)",
   "category": "One of: fintech|devtools|ai|analytics|infrastructure|ecommerce|hr|crm|security|communication|productivity|other",
@@ -38,59 +44,55 @@ Return this exact JSON structure:
   "auth_methods": ["api_key", "oauth2", "basic_auth"],
   "auth_notes": "How auth works in one sentence or null",
   "sdks": [
-    {{"language": "Python", "package_name": "stripe", "install_command": "pip install stripe", "docs_url": null}}
+    {"language": "Python", "package_name": "stripe", "install_command": "pip install stripe", "docs_url": null}
   ],
   "webhooks_supported": false,
   "webhook_docs_url": null,
   "status_page_url": "https://status.example.com or null",
   "pricing_page_url": "https://example.com/pricing or null",
   "openapi_url": null
-}}
+}
 """
 
 CAPABILITIES_PROMPT = """
 You are a technical analyst identifying what problems this product solves for developers and businesses.
 An AI agent will read your output to decide whether to use this service.
 Be concrete. Focus on what the service DOES, not marketing language.
+Base your answer on the website content above.
 Return valid JSON array only — no explanation, no markdown fences.
 
-Website content:
-{content}
-
 Return a JSON array of capabilities. Max 8. Each item:
-{{
+{
   "name": "Short capability name (2-5 words)",
   "description": "What it does in one concrete sentence",
   "category": "core|addon|enterprise",
   "problems_solved": ["Problem 1 (specific)", "Problem 2"],
-  "inputs": {{
+  "inputs": {
     "required": ["param1", "param2"],
     "optional": ["param3"]
-  }},
-  "outputs": {{
+  },
+  "outputs": {
     "success": ["result1", "result2"],
     "failure": ["error_code", "error_message"]
-  }},
+  },
   "constraints": ["Any hard limitations specific to this capability"],
   "use_cases": ["Concrete use case 1", "Concrete use case 2"]
-}}
+}
 """
 
 PRICING_PROMPT = """
-Extract pricing information from this content. Be precise about numbers.
+Extract pricing information from the pricing page above (and the rest of the
+website content). Be precise about numbers.
 Use null for truly unknown values. Do NOT hallucinate prices.
 Return valid JSON only — no explanation, no markdown fences.
 
-Content:
-{content}
-
 Return:
-{{
+{
   "model": "per_transaction|subscription|usage_based|freemium|free|contact_sales|unknown",
   "has_free_tier": true,
   "contact_sales_required": false,
   "tiers": [
-    {{
+    {
       "name": "Starter",
       "price_per_unit": 29.00,
       "unit": "per_month|per_seat|per_transaction|per_call|per_1k_tokens|other",
@@ -98,50 +100,161 @@ Return:
       "currency": "USD",
       "contact_sales": false,
       "description": "Human-readable summary of what this tier includes"
-    }}
+    }
   ],
   "free_tier_details": "What the free tier includes, or null",
   "pricing_page_url": "https://... or null",
   "pricing_notes": "Important caveats (e.g. annual billing required, regional pricing) or null"
-}}
+}
 """
 
 LIMITATIONS_PROMPT = """
-Extract operational constraints, limitations, and restrictions from this content.
+Extract operational constraints, limitations, and restrictions from the website content above.
 An AI agent needs this to know what it cannot do with this service.
 Be precise. Use empty arrays for unknown fields. Do NOT make up limits.
 Return valid JSON only — no explanation, no markdown fences.
 
-Content:
-{content}
-
 Return:
-{{
+{
   "rate_limits": [
-    {{"scope": "API requests", "limit": 100, "window": "per_second", "notes": "..."}}
+    {"scope": "API requests", "limit": 100, "window": "per_second", "notes": "..."}
   ],
   "geographic_restrictions": [
-    {{
+    {
       "type": "availability",
       "regions_available": ["US", "EU", "UK"],
       "regions_restricted": ["CN", "RU"],
       "notes": "Additional notes or null"
-    }}
+    }
   ],
-  "data_formats": {{
+  "data_formats": {
     "input": ["JSON", "XML", "CSV"],
     "output": ["JSON"],
     "encoding": "UTF-8"
-  }},
+  },
   "sla_uptime_percent": 99.9,
   "known_constraints": [
     "Maximum file size 100MB",
     "Webhooks require HTTPS endpoints"
   ]
-}}
+}
 """
 
 
+class _LLMBudget:
+    """
+    Process-wide cap on in-flight Anthropic calls. The API loop's job workers
+    and the scheduler's refresh loop (a different thread and event loop) draw
+    on the same slots, so asyncio.Semaphore — bound to one loop — won't do:
+    waiters are futures on their own loop, granted via call_soon_threadsafe.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._free = limit
+        self._lock = threading.Lock()
+        self._waiters: Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+
+    async def __aenter__(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._free > 0 and not self._waiters:
+                self._free -= 1
+                return
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    raise
+            # A slot was already handed over: give it back (unless _grant will)
+            if not waiter[1].cancelled():
+                self._release()
+            raise
+
+    async def __aexit__(self, *exc):
+        self._release()
+
+    def _release(self):
+        with self._lock:
+            while self._waiters:
+                loop, fut = self._waiters.popleft()
+                try:
+                    loop.call_soon_threadsafe(self._grant, fut)
+                    return
+                except RuntimeError:
+                    continue  # waiter's loop has closed
+            self._free += 1
+
+    def _grant(self, fut: asyncio.Future):
+        if fut.cancelled():
+            self._release()
+        else:
+            fut.set_result(None)
+
+    def in_use(self) -> int:
+        with self._lock:
+            return self.limit - self._free
+
+
+_llm_budget: Optional[_LLMBudget] = None
+
+
+def _llm_slots() -> _LLMBudget:
+    """Slots capping concurrent Anthropic calls across the whole process."""
+    global _llm_budget
+    if _llm_budget is None:
+        from app.config import settings
+        _llm_budget = _LLMBudget(max(1, settings.llm_max_concurrency))
+    return _llm_budget
+
+
+# What each pass looks for — BM25 queries used to pick its share of the corpus
+PASS_QUERIES = {
+    "metadata": [
+        "about company founded headquarters team mission customers",
+        "api docs documentation reference base url endpoint version",
+        "authentication api key oauth token",
+        "sdk library install pip npm gem package client",
+        "webhooks status support contact",
+    ],
+    "capabilities": [
+        "features product platform solution use cases",
+        "api endpoints integrate integration workflow automate",
+        "create manage send process track analyze",
+        "developers build customers businesses",
+    ],
+    "pricing": [
+        "pricing price plans plan tier per month year seat usage",
+        "free trial tier enterprise contact sales billing",
+        "$ usd eur cost discount annual",
+    ],
+    "limitations": [
+        "rate limit limits quota requests per second minute throttling",
+        "maximum max size timeout restriction restricted",
+        "regions countries available availability compliance gdpr",
+        "sla uptime status format json xml csv encoding",
+    ],
+}
+
+# Token counters summed per job from each response's usage block
+_USAGE_FIELDS = (
+    "input_tokens", "cache_creation_input_tokens", "cache_read_input_tokens", "output_tokens",
+)
+
+# Part of every LLM cache key — bump a pass's version whenever its prompt
+# template changes, so responses to the old wording are no longer served.
+PROMPT_VERSIONS = {
+    "metadata": 2,
+    "capabilities": 2,
+    "pricing": 2,
+    "limitations": 2,
+}
+
+
 class ComprehensionService:
     """
     Four-pass LLM pipeline to extract CapabilityRegistry fields from crawled content.
@@ -151,93 +264,207 @@ class ComprehensionService:
     Pass 3 (Haiku):  Pricing — structured extraction from pricing page
     Pass 4 (Sonnet): Limitations — requires inferencing from scattered content
 
+    Request layout: [page corpus][pass-specific page, if any][instructions].
+    Each model's corpus is the crawl's most relevant chunks for its passes
+    (BM25 over PASS_QUERIES, see chunk_index) within a token budget.
+    Passes on the same model share that corpus, marked for prompt caching —
+    the first pass per model is streamed, and its sibling starts as soon as
+    that response begins (message_start: the prefix is cached by then), so
+    it reads the corpus at the cached rate while both generate in parallel.
+    Wall time is about one corpus prefill plus the slowest pass. Both models'
+    passes run concurrently on AsyncAnthropic (capped by
+    settings.llm_max_concurrency).
+
     Estimated cost: ~$0.01-0.05 per domain crawl.
     """
 
     def __init__(self):
         from app.config import settings
-        self.client = anthropic.Anthropic(api_key=settings.anthropic_api_key)
+        self.client = anthropic.AsyncAnthropic(api_key=settings.anthropic_api_key)
         self.fast_model = settings.fast_model
         self.deep_model = settings.deep_model
 
-    async def extract(self, crawl_result: CrawlResult) -> Dict[str, Any]:
+    async def extract(self, crawl_result: CrawlResult, job_id: Optional[str] = None) -> Dict[str, Any]:
         """
         Run full extraction pipeline.
-        Returns raw dict; registry_builder.py normalizes to schema.
+        Returns raw dict; registry_builder.py normalizes to schema, plus
+        pass_latency_ms (per pass, wall clock including any wait for a slot)
+        and token_usage (summed over the passes, incl. prompt-cache tokens),
+        and boilerplate_bytes_removed (site chrome dropped before selection).
         """
-        full_content = self._prepare_content(crawl_result)
-        pricing_content = self._get_pricing_content(crawl_result)
-
-        # Pass 1: Haiku — metadata + integration (fast structured fields)
-        logger.info(f"[{crawl_result.domain}] Pass 1/4: metadata (haiku)")
-        metadata_raw = self._call_llm(
-            model=self.fast_model,
-            prompt=METADATA_PROMPT.format(content=full_content[:30_000]),
-            max_tokens=2000,
-        )
+        from app.config import settings
 
-        # Pass 2: Sonnet — capabilities (requires product comprehension)
-        logger.info(f"[{crawl_result.domain}] Pass 2/4: capabilities (sonnet)")
-        capabilities_raw = self._call_llm(
-            model=self.deep_model,
-            prompt=CAPABILITIES_PROMPT.format(content=full_content[:60_000]),
-            max_tokens=3000,
+        tag = job_id or crawl_result.domain
+        pages, boilerplate_bytes = strip_boilerplate(
+            crawl_result.pages, settings.comprehension_boilerplate_share,
         )
-
-        # Pass 3: Haiku — pricing (structured extraction)
-        logger.info(f"[{crawl_result.domain}] Pass 3/4: pricing (haiku)")
-        pricing_raw = self._call_llm(
-            model=self.fast_model,
-            prompt=PRICING_PROMPT.format(content=pricing_content),
-            max_tokens=1500,
+        if boilerplate_bytes:
+            crawl_result = crawl_result.model_copy(update={"pages": pages})
+            logger.info(f"[{tag}] Boilerplate: removed {boilerplate_bytes} bytes repeated across pages")
+        pricing_page = self._get_pricing_page(crawl_result)
+
+        # Each model gets one corpus, selected for all of its passes' queries;
+        # its passes send it as an identical, cache_control-marked prefix
+        # block, so the second pass reads it back.
+        index = ChunkIndex(crawl_result.pages)
+        fast_corpus = self._prepare_content(
+            index, ("metadata", "pricing"), settings.comprehension_fast_token_budget,
         )
-
-        # Pass 4: Sonnet — limitations (requires inferencing)
-        logger.info(f"[{crawl_result.domain}] Pass 4/4: limitations (sonnet)")
-        limitations_raw = self._call_llm(
-            model=self.deep_model,
-            prompt=LIMITATIONS_PROMPT.format(content=full_content[:40_000]),
-            max_tokens=1500,
+        deep_corpus = self._prepare_content(
+            index, ("capabilities", "limitations"), settings.comprehension_deep_token_budget,
+        )
+        logger.info(
+            f"[{tag}] Corpus: {len(index.chunks)} chunks; "
+            f"fast={len(fast_corpus)} chars, deep={len(deep_corpus)} chars"
+        )
+        passes = [
+            # Pass 1: Haiku — metadata + integration (fast structured fields)
+            ("metadata", self.fast_model, fast_corpus, None, METADATA_PROMPT, 2000),
+            # Pass 2: Sonnet — capabilities (requires product comprehension)
+            ("capabilities", self.deep_model, deep_corpus, None, CAPABILITIES_PROMPT, 3000),
+            # Pass 3: Haiku — pricing (structured extraction)
+            ("pricing", self.fast_model, fast_corpus, pricing_page, PRICING_PROMPT, 1500),
+            # Pass 4: Sonnet — limitations (requires inferencing)
+            ("limitations", self.deep_model, deep_corpus, None, LIMITATIONS_PROMPT, 1500),
+        ]
+
+        # Passes sharing a (model, corpus) prefix: the first writes the prompt
+        # cache, the rest start as soon as its response begins and run
+        # alongside it. Groups run concurrently.
+        groups: Dict[tuple, list] = {}
+        for n, spec in enumerate(passes, 1):
+            groups.setdefault((spec[1], spec[2]), []).append((n,) + spec)
+
+        async def run_group(group: list) -> list:
+            if len(group) == 1:
+                return [await self._run_pass(tag, *group[0])]
+            primed = asyncio.Event()
+
+            async def sibling(spec: tuple):
+                await primed.wait()
+                return await self._run_pass(tag, *spec, cached_prefix=True)
+
+            return list(await asyncio.gather(
+                self._run_pass(tag, *group[0], cached_prefix=True, primed=primed),
+                *(sibling(spec) for spec in group[1:]),
+            ))
+
+        start = time.monotonic()
+        grouped = await asyncio.gather(*(run_group(g) for g in groups.values()))
+        results = {r[0]: r for group in grouped for r in group}
+        results = [results[name] for name, *_ in passes]
+
+        latency = {name: ms for name, _, ms, _ in results}
+        usage = {key: sum(u.get(key, 0) for *_, u in results) for key in _USAGE_FIELDS}
+        total_ms = round((time.monotonic() - start) * 1000)
+        per_pass = ", ".join(f"{k}={v}ms" for k, v in latency.items())
+        logger.info(f"[{tag}] Comprehension done in {total_ms}ms ({per_pass})")
+        logger.info(
+            f"[{tag}] LLM tokens: input={usage['input_tokens']} "
+            f"cache_write={usage['cache_creation_input_tokens']} "
+            f"cache_read={usage['cache_read_input_tokens']} output={usage['output_tokens']}"
         )
 
-        return {
-            "metadata": metadata_raw,
-            "capabilities": capabilities_raw,
-            "pricing": pricing_raw,
-            "limitations": limitations_raw,
-            "pages_crawled": crawl_result.total_pages,
-        }
-
-    def _prepare_content(self, crawl_result: CrawlResult) -> str:
-        """Concatenate all pages with URL headers for LLM context."""
-        parts = []
-        for page in crawl_result.pages:
-            parts.append(f"=== PAGE: {page.url} ===\n{page.text[:5_000]}")
-        return "\n\n".join(parts)
+        raw: Dict[str, Any] = {name: value for name, value, _, _ in results}
+        raw["pages_crawled"] = crawl_result.total_pages
+        raw["pass_latency_ms"] = latency
+        raw["token_usage"] = usage
+        raw["boilerplate_bytes_removed"] = boilerplate_bytes
+        return raw
+
+    async def _run_pass(
+        self,
+        tag: str,
+        n: int,
+        name: str,
+        model: str,
+        corpus: str,
+        extra: Optional[str],
+        instructions: str,
+        max_tokens: int,
+        cached_prefix: bool = False,
+        primed: Optional[asyncio.Event] = None,
+    ):
+        """
+        One pass → (name, parsed result, latency ms, token usage). Served from
+        the LLM cache when this exact content was seen before; otherwise runs
+        under the concurrency limit and caches a successfully parsed result.
+        primed is set once siblings sharing the prefix may start: when the
+        response begins, or when the pass ends without one.
+        """
+        try:
+            start = time.monotonic()
+            cache = get_llm_cache()
+            cache_key = (model, name, PROMPT_VERSIONS[name], content_hash(f"{corpus}\0{extra or ''}"))
+            value = await asyncio.to_thread(cache.get, *cache_key)  # SQLite: keep it off the loop
+            if value is not None:
+                logger.info(f"[{tag}] Pass {n}/4: {name} served from cache")
+                return name, value, round((time.monotonic() - start) * 1000), {}
+
+            corpus_block = {"type": "text", "text": f"Website content (multiple pages):\n{corpus}"}
+            if cached_prefix:
+                corpus_block["cache_control"] = {"type": "ephemeral"}
+            blocks = [corpus_block]
+            if extra:
+                blocks.append({"type": "text", "text": extra})
+            blocks.append({"type": "text", "text": instructions.strip()})
+
+            async with _llm_slots():
+                logger.info(f"[{tag}] Pass {n}/4: {name} ({model})")
+                value, usage = await self._call_llm(
+                    model=model, blocks=blocks, max_tokens=max_tokens, cache_key=cache_key, started=primed,
+                )
+            ms = round((time.monotonic() - start) * 1000)
+            logger.info(
+                f"[{tag}] Pass {n}/4: {name} finished in {ms}ms "
+                f"(cache_write={usage.get('cache_creation_input_tokens', 0)}, "
+                f"cache_read={usage.get('cache_read_input_tokens', 0)})"
+            )
+            return name, value, ms, usage
+        finally:
+            if primed is not None:
+                primed.set()
 
-    def _get_pricing_content(self, crawl_result: CrawlResult) -> str:
-        """Prefer pricing page; fall back to full content."""
+    def _prepare_content(self, index: ChunkIndex, passes: Tuple[str, ...], budget_tokens: int) -> str:
+        """Best-matching chunks for these passes' queries, with URL headers, in page order."""
+        queries = [q for name in passes for q in PASS_QUERIES[name]]
+        return render(index.select(queries, budget_tokens))
+
+    def _get_pricing_page(self, crawl_result: CrawlResult) -> Optional[str]:
+        """
+        Full text of the pricing page, if one was crawled. Sent after the
+        shared corpus (which only holds its best chunks); without one the
+        pricing pass works from the corpus alone.
+        """
         for page in crawl_result.pages:
             if any(kw in page.url.lower() for kw in ["/pricing", "/price", "/plans"]):
-                full = f"=== PRICING PAGE: {page.url} ===\n{page.text}"
-                # Include homepage too for context
-                if crawl_result.pages:
-                    full += f"\n\n=== HOMEPAGE ===\n{crawl_result.pages[0].text[:3_000]}"
-                return full
-        # Fallback: first 20k of full content
-        return self._prepare_content(crawl_result)[:20_000]
-
-    def _call_llm(self, model: str, prompt: str, max_tokens: int) -> Any:
+                return f"=== PRICING PAGE: {page.url} ===\n{page.text}"
+        return None
+
+    async def _call_llm(
+        self, model: str, blocks: List[Dict[str, Any]], max_tokens: int, cache_key: Optional[tuple] = None,
+        started: Optional[asyncio.Event] = None,
+    ) -> Tuple[Any, Dict[str, int]]:
         """
-        Call Claude synchronously (Anthropic SDK is sync).
-        Parse JSON response. Return empty fallback on failure — never raises.
+        Call Claude without blocking the event loop → (parsed JSON, token usage).
+        Return empty fallback on failure — never raises.
+        With cache_key, a successfully parsed response is stored in the LLM cache.
+        With started, the response is streamed and the event set on
+        message_start — the prompt prefix is in the cache from that point.
         """
+        usage: Dict[str, int] = {}
+        prompt = blocks[-1]["text"]
+        request = dict(model=model, max_tokens=max_tokens, messages=[{"role": "user", "content": blocks}])
         try:
-            message = self.client.messages.create(
-                model=model,
-                max_tokens=max_tokens,
-                messages=[{"role": "user", "content": prompt}],
-            )
+            if started is None:
+                message = await self.client.messages.create(**request)
+            else:
+                async with self.client.messages.stream(**request) as stream:
+                    async for event in stream:
+                        if event.type == "message_start":
+                            started.set()
+                    message = await stream.get_final_message()
+            usage = {key: getattr(message.usage, key, None) or 0 for key in _USAGE_FIELDS}
             content = message.content[0].text.strip()
 
             # Strip markdown code fences if model wraps response
@@ -249,14 +476,17 @@ class ComprehensionService:
                         content = content[4:]
                     content = content.strip()
 
-            return json.loads(content)
+            value = json.loads(content)
+            if cache_key is not None:
+                await asyncio.to_thread(get_llm_cache().put, *cache_key, value)
+            return value, usage
 
         except json.JSONDecodeError as e:
             logger.warning(f"JSON parse error from {model}: {e}")
-            return {} if "PROMPT" not in prompt or "array" not in prompt else []
+            return ({} if "PROMPT" not in prompt or "array" not in prompt else []), usage
         except anthropic.APIError as e:
             logger.error(f"Anthropic API error ({model}): {e}")
-            return {}
+            return {}, usage
         except Exception as e:
             logger.error(f"LLM call failed ({model}): {e}", exc_info=True)
-            return {}
+            return {}, usage
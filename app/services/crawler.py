@@ -10,6 +10,8 @@ Uses Firecrawl's /crawl endpoint to:
 Falls back to lightweight httpx+BS4 crawler if Firecrawl key is not configured.
 """
 import asyncio
+import hashlib
+import re
 import time
 import logging
 from urllib.parse import urljoin, urlparse
@@ -38,6 +40,20 @@ REQUEST_TIMEOUT = 10.0
 CONCURRENCY = 4
 CRAWLER_UA = "CapabilityRegistry-Crawler/1.0 (+https://capabilityregistry.ai/bot)"
 
+_WS_RE = re.compile(r"\s+")
+
+
+def content_fingerprint(pages: List[PageContent]) -> str:
+    """
+    SHA-256 over each page's URL and whitespace-collapsed text, in URL order,
+    so re-crawls that only differ in page order or formatting match.
+    """
+    h = hashlib.sha256()
+    for page in sorted(pages, key=lambda p: p.url):
+        h.update(page.url.encode("utf-8") + b"\0")
+        h.update(_WS_RE.sub(" ", page.text or "").strip().encode("utf-8") + b"\0")
+    return h.hexdigest()
+
 
 class CrawlerService:
     """
@@ -0,0 +1,148 @@
+"""
+Shared SQLite connection pool.
+
+Every service used to open a fresh sqlite3 connection per method call, in the
+default rollback-journal mode with no busy timeout. Under push + analytics load
+that meant thousands of open/close cycles and journal fsyncs per second, and
+"database is locked" errors whenever two writers overlapped.
+
+This module keeps ONE connection per (thread, database file) and configures it
+once on open:
+  - journal_mode=WAL      readers never block the writer (and vice versa)
+  - synchronous=NORMAL    fsync on checkpoint only — safe with WAL
+  - busy_timeout          writers wait instead of failing with "locked"
+  - cache_size / mmap     keep hot pages in memory
+
+Usage is unchanged for callers — the connection still works as a context
+manager (`with get_conn(path) as conn:` commits or rolls back the transaction),
+it just isn't thrown away afterwards.
+
+Each thread's connections hang off a holder in a threading.local. When the
+thread exits its holder is released and a finalizer closes them, so worker
+threads that come and go (to_thread pools, the scheduler) don't leave open
+handles behind until shutdown.
+
+Tuning lives in app/config.py (sqlite_* settings).
+"""
+import os
+import sqlite3
+import logging
+import threading
+import weakref
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+
+class _ThreadConns:
+    """One thread's pooled connections, keyed by database path."""
+    __slots__ = ("conns", "__weakref__")
+
+    def __init__(self):
+        self.conns: Dict[str, sqlite3.Connection] = {}
+
+
+_local = threading.local()
+_holders: "weakref.WeakSet[_ThreadConns]" = weakref.WeakSet()
+_all_lock = threading.Lock()
+
+
+def _close_conns(conns: Dict[str, sqlite3.Connection]) -> int:
+    closed = 0
+    for conn in list(conns.values()):
+        try:
+            conn.close()
+            closed += 1
+        except Exception:
+            pass
+    conns.clear()
+    return closed
+
+
+def _thread_conns() -> _ThreadConns:
+    holder = getattr(_local, "holder", None)
+    if holder is None:
+        holder = _local.holder = _ThreadConns()
+        with _all_lock:
+            _holders.add(holder)
+        # Runs when the thread exits and threading.local drops the holder
+        weakref.finalize(holder, _close_conns, holder.conns)
+    return holder
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    from app.config import settings
+
+    db_dir = os.path.dirname(db_path)
+    if db_dir:
+        os.makedirs(db_dir, exist_ok=True)
+
+    conn = sqlite3.connect(
+        db_path,
+        timeout=settings.sqlite_busy_timeout_ms / 1000,
+        # Each connection is only ever used by the thread that opened it;
+        # this just lets close_all() / the thread-exit finalizer close them
+        # from another thread.
+        check_same_thread=False,
+    )
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA busy_timeout = {int(settings.sqlite_busy_timeout_ms)}")
+    conn.execute(f"PRAGMA journal_mode = {settings.sqlite_journal_mode}")
+    conn.execute(f"PRAGMA synchronous = {settings.sqlite_synchronous}")
+    # Negative cache_size = KiB rather than pages
+    conn.execute(f"PRAGMA cache_size = -{int(settings.sqlite_cache_size_kb)}")
+    conn.execute(f"PRAGMA mmap_size = {int(settings.sqlite_mmap_size_mb) * 1024 * 1024}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+
+    logger.debug(f"Opened SQLite connection: {db_path} (thread {threading.get_ident()})")
+    return conn
+
+
+def get_conn(db_path: str) -> sqlite3.Connection:
+    """
+    Return this thread's connection to db_path, opening it on first use.
+    Never close the returned connection — it is reused by the next call.
+    """
+    conns = _thread_conns().conns
+    conn = conns.get(db_path)
+    if conn is None:
+        conn = _connect(db_path)
+        conns[db_path] = conn
+    return conn
+
+
+def open_reader(db_path: str) -> sqlite3.Connection:
+    """
+    A private, read-only connection outside the pool, for long streaming reads
+    (e.g. exports) whose cursor outlives one call and may be advanced from
+    different worker threads. The caller must close it.
+    """
+    from app.config import settings
+
+    conn = sqlite3.connect(
+        f"file:{db_path}?mode=ro",
+        uri=True,
+        timeout=settings.sqlite_busy_timeout_ms / 1000,
+        check_same_thread=False,
+    )
+    conn.execute(f"PRAGMA busy_timeout = {int(settings.sqlite_busy_timeout_ms)}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    return conn
+
+
+def close_all():
+    """
+    Close every pooled connection, in every thread. Called from app lifespan
+    shutdown. Each thread's slot is emptied too, so a thread that runs again
+    afterwards opens a fresh connection instead of reusing a closed one.
+    """
+    with _all_lock:
+        holders = list(_holders)
+    closed = sum(_close_conns(h.conns) for h in holders)
+    logger.info(f"Closed {closed} pooled SQLite connection(s)")
+
+
+def pool_size() -> int:
+    """Open pooled connections across all live threads."""
+    with _all_lock:
+        return sum(len(h.conns) for h in _holders)
@@ -0,0 +1,147 @@
+"""
+In-process pub/sub of ingest job progress, for GET /api/v1/jobs/{job_id}/events.
+
+The dashboard used to poll GET /jobs/{job_id} every couple of seconds for the
+minute or more a crawl takes — a SQLite read per poll. The job queue and the
+pipelines now publish what happens (claim, stage start / finish with its
+duration, retries, status changes, page counts, completion) here, and the
+events route relays them to the browser as Server-Sent Events.
+
+publish() is thread-safe: each subscriber is an asyncio.Queue fed through its
+own loop's call_soon_threadsafe, so the scheduler's pipeline thread can
+publish too. The last job_events_history events per job are kept so a
+client that connects mid-job catches up first — for job_events_retain_seconds
+after the job finishes, or job_events_stale_seconds after its last event if
+no terminal event ever comes, and for at most job_events_max_jobs jobs.
+
+Events only reach subscribers in the process running the job; the route
+falls back to re-reading the job row while its stream is idle.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_EVENTS = ("complete", "failed")
+
+
+class JobEventBus:
+
+    def __init__(self, history: int = 50, retain_seconds: int = 300,
+                 stale_seconds: int = 3600, max_jobs: int = 1000):
+        self.history = history
+        self.retain_seconds = retain_seconds
+        self.stale_seconds = stale_seconds
+        self.max_jobs = max(1, max_jobs)
+        self._lock = threading.Lock()
+        self._subs: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+        # Least recently active first: publish() moves a job to the end
+        self._history: "OrderedDict[str, Deque[Dict[str, Any]]]" = OrderedDict()
+        self._last_event: Dict[str, float] = {}  # job_id → when it last published
+        self._finished: Dict[str, float] = {}    # job_id → when its terminal event was published
+        self.published = 0
+        self.evicted = 0
+
+    def publish(self, job_id: str, type: str, **data: Any):
+        event = {"job_id": job_id, "type": type, "ts": round(time.time(), 3), **data}
+        now = time.monotonic()
+        with self._lock:
+            self.published += 1
+            if job_id not in self._history:
+                self._history[job_id] = deque(maxlen=self.history)
+            self._history.move_to_end(job_id)
+            self._history[job_id].append(event)
+            self._last_event[job_id] = now
+            if type in TERMINAL_EVENTS:
+                self._finished[job_id] = now
+            subs = list(self._subs.get(job_id, ()))
+            self._prune(now)
+        for loop, queue in subs:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                pass  # subscriber's loop already closed
+
+    async def stream(self, job_id: str, idle_timeout: float) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Events for job_id: the retained history first, then live ones.
+        Yields None after idle_timeout seconds without an event.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        entry = (loop, queue)
+        with self._lock:
+            backlog = list(self._history.get(job_id, ()))
+            self._subs.setdefault(job_id, []).append(entry)
+        try:
+            for event in backlog:
+                yield event
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout=idle_timeout)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            with self._lock:
+                subs = self._subs.get(job_id, [])
+                if entry in subs:
+                    subs.remove(entry)
+                if not subs:
+                    self._subs.pop(job_id, None)
+
+    def _forget(self, job_id: str):
+        self._history.pop(job_id, None)
+        self._last_event.pop(job_id, None)
+        self._finished.pop(job_id, None)
+
+    def _prune(self, now: float):
+        """
+        Forget finished jobs past retention, jobs silent for stale_seconds,
+        and the least recently active beyond max_jobs. Caller holds the lock.
+        """
+        cutoff = now - self.retain_seconds
+        for job_id in [j for j, t in self._finished.items() if t < cutoff]:
+            self._forget(job_id)
+        stale = now - self.stale_seconds
+        while self._history:
+            oldest = next(iter(self._history))
+            if self._last_event[oldest] >= stale and len(self._history) <= self.max_jobs:
+                break
+            self._forget(oldest)
+            self.evicted += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "jobs_tracked": len(self._history),
+                "subscribers": sum(len(s) for s in self._subs.values()),
+                "published": self.published,
+                "evicted": self.evicted,
+            }
+
+
+_job_events: Optional[JobEventBus] = None
+
+
+def publish_status(job) -> None:
+    """Publish an IngestJob's current status and page count; pipelines call it after saving the row."""
+    get_job_events().publish(
+        job.job_id, "status", status=job.status.value, pages_crawled=job.pages_crawled,
+    )
+
+
+def get_job_events() -> JobEventBus:
+    global _job_events
+    if _job_events is None:
+        from app.config import settings
+        _job_events = JobEventBus(
+            history=settings.job_events_history,
+            retain_seconds=settings.job_events_retain_seconds,
+            stale_seconds=settings.job_events_stale_seconds,
+            max_jobs=settings.job_events_max_jobs,
+        )
+    return _job_events
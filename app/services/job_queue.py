@@ -0,0 +1,478 @@
+"""
+Durable ingestion job queue backed by the ingest_jobs table.
+
+/ingest, /admin/refresh and /push used to hand their pipelines to FastAPI
+BackgroundTasks: no limit on how many crawls ran at once, and a restart lost
+every job in flight even though its ingest_jobs row said PENDING or CRAWLING.
+
+Routes now only insert a PENDING row (kind + JSON payload). A fixed pool of
+job_workers asyncio workers claims rows with one atomic UPDATE … RETURNING,
+which takes a lease (lease_owner, lease_expires_at). While a job runs its
+worker renews the lease every third of job_lease_seconds (heartbeat_at); a
+job whose lease lapses — the process died, or was killed mid-crawl — is put
+back to PENDING by whichever worker sweeps next, or FAILED once it has been
+claimed job_max_attempts times. Workers sweep on every poll, and on startup
+rows left in a running status by the pre-queue code are requeued too.
+
+Scheduled refreshes run inline (enqueue(run_inline=True)) rather than through
+a worker. Their rows still carry a lease, owned by this process and renewed
+by inline_lease() with the same heartbeat, so a sweep never mistakes a live
+inline job for an orphan. Inline rows start at job_max_attempts: if the
+process dies mid-refresh the lapsed lease fails the job instead of handing a
+worker a refresh it would run without the scheduler's bookkeeping.
+
+Full ingests are single-flight per domain: a partial unique index allows one
+unfinished kind="ingest" row per domain, so a second /ingest, /admin/refresh
+or scheduled refresh for a domain already in flight inserts nothing and is
+handed the running job instead — across processes, without a lock.
+
+Pipelines are plain coroutines registered per kind (register_handler) and
+wrap each step in run_stage(), which records the current stage on the row
+and retries that step alone, with exponential backoff, up to
+job_stage_retries times.
+
+Counters are reported in /api/v1/admin/stats.
+"""
+import asyncio
+import contextlib
+import inspect
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from app.models.jobs import IngestJob, JobStatus
+from app.services.db import get_conn
+from app.services.job_events import get_job_events
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[IngestJob, Dict[str, Any]], Awaitable[None]]
+
+# Statuses a job passes through while a worker holds it
+_RUNNING = (JobStatus.CRAWLING.value, JobStatus.COMPREHENDING.value, JobStatus.STORING.value)
+_DONE = (JobStatus.COMPLETE.value, JobStatus.FAILED.value)
+
+# Kinds that run at most once per domain at a time (unique index idx_jobs_inflight_domain)
+SINGLE_FLIGHT_KINDS = ("ingest",)
+
+
+def _ms_since(start: float) -> int:
+    return round((time.monotonic() - start) * 1000)
+
+
+class JobQueue:
+
+    def __init__(
+        self,
+        db_path: str,
+        workers: int,
+        lease_seconds: int,
+        poll_interval: float,
+        stage_retries: int,
+        retry_backoff: float,
+        max_attempts: int,
+    ):
+        self.db_path = db_path
+        self.workers = max(1, workers)
+        self.lease_seconds = max(10, lease_seconds)
+        self.poll_interval = poll_interval
+        self.stage_retries = max(0, stage_retries)
+        self.retry_backoff = retry_backoff
+        self.max_attempts = max(1, max_attempts)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.inline_owner = f"{self.owner}/inline"
+
+        self._handlers: Dict[str, Handler] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._wake: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._current: Dict[str, asyncio.Task] = {}   # job_id → running handler
+
+        self.claimed = 0
+        self.completed = 0
+        self.failed = 0
+        self.stage_retried = 0
+        self.reclaimed = 0
+        self.coalesced = 0
+
+    @property
+    def running(self) -> bool:
+        return any(not t.done() for t in self._tasks)
+
+    def register_handler(self, kind: str, handler: Handler):
+        self._handlers[kind] = handler
+
+    # ── Lifecycle ───────────────────────────────────────────────────────────
+
+    async def start(self):
+        """Recover interrupted jobs and start the worker pool. Called from app lifespan."""
+        if self.running:
+            return
+        requeued = await asyncio.to_thread(self._recover_orphans)
+        reclaimed = await asyncio.to_thread(self._reclaim_expired)
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._worker(n), name=f"job-worker-{n}") for n in range(self.workers)
+        ]
+        logger.info(
+            f"Job queue started ({self.workers} workers, lease {self.lease_seconds}s; "
+            f"recovered {requeued + reclaimed} interrupted job(s))"
+        )
+
+    async def stop(self):
+        """Cancel the workers; jobs they were running go back to PENDING for the next start."""
+        if not self._tasks:
+            return
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("Job queue stopped")
+
+    # ── Producer side ───────────────────────────────────────────────────────
+
+    def enqueue(
+        self, job: IngestJob, kind: str, payload: Optional[Dict[str, Any]] = None, run_inline: bool = False,
+    ) -> IngestJob:
+        """
+        Insert a PENDING job row and wake an idle worker. With run_inline the
+        row is inserted as-is (already running), leased to inline_owner, and
+        the caller runs it inside inline_lease().
+
+        Kinds in SINGLE_FLIGHT_KINDS are coalesced per domain: if the domain
+        already has one in flight, nothing is inserted and that job is
+        returned instead — callers must use the returned job_id.
+        """
+        if not run_inline and kind not in self._handlers:
+            raise ValueError(f"No job handler registered for '{kind}'")
+        if not run_inline:
+            job.status = JobStatus.PENDING
+        job.kind = kind
+        now = int(time.time())
+        if run_inline:
+            lease = (self.inline_owner, now + self.lease_seconds, now, self.max_attempts)
+        else:
+            lease = (None, None, None, 0)
+        for _ in range(3):
+            with get_conn(self.db_path) as conn:
+                inserted = conn.execute(
+                    """INSERT INTO ingest_jobs
+                       (job_id, domain, url, status, created_at, kind, payload, available_at,
+                        lease_owner, lease_expires_at, heartbeat_at, attempts)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                       ON CONFLICT DO NOTHING""",
+                    (job.job_id, job.domain, job.url, job.status.value, job.created_at.isoformat(),
+                     kind, json.dumps(payload or {}), now) + lease
+                ).rowcount
+                if inserted:
+                    break
+                if kind not in SINGLE_FLIGHT_KINDS:
+                    raise ValueError(f"Job {job.job_id} already exists")
+                row = conn.execute(
+                    """SELECT * FROM ingest_jobs
+                       WHERE domain = ? AND kind = ? AND status NOT IN (?, ?)""",
+                    (job.domain, kind) + _DONE
+                ).fetchone()
+            if row is not None:
+                self.coalesced += 1
+                logger.info(f"[{row['job_id']}] {job.domain} already in flight — coalesced {job.job_id}")
+                return IngestJob(**{k: row[k] for k in row.keys() if k in IngestJob.model_fields})
+            # The running job finished between the INSERT and the SELECT — try again
+        else:
+            raise RuntimeError(f"Could not enqueue job for {job.domain}")
+        if not run_inline:
+            self._notify()
+        return job
+
+    @contextlib.asynccontextmanager
+    async def inline_lease(self, job: IngestJob) -> AsyncIterator[None]:
+        """
+        Keep the lease of a job enqueued with run_inline alive while the
+        caller runs it; the calling task is cancelled if the lease is lost.
+        The lease is dropped on exit — the caller settles the status.
+        """
+        heartbeat = asyncio.create_task(self._heartbeat(job.job_id, self.inline_owner, asyncio.current_task()))
+        try:
+            yield
+        finally:
+            heartbeat.cancel()
+            await asyncio.to_thread(self._drop_lease, job.job_id, self.inline_owner)
+
+    def _notify(self):
+        """Wake a waiting worker; safe to call from any thread."""
+        if self._wake is None or self._loop is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._wake.set()
+        else:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    # ── Workers ─────────────────────────────────────────────────────────────
+
+    async def _worker(self, n: int):
+        owner = f"{self.owner}/{n}"
+        while True:
+            try:
+                await asyncio.to_thread(self._reclaim_expired)
+                row = await asyncio.to_thread(self._claim, owner)
+            except Exception as e:
+                logger.error(f"Job queue poll failed: {e}")
+                row = None
+            if row is None:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+                continue
+            await self._run(row, owner)
+
+    async def _run(self, row: Dict[str, Any], owner: str):
+        job_id = row["job_id"]
+        handler = self._handlers.get(row["kind"])
+        job = IngestJob(**{k: v for k, v in row.items() if k in IngestJob.model_fields})
+        payload = json.loads(row["payload"] or "{}")
+        events = get_job_events()
+        self.claimed += 1
+        logger.info(f"[{job_id}] Claimed {row['kind']} job for {row['domain']} (attempt {row['attempts']})")
+        events.publish(job_id, "claimed", kind=row["kind"], domain=row["domain"], attempt=row["attempts"])
+
+        if handler is None:
+            error = f"No handler for job kind '{row['kind']}'"
+            await asyncio.to_thread(self._finish, job_id, owner, error)
+            events.publish(job_id, "failed", error=error)
+            self.failed += 1
+            return
+
+        start = time.monotonic()
+
+        task = asyncio.create_task(handler(job, payload))
+        self._current[job_id] = task
+        heartbeat = asyncio.create_task(self._heartbeat(job_id, owner, task))
+        try:
+            await task
+        except asyncio.CancelledError:
+            if not heartbeat.done():
+                # Shutdown, not a job failure: hand it back without spending an attempt
+                await asyncio.to_thread(self._release, job_id, owner)
+                events.publish(job_id, "requeued", reason="shutdown")
+                raise
+            logger.warning(f"[{job_id}] Abandoned — lease was taken over")
+            return
+        except Exception as e:
+            logger.error(f"[{job_id}] Job failed: {e}", exc_info=True)
+            await asyncio.to_thread(self._finish, job_id, owner, str(e))
+            events.publish(job_id, "failed", error=str(e), duration_ms=_ms_since(start))
+            self.failed += 1
+            return
+        finally:
+            heartbeat.cancel()
+            self._current.pop(job_id, None)
+        await asyncio.to_thread(self._finish, job_id, owner, None)
+        events.publish(job_id, "complete", duration_ms=_ms_since(start))
+        self.completed += 1
+
+    async def _heartbeat(self, job_id: str, owner: str, task: asyncio.Task):
+        """Renew the lease while the job runs; cancel it if the lease was lost."""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                renewed = await asyncio.to_thread(self._renew, job_id, owner)
+            except Exception as e:
+                logger.warning(f"[{job_id}] Heartbeat failed: {e}")
+                continue
+            if not renewed:
+                task.cancel()
+                return
+
+    # ── Stages ──────────────────────────────────────────────────────────────
+
+    async def run_stage(self, job: IngestJob, stage: str, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Run one pipeline step (sync or async), recording it as the job's
+        current stage and publishing its start and duration. Retries the
+        step alone with exponential backoff.
+        """
+        events = get_job_events()
+        for attempt in range(self.stage_retries + 1):
+            await asyncio.to_thread(self._set_stage, job.job_id, stage)
+            events.publish(job.job_id, "stage", stage=stage, attempt=attempt + 1)
+            start = time.monotonic()
+            try:
+                result = fn(*args, **kwargs)
+                if inspect.isawaitable(result):
+                    result = await result
+                events.publish(job.job_id, "stage_done", stage=stage, duration_ms=_ms_since(start))
+                return result
+            except Exception as e:
+                if attempt == self.stage_retries:
+                    raise
+                delay = self.retry_backoff * 2 ** attempt
+                self.stage_retried += 1
+                events.publish(job.job_id, "retry", stage=stage, error=str(e), retry_in_s=delay)
+                logger.warning(
+                    f"[{job.job_id}] Stage {stage} failed ({e}); "
+                    f"retry {attempt + 1}/{self.stage_retries} in {delay:g}s"
+                )
+                await asyncio.sleep(delay)
+
+    # ── SQL (run on worker threads) ─────────────────────────────────────────
+
+    def _claim(self, owner: str) -> Optional[Dict[str, Any]]:
+        now = int(time.time())
+        with get_conn(self.db_path) as conn:
+            row = conn.execute(
+                """UPDATE ingest_jobs
+                   SET lease_owner = ?, lease_expires_at = ?, heartbeat_at = ?, attempts = attempts + 1
+                   WHERE job_id = (
+                       SELECT job_id FROM ingest_jobs
+                       WHERE status = 'pending' AND lease_owner IS NULL AND available_at <= ?
+                       ORDER BY created_at LIMIT 1
+                   ) AND lease_owner IS NULL
+                   RETURNING *""",
+                (owner, now + self.lease_seconds, now, now)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def _renew(self, job_id: str, owner: str) -> bool:
+        now = int(time.time())
+        with get_conn(self.db_path) as conn:
+            cur = conn.execute(
+                """UPDATE ingest_jobs SET heartbeat_at = ?, lease_expires_at = ?
+                   WHERE job_id = ? AND lease_owner = ?""",
+                (now, now + self.lease_seconds, job_id, owner)
+            )
+        return cur.rowcount > 0
+
+    def _set_stage(self, job_id: str, stage: str):
+        with get_conn(self.db_path) as conn:
+            conn.execute("UPDATE ingest_jobs SET stage = ? WHERE job_id = ?", (stage, job_id))
+
+    def _finish(self, job_id: str, owner: str, error: Optional[str]):
+        """Release the lease and settle the status: FAILED with error, else COMPLETE."""
+        now = datetime.utcnow().isoformat()
+        with get_conn(self.db_path) as conn:
+            if error is None:
+                conn.execute(
+                    """UPDATE ingest_jobs
+                       SET status = CASE WHEN status IN (?, ?) THEN status ELSE ? END,
+                           completed_at = COALESCE(completed_at, ?),
+                           lease_owner = NULL, lease_expires_at = NULL
+                       WHERE job_id = ? AND lease_owner = ?""",
+                    _DONE + (JobStatus.COMPLETE.value, now, job_id, owner)
+                )
+            else:
+                conn.execute(
+                    """UPDATE ingest_jobs
+                       SET status = ?, error = ?, completed_at = ?,
+                           lease_owner = NULL, lease_expires_at = NULL
+                       WHERE job_id = ? AND lease_owner = ?""",
+                    (JobStatus.FAILED.value, error, now, job_id, owner)
+                )
+
+    def _release(self, job_id: str, owner: str):
+        with get_conn(self.db_path) as conn:
+            conn.execute(
+                """UPDATE ingest_jobs
+                   SET status = 'pending', attempts = MAX(attempts - 1, 0),
+                       lease_owner = NULL, lease_expires_at = NULL
+                   WHERE job_id = ? AND lease_owner = ?""",
+                (job_id, owner)
+            )
+
+    def _drop_lease(self, job_id: str, owner: str):
+        with get_conn(self.db_path) as conn:
+            conn.execute(
+                """UPDATE ingest_jobs SET lease_owner = NULL, lease_expires_at = NULL
+                   WHERE job_id = ? AND lease_owner = ?""",
+                (job_id, owner)
+            )
+
+    def _reclaim_expired(self) -> int:
+        """Requeue (or fail, once out of attempts) jobs whose lease lapsed."""
+        now = int(time.time())
+        with get_conn(self.db_path) as conn:
+            cur = conn.execute(
+                """UPDATE ingest_jobs
+                   SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                       error = CASE WHEN attempts >= ?
+                                    THEN 'Worker lost after ' || attempts || ' attempt(s)' ELSE error END,
+                       completed_at = CASE WHEN attempts >= ? THEN ? ELSE completed_at END,
+                       lease_owner = NULL, lease_expires_at = NULL
+                   WHERE lease_owner IS NOT NULL AND lease_expires_at < ?""",
+                (self.max_attempts, self.max_attempts, self.max_attempts,
+                 datetime.utcnow().isoformat(), now)
+            )
+        if cur.rowcount:
+            self.reclaimed += cur.rowcount
+            logger.warning(f"Job queue: reclaimed {cur.rowcount} job(s) with expired leases")
+        return cur.rowcount
+
+    def _recover_orphans(self) -> int:
+        """Rows left mid-pipeline by the BackgroundTasks era: no lease, never finished."""
+        with get_conn(self.db_path) as conn:
+            cur = conn.execute(
+                f"""UPDATE ingest_jobs SET status = 'pending'
+                    WHERE lease_owner IS NULL AND status IN ({", ".join("?" * len(_RUNNING))})""",
+                _RUNNING
+            )
+        if cur.rowcount:
+            logger.warning(f"Job queue: requeued {cur.rowcount} interrupted job(s)")
+        return cur.rowcount
+
+    def _depth(self) -> Dict[str, int]:
+        with get_conn(self.db_path) as conn:
+            rows = conn.execute(
+                """SELECT lease_owner IS NOT NULL AS leased, COUNT(*) FROM ingest_jobs
+                   WHERE status NOT IN (?, ?) GROUP BY leased""",
+                _DONE
+            ).fetchall()
+        counts = {bool(r[0]): r[1] for r in rows}
+        return {"pending": counts.get(False, 0), "leased": counts.get(True, 0)}
+
+    def stats(self) -> dict:
+        try:
+            depth = self._depth()
+        except Exception:
+            depth = {}
+        return {
+            "running": self.running,
+            "workers": self.workers,
+            "busy": len(self._current),
+            **depth,
+            "claimed": self.claimed,
+            "completed": self.completed,
+            "failed": self.failed,
+            "stage_retried": self.stage_retried,
+            "reclaimed": self.reclaimed,
+            "coalesced": self.coalesced,
+        }
+
+
+_job_queue: Optional[JobQueue] = None
+
+
+def get_job_queue() -> JobQueue:
+    global _job_queue
+    if _job_queue is None:
+        from app.config import settings
+        _job_queue = JobQueue(
+            db_path=settings.database_url,
+            workers=settings.job_workers,
+            lease_seconds=settings.job_lease_seconds,
+            poll_interval=settings.job_poll_interval_seconds,
+            stage_retries=settings.job_stage_retries,
+            retry_backoff=settings.job_retry_backoff_seconds,
+            max_attempts=settings.job_max_attempts,
+        )
+    return _job_queue
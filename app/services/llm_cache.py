@@ -0,0 +1,167 @@
+"""
+Content-addressed cache for comprehension LLM responses.
+
+The scheduler re-runs all four comprehension passes for every registered
+domain each refresh interval, and the push pipeline does it on every changed
+page — even when the crawled text is byte-identical to last time. Each pass
+is a pure function of (model, prompt template, content slice), so its parsed
+JSON is cached under
+
+    (model, pass name, prompt template version, SHA-256 of the content slice)
+
+in the main SQLite database. An unchanged site re-registers without a single
+LLM call; any change to the text, the model or the template (bump its
+version in comprehension.PROMPT_VERSIONS) misses.
+
+Size-bounded: once the table holds more than llm_cache_max_entries rows, the
+least recently used entries are evicted, down to EVICT_SLACK below the bound.
+The row count is read once and then tracked in memory (every store counts as
+a new row), so the table is only re-counted when that running figure crosses
+the bound — about once per EVICT_SLACK share of the bound in writes, not on
+every write.
+Hit / miss / eviction counters are reported in /api/v1/admin/stats.
+
+get() and put() block on SQLite; async callers run them via asyncio.to_thread.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from typing import Any, Optional
+
+from app.services.db import get_conn
+
+logger = logging.getLogger(__name__)
+
+EVICT_SLACK = 0.05  # evict this share of max_entries beyond the excess, so recounts stay rare
+
+CREATE_LLM_CACHE = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    model           TEXT NOT NULL,
+    pass_name       TEXT NOT NULL,
+    prompt_version  INTEGER NOT NULL,
+    content_sha256  TEXT NOT NULL,
+    response        TEXT NOT NULL,      -- parsed JSON, re-serialized
+    created_at      INTEGER NOT NULL,
+    last_used_at    INTEGER NOT NULL,
+    hits            INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (model, pass_name, prompt_version, content_sha256)
+)
+"""
+
+CREATE_LLM_CACHE_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_llm_cache_lru ON llm_cache(last_used_at)",
+]
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+
+    def __init__(self, db_path: str, max_entries: int, enabled: bool = True):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None   # upper bound on rows; None until first counted
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def get(self, model: str, pass_name: str, version: int, sha: str) -> Optional[Any]:
+        """Cached parsed response, or None. A hit refreshes the entry's LRU position."""
+        if not self.enabled:
+            return None
+        key = (model, pass_name, version, sha)
+        try:
+            with get_conn(self.db_path) as conn:
+                row = conn.execute(
+                    """SELECT response FROM llm_cache
+                       WHERE model = ? AND pass_name = ? AND prompt_version = ? AND content_sha256 = ?""",
+                    key
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        """UPDATE llm_cache SET last_used_at = ?, hits = hits + 1
+                           WHERE model = ? AND pass_name = ? AND prompt_version = ? AND content_sha256 = ?""",
+                        (int(time.time()),) + key
+                    )
+        except Exception as e:
+            logger.warning(f"LLM cache read failed: {e}")
+            row = None
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row["response"])
+
+    def put(self, model: str, pass_name: str, version: int, sha: str, value: Any):
+        """Store a successfully parsed response, then evict LRU entries over the bound."""
+        if not self.enabled:
+            return
+        now = int(time.time())
+        excess = 0
+        try:
+            with get_conn(self.db_path) as conn:
+                conn.execute(
+                    """INSERT OR REPLACE INTO llm_cache
+                       (model, pass_name, prompt_version, content_sha256, response, created_at, last_used_at)
+                       VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                    (model, pass_name, version, sha, json.dumps(value), now, now)
+                )
+                with self._lock:
+                    if self._size is not None:
+                        self._size += 1
+                    recount = self._size is None or self._size > self.max_entries
+                if recount:
+                    size = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+                    excess = size - self.max_entries
+                    if excess > 0:
+                        excess += int(self.max_entries * EVICT_SLACK)
+                        conn.execute(
+                            """DELETE FROM llm_cache WHERE rowid IN
+                               (SELECT rowid FROM llm_cache ORDER BY last_used_at LIMIT ?)""",
+                            (excess,)
+                        )
+                    with self._lock:
+                        self._size = size - max(excess, 0)
+        except Exception as e:
+            logger.warning(f"LLM cache write failed: {e}")
+            return
+        with self._lock:
+            self.stores += 1
+            if excess > 0:
+                self.evictions += excess
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "stores": self.stores,
+                "evictions": self.evictions,
+            }
+
+
+_llm_cache: Optional[LLMCache] = None
+
+
+def get_llm_cache() -> LLMCache:
+    global _llm_cache
+    if _llm_cache is None:
+        from app.config import settings
+        _llm_cache = LLMCache(
+            db_path=settings.database_url,
+            max_entries=settings.llm_cache_max_entries,
+            enabled=settings.llm_cache_enabled,
+        )
+    return _llm_cache
@@ -0,0 +1,370 @@
+"""
+Versioned schema migrations.
+
+Services used to run their CREATE TABLE / ALTER TABLE statements from
+__init__, i.e. on every request that built a StorageService or TenantService.
+Schema changes now live here and run ONCE, from the FastAPI lifespan hook,
+before the app starts serving traffic.
+
+Each database file has a `schema_migrations` table recording which versions
+have been applied. A migration is (version, name, apply_fn); apply_fn gets a
+connection inside an open transaction and must be idempotent against databases
+that were created before this runner existed (CREATE ... IF NOT EXISTS, or
+check PRAGMA table_info before ALTER).
+
+Adding a migration: append to MAIN_MIGRATIONS / CITATION_MIGRATIONS with the
+next version number. Never edit or reorder one that has shipped.
+
+Data moves too large to run before serving (e.g. re-encoding agent_events)
+are "online" migrations: the schema step creates the new tables, and a
+background thread started after boot copies rows across in small
+transactions. See start_online_migrations().
+"""
+import logging
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional, Tuple
+
+from app.services.db import get_conn
+
+logger = logging.getLogger(__name__)
+
+Migration = Tuple[int, str, Callable[[sqlite3.Connection], None]]
+
+CREATE_SCHEMA_MIGRATIONS = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version     INTEGER PRIMARY KEY,
+    name        TEXT NOT NULL,
+    applied_at  TEXT NOT NULL
+)
+"""
+
+
+def _column_names(conn: sqlite3.Connection, table: str) -> set:
+    return {r[1] for r in conn.execute(f"PRAGMA table_info({table})").fetchall()}
+
+
+# ── Main DB (settings.database_url) ─────────────────────────────────────────
+
+def _m001_storage_tables(conn):
+    from app.services.storage import (
+        CREATE_REGISTRIES, CREATE_JOBS, CREATE_CRAWL_SCHEDULE, CREATE_PAGE_HASHES,
+    )
+    for ddl in (CREATE_REGISTRIES, CREATE_JOBS, CREATE_CRAWL_SCHEDULE, CREATE_PAGE_HASHES):
+        conn.execute(ddl)
+
+
+def _m002_tenant_tables(conn):
+    from app.services.tenant import (
+        CREATE_TENANTS, CREATE_USAGE_LOG, CREATE_TENANT_DOMAINS,
+        CREATE_MAGIC_TOKENS, CREATE_AUDIT_LOG,
+    )
+    for ddl in (CREATE_TENANTS, CREATE_USAGE_LOG, CREATE_TENANT_DOMAINS,
+                CREATE_MAGIC_TOKENS, CREATE_AUDIT_LOG):
+        conn.execute(ddl)
+
+
+def _m003_tenant_added_columns(conn):
+    """Databases created before password/billing support lack these columns."""
+    from app.services.tenant import TENANT_ADDED_COLUMNS
+    existing = _column_names(conn, "tenants")
+    for col, defn in TENANT_ADDED_COLUMNS:
+        if col not in existing:
+            conn.execute(f"ALTER TABLE tenants ADD COLUMN {col} {defn}")
+
+
+def _m004_analytics_tables(conn):
+    from app.services.analytics import CREATE_AGENT_EVENTS, CREATE_INDEXES
+    conn.execute(CREATE_AGENT_EVENTS)
+    for idx in CREATE_INDEXES:
+        conn.execute(idx)
+
+
+def _m005_analytics_rollups(conn):
+    """
+    Superseded by v6 before it shipped: the text-keyed rollups it built from
+    agent_events were dropped again there, so the version is kept only for
+    numbering and boot does no work on the legacy table.
+    """
+
+
+def _m006_analytics_compact(conn):
+    """
+    Dictionary-encoded analytics tables. Only creates the (empty) new layout —
+    historical rows are moved across in the background after startup by
+    copy_legacy_events(), so a large agent_events table doesn't hold up boot.
+    Drops the text rollups a pre-release v5 may have left behind; the new
+    rollups are rebuilt from raw rows as they are copied.
+    """
+    from app.services.analytics import (
+        CREATE_LOOKUP_TABLES, CREATE_AGENT_HITS, CREATE_HITS_DAILY, CREATE_HITS_HOURLY,
+        CREATE_HITS_INDEXES,
+    )
+    for ddl in CREATE_LOOKUP_TABLES + [CREATE_AGENT_HITS, CREATE_HITS_DAILY, CREATE_HITS_HOURLY]:
+        conn.execute(ddl)
+    for idx in CREATE_HITS_INDEXES:
+        conn.execute(idx)
+    conn.execute("DROP TABLE IF EXISTS agent_events_daily")
+    conn.execute("DROP TABLE IF EXISTS agent_events_hourly")
+
+
+def _m007_analytics_page_sketches(conn):
+    from app.services.analytics import (
+        CREATE_PAGES_HLL, CREATE_PAGES_HLL_INDEXES, backfill_page_sketches,
+    )
+    conn.execute(CREATE_PAGES_HLL)
+    for idx in CREATE_PAGES_HLL_INDEXES:
+        conn.execute(idx)
+    backfill_page_sketches(conn)
+
+
+def _m008_analytics_partitions(conn):
+    from app.services.analytics import partition_existing_hits
+    partition_existing_hits(conn)
+
+
+def _m009_analytics_attention_scores(conn):
+    from app.services.analytics import CREATE_ATTENTION_SCORES
+    conn.execute(CREATE_ATTENTION_SCORES)
+
+
+def _m010_llm_cache(conn):
+    from app.services.llm_cache import CREATE_LLM_CACHE, CREATE_LLM_CACHE_INDEXES
+    conn.execute(CREATE_LLM_CACHE)
+    for idx in CREATE_LLM_CACHE_INDEXES:
+        conn.execute(idx)
+
+
+def _m011_job_boilerplate_bytes(conn):
+    if "boilerplate_bytes_removed" not in _column_names(conn, "ingest_jobs"):
+        conn.execute("ALTER TABLE ingest_jobs ADD COLUMN boilerplate_bytes_removed INTEGER DEFAULT 0")
+
+
+def _m012_job_queue(conn):
+    from app.services.storage import JOB_QUEUE_COLUMNS, CREATE_JOB_QUEUE_INDEXES
+    existing = _column_names(conn, "ingest_jobs")
+    for col, defn in JOB_QUEUE_COLUMNS:
+        if col not in existing:
+            conn.execute(f"ALTER TABLE ingest_jobs ADD COLUMN {col} {defn}")
+    for idx in CREATE_JOB_QUEUE_INDEXES:
+        conn.execute(idx)
+
+
+def _m013_job_single_flight(conn):
+    """Settle duplicate in-flight ingests (newest per domain wins) before the unique index."""
+    from app.services.storage import CREATE_JOB_INFLIGHT_INDEX
+    conn.execute(
+        """UPDATE ingest_jobs
+           SET status = 'failed', error = 'Superseded by a newer job for this domain', completed_at = ?
+           WHERE kind = 'ingest' AND status NOT IN ('complete', 'failed')
+             AND rowid NOT IN (
+                 SELECT MAX(rowid) FROM ingest_jobs
+                 WHERE kind = 'ingest' AND status NOT IN ('complete', 'failed')
+                 GROUP BY domain
+             )""",
+        (datetime.utcnow().isoformat(),)
+    )
+    conn.execute(CREATE_JOB_INFLIGHT_INDEX)
+
+
+def _m014_crawl_schedule(conn):
+    """
+    The scheduler now reads crawl_schedule instead of registries.updated_at.
+    Every registry without a row gets one: due interval after its last
+    update, jittered; overdue ones are spread over the next minimum interval
+    rather than all falling due on the first sweep.
+    """
+    import random
+    from app.config import settings
+    from app.services.storage import (
+        CRAWL_SCHEDULE_ADDED_COLUMNS, CREATE_CRAWL_SCHEDULE_INDEXES, jittered_next_crawl,
+    )
+    existing = _column_names(conn, "crawl_schedule")
+    for col, defn in CRAWL_SCHEDULE_ADDED_COLUMNS:
+        if col not in existing:
+            conn.execute(f"ALTER TABLE crawl_schedule ADD COLUMN {col} {defn}")
+    for idx in CREATE_CRAWL_SCHEDULE_INDEXES:
+        conn.execute(idx)
+
+    now = datetime.utcnow()
+    interval = settings.auto_refresh_interval_hours
+    rows = conn.execute(
+        """SELECT domain, updated_at FROM registries
+           WHERE domain NOT IN (SELECT domain FROM crawl_schedule)"""
+    ).fetchall()
+    for domain, updated_at in rows:
+        next_crawl = jittered_next_crawl(datetime.fromisoformat(updated_at), interval, settings.refresh_jitter)
+        if next_crawl <= now.isoformat():
+            spread = random.uniform(0, settings.refresh_min_interval_hours)
+            next_crawl = (now + timedelta(hours=spread)).isoformat()
+        conn.execute(
+            "INSERT INTO crawl_schedule (domain, last_crawl, next_crawl, interval_hours) VALUES (?, ?, ?, ?)",
+            (domain, updated_at, next_crawl, interval)
+        )
+
+
+def _m015_page_hash_probe(conn):
+    from app.services.storage import PAGE_HASHES_PROBE_COLUMNS
+    existing = _column_names(conn, "page_hashes")
+    for col, defn in PAGE_HASHES_PROBE_COLUMNS:
+        if col not in existing:
+            conn.execute(f"ALTER TABLE page_hashes ADD COLUMN {col} {defn}")
+
+
+def _m016_crawl_schedule_probe(conn):
+    from app.services.storage import CRAWL_SCHEDULE_PROBE_COLUMNS
+    existing = _column_names(conn, "crawl_schedule")
+    for col, defn in CRAWL_SCHEDULE_PROBE_COLUMNS:
+        if col not in existing:
+            conn.execute(f"ALTER TABLE crawl_schedule ADD COLUMN {col} {defn}")
+
+
+MAIN_MIGRATIONS: List[Migration] = [
+    (1, "storage_tables", _m001_storage_tables),
+    (2, "tenant_tables", _m002_tenant_tables),
+    (3, "tenant_added_columns", _m003_tenant_added_columns),
+    (4, "analytics_tables", _m004_analytics_tables),
+    (5, "analytics_rollups", _m005_analytics_rollups),
+    (6, "analytics_compact", _m006_analytics_compact),
+    (7, "analytics_page_sketches", _m007_analytics_page_sketches),
+    (8, "analytics_monthly_partitions", _m008_analytics_partitions),
+    (9, "analytics_attention_scores", _m009_analytics_attention_scores),
+    (10, "llm_cache", _m010_llm_cache),
+    (11, "job_boilerplate_bytes", _m011_job_boilerplate_bytes),
+    (12, "job_queue", _m012_job_queue),
+    (13, "job_single_flight", _m013_job_single_flight),
+    (14, "crawl_schedule", _m014_crawl_schedule),
+    (15, "page_hash_probe", _m015_page_hash_probe),
+    (16, "crawl_schedule_probe", _m016_crawl_schedule_probe),
+]
+
+
+# ── Citations DB (data/citations.db) ────────────────────────────────────────
+
+def _c001_citation_tables(conn):
+    from app.services.citation_tracker import (
+        CREATE_CITATION_QUERIES, CREATE_CITATION_RESULTS, CREATE_CITATION_INDEXES,
+    )
+    conn.execute(CREATE_CITATION_QUERIES)
+    conn.execute(CREATE_CITATION_RESULTS)
+    for idx in CREATE_CITATION_INDEXES:
+        conn.execute(idx)
+
+
+CITATION_MIGRATIONS: List[Migration] = [
+    (1, "citation_tables", _c001_citation_tables),
+]
+
+
+# ── Runner ──────────────────────────────────────────────────────────────────
+
+def migrate(db_path: str, migrations: List[Migration]) -> int:
+    """
+    Apply every migration newer than the DB's current version, each in its
+    own transaction. BEGIN IMMEDIATE takes the write lock up front so two
+    workers booting at once serialize instead of both applying a step.
+    Returns the number of migrations applied.
+    """
+    conn = get_conn(db_path)
+    with conn:
+        conn.execute(CREATE_SCHEMA_MIGRATIONS)
+
+    applied = 0
+    for version, name, apply_fn in sorted(migrations, key=lambda m: m[0]):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            done = conn.execute(
+                "SELECT 1 FROM schema_migrations WHERE version = ?", (version,)
+            ).fetchone()
+            if done:
+                conn.rollback()
+                continue
+            apply_fn(conn)
+            conn.execute(
+                "INSERT INTO schema_migrations (version, name, applied_at) VALUES (?, ?, ?)",
+                (version, name, datetime.utcnow().isoformat()),
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logger.error(f"Migration {version} ({name}) failed on {db_path}", exc_info=True)
+            raise
+        applied += 1
+        logger.info(f"Applied migration {version}: {name} ({db_path})")
+    return applied
+
+
+def current_version(db_path: str) -> int:
+    conn = get_conn(db_path)
+    try:
+        row = conn.execute("SELECT MAX(version) FROM schema_migrations").fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] or 0
+
+
+def run_all():
+    """Bring every Galuli database up to date. Called from app lifespan."""
+    from app.config import settings
+    from app.services.citation_tracker import DEFAULT_DB_PATH as CITATIONS_DB_PATH
+
+    for db_path, migrations in (
+        (settings.database_url, MAIN_MIGRATIONS),
+        (CITATIONS_DB_PATH, CITATION_MIGRATIONS),
+    ):
+        applied = migrate(db_path, migrations)
+        logger.info(
+            f"Schema: {db_path} at v{current_version(db_path)}"
+            + (f" ({applied} applied)" if applied else "")
+        )
+
+
+# ── Online (background) data migrations ─────────────────────────────────────
+
+_online_stop = threading.Event()
+_online_thread: Optional[threading.Thread] = None
+
+
+def _run_online_migrations(db_path: str, batch_size: int, pause: float):
+    from app.services.analytics import AnalyticsService
+
+    svc = AnalyticsService(db_path)
+    moved = 0
+    while not _online_stop.is_set():
+        n = svc.copy_legacy_events(batch_size)
+        if not n:
+            break
+        moved += n
+        # Short pause between chunks so request-path writers get the lock
+        _online_stop.wait(pause)
+    if moved:
+        logger.info(f"Online migration: moved {moved} legacy analytics rows ({db_path})")
+
+
+def start_online_migrations():
+    """Start the background copier. Called from app lifespan after run_all()."""
+    global _online_thread
+    from app.config import settings
+
+    if _online_thread is not None and _online_thread.is_alive():
+        return
+    _online_stop.clear()
+    _online_thread = threading.Thread(
+        target=_run_online_migrations,
+        args=(
+            settings.database_url,
+            settings.analytics_legacy_copy_batch,
+            settings.analytics_legacy_copy_pause_ms / 1000,
+        ),
+        name="online-migrations",
+        daemon=True,
+    )
+    _online_thread.start()
+
+
+def stop_online_migrations():
+    """Ask the copier to stop after its current chunk; it resumes on next boot."""
+    _online_stop.set()
+    if _online_thread is not None:
+        _online_thread.join(timeout=10)
@@ -2,16 +2,30 @@
 Auto-refresh scheduler.
 
 Uses APScheduler to re-crawl registered domains on a schedule.
-Default: every 7 days per domain (configurable).
+
+Each domain's next crawl lives in crawl_schedule.next_crawl; an hourly check
+takes the ones due (an indexed next_crawl <= now query) instead of scanning
+every registry. Intervals start at auto_refresh_interval_hours and adapt per
+domain — shorter when a re-crawl finds changed content, longer when it
+doesn't — and each next_crawl is jittered so domains registered together
+don't keep falling due in the same check.
+
+A due domain is first run past the change probe (app/services/change_probe.py);
+when nothing changed it only gets updated_at bumped and its next crawl
+scheduled, with no crawl or LLM calls.
 
 Integrated into FastAPI lifespan — starts on app boot, stops on shutdown.
 """
 import logging
 from datetime import datetime, timedelta, timezone
+from typing import Optional
 
 logger = logging.getLogger(__name__)
 
 _scheduler = None
+_last_refresh: Optional[dict] = None  # summary of the last stale-domain refresh run
+
+UNCHANGED = "content unchanged"  # _refresh_one's result when the change probe skipped the crawl
 
 
 def start_scheduler():
@@ -22,9 +36,10 @@ def start_scheduler():
         from apscheduler.triggers.interval import IntervalTrigger
 
         _scheduler = BackgroundScheduler(daemon=True)
+        from app.config import settings
         _scheduler.add_job(
             _refresh_stale_domains,
-            trigger=IntervalTrigger(hours=6),  # Check every 6h, re-crawl if >7d stale
+            trigger=IntervalTrigger(minutes=settings.refresh_check_interval_minutes),
             id="refresh_stale_domains",
             replace_existing=True,
             next_run_time=datetime.utcnow() + timedelta(minutes=2),  # First run 2min after boot
@@ -44,7 +59,10 @@ def start_scheduler():
             replace_existing=True,
         )
         _scheduler.start()
-        logger.info("Auto-refresh scheduler started (checks every 6h, re-crawls if >7d stale)")
+        logger.info(
+            f"Auto-refresh scheduler started (checks every {settings.refresh_check_interval_minutes}min "
+            f"for domains due in crawl_schedule)"
+        )
         logger.info("Citation check scheduler started (weekly, Pro tenants)")
         logger.info("Daily usage reset scheduler started (midnight UTC)")
         _scheduler.add_job(
@@ -54,6 +72,24 @@ def start_scheduler():
             replace_existing=True,
         )
         logger.info("Citation purge scheduler started (daily 02:00 UTC, >90 days)")
+        _scheduler.add_job(
+            _enforce_analytics_retention,
+            trigger=CronTrigger(hour=3, minute=0, timezone="UTC"),  # 3am UTC daily
+            id="analytics_retention",
+            replace_existing=True,
+        )
+        logger.info("Analytics retention scheduler started (daily 03:00 UTC, drops expired months)")
+        if settings.analytics_attention_refresh_minutes > 0:
+            _scheduler.add_job(
+                _materialize_attention_scores,
+                trigger=IntervalTrigger(minutes=settings.analytics_attention_refresh_minutes),
+                id="materialize_attention_scores",
+                replace_existing=True,
+                next_run_time=datetime.utcnow() + timedelta(minutes=1),  # First run 1min after boot
+            )
+            logger.info(
+                f"Attention score scheduler started (every {settings.analytics_attention_refresh_minutes}min)"
+            )
     except ImportError:
         logger.warning("APScheduler not installed — auto-refresh disabled. pip install apscheduler")
     except Exception as e:
@@ -70,8 +106,9 @@ def stop_scheduler():
 
 def _refresh_stale_domains():
     """
-    Find domains not crawled in >7 days and re-queue them.
-    Runs in background thread — uses asyncio.run() for async pipeline.
+    Refresh domains whose crawl_schedule.next_crawl has passed, at most
+    refresh_batch_size per check (the rest stay due for the next one).
+    Runs in background thread — one asyncio.run() for the whole sweep.
     """
     import asyncio
     from app.services.storage import StorageService
@@ -79,45 +116,116 @@ def _refresh_stale_domains():
 
     try:
         storage = StorageService()
-        registries = storage.list_registries()
-        stale_threshold = datetime.utcnow() - timedelta(hours=settings.auto_refresh_interval_hours)
-
-        stale = []
-        for r in registries:
-            updated_at = datetime.fromisoformat(r["updated_at"])
-            if updated_at < stale_threshold:
-                stale.append(r["domain"])
+        stale = storage.due_for_crawl(settings.refresh_batch_size)
 
         if not stale:
-            logger.debug("No stale domains to refresh")
+            logger.debug("No domains due for refresh")
             return
 
-        logger.info(f"Refreshing {len(stale)} stale domains: {stale}")
+        logger.info(f"Refreshing {len(stale)} due domains: {stale}")
+        asyncio.run(_refresh_many(stale, storage, settings))
+
+    except Exception as e:
+        logger.error(f"Refresh job error: {e}", exc_info=True)
+
+
+async def _refresh_many(domains: list, storage, settings) -> dict:
+    """
+    Refresh domains concurrently, at most refresh_concurrency at a time; LLM
+    calls across all of them share the process-wide llm_max_concurrency
+    budget. Domains not started by the run deadline are skipped, and ones
+    still running then are cancelled and count as failed. Failed domains
+    are retried after refresh_failure_backoff_hours.
+    """
+    import asyncio
 
-        for domain in stale:
+    global _last_refresh
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    deadline = started + settings.refresh_run_deadline_minutes * 60
+    slots = asyncio.Semaphore(max(1, settings.refresh_concurrency))
+    summary = {"succeeded": [], "unchanged": [], "failed": [], "skipped": []}
+
+    async def refresh(domain: str):
+        async with slots:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                summary["skipped"].append({"domain": domain, "reason": "run deadline reached"})
+                return
             try:
-                asyncio.run(_refresh_one(domain, storage, settings))
+                skipped = await asyncio.wait_for(_refresh_one(domain, storage, settings), timeout=remaining)
+            except asyncio.TimeoutError:
+                logger.error(f"Auto-refresh of {domain} cut off by the run deadline")
+                summary["failed"].append({"domain": domain, "error": "run deadline reached"})
+                storage.defer_crawl(domain, settings.refresh_failure_backoff_hours)
+                return
             except Exception as e:
                 logger.error(f"Auto-refresh failed for {domain}: {e}")
+                summary["failed"].append({"domain": domain, "error": str(e)})
+                storage.defer_crawl(domain, settings.refresh_failure_backoff_hours)
+                return
+            if skipped == UNCHANGED:
+                summary["unchanged"].append(domain)
+            elif skipped:
+                summary["skipped"].append({"domain": domain, "reason": skipped})
+            else:
+                summary["succeeded"].append(domain)
+
+    await asyncio.gather(*(refresh(d) for d in domains))
+
+    summary["duration_s"] = round(loop.time() - started, 1)
+    summary["finished_at"] = datetime.utcnow().isoformat()
+    _last_refresh = summary
+    logger.info(
+        f"Auto-refresh run: {len(summary['succeeded'])} succeeded, {len(summary['unchanged'])} unchanged, "
+        f"{len(summary['failed'])} failed, "
+        f"{len(summary['skipped'])} skipped in {summary['duration_s']}s"
+    )
+    return summary
 
-    except Exception as e:
-        logger.error(f"Refresh job error: {e}", exc_info=True)
 
+async def _refresh_one(domain: str, storage, settings) -> Optional[str]:
+    """
+    Re-run the full ingestion pipeline for one domain, unless the change
+    probe shows the site hasn't changed since the last crawl.
+    Returns why it was skipped (UNCHANGED for the probe), or None once refreshed.
 
-async def _refresh_one(domain: str, storage, settings):
-    """Re-run the full ingestion pipeline for one domain."""
+    Runs its steps through the job queue's run_stage() and publishes status
+    and terminal events like queued ingests do, so /jobs/{job_id}/events
+    works for auto_ jobs too.
+    """
+    import asyncio
+    import time
     import uuid
     from datetime import datetime
     from app.models.jobs import IngestJob, JobStatus
-    from app.services.crawler import CrawlerService
+    from app.services.job_queue import get_job_queue
+    from app.services.job_events import get_job_events, publish_status
+    from app.services.crawler import CrawlerService, content_fingerprint
     from app.services.comprehension import ComprehensionService
     from app.services.registry_builder import RegistryBuilder, calculate_confidence
+    from app.services.change_probe import ChangeProbe
 
     existing = storage.get_registry(domain)
     if not existing:
-        return
+        return "registry deleted"
 
     url = existing.metadata.website_url or f"https://{domain}"
+
+    probe = ChangeProbe(storage)
+    if settings.refresh_probe_enabled:
+        result = await probe.check(domain, url)
+        if not result.changed:
+            storage.touch_registry(domain)
+            storage.record_crawl(domain, None)
+            storage.save_probe_state(domain, result.pages)  # servers may have rotated validators
+            logger.info(
+                f"Auto-refresh of {domain} skipped: unchanged "
+                f"({result.pages_probed} pages probed, {result.not_modified} not modified)"
+            )
+            return UNCHANGED
+        logger.info(f"Change probe for {domain}: {result.reason} — running full refresh")
+
     job_id = f"auto_{uuid.uuid4().hex[:8]}"
 
     job = IngestJob(
@@ -127,38 +235,70 @@ async def _refresh_one(domain: str, storage, settings):
         status=JobStatus.CRAWLING,
         created_at=datetime.utcnow(),
     )
-    storage.save_job(job)
-
-    try:
-        crawler = CrawlerService()
-        crawl = await crawler.crawl(url)
-
-        job.status = JobStatus.COMPREHENDING
+    # Registers the run as this domain's in-flight ingest, unless one already is
+    queue = get_job_queue()
+    running = queue.enqueue(job, "ingest", run_inline=True)
+    if running.job_id != job_id:
+        logger.info(f"Skipping auto-refresh of {domain}: job {running.job_id} already in flight")
+        # Off the due list meanwhile; that job resets next_crawl when it completes
+        storage.defer_crawl(domain, settings.refresh_failure_backoff_hours)
+        return f"job {running.job_id} already in flight"
+
+    events = get_job_events()
+    start = time.monotonic()
+
+    def checkpoint():
         storage.save_job(job)
+        publish_status(job)
+
+    async with queue.inline_lease(job):
+        try:
+            publish_status(job)
+            crawl = await queue.run_stage(job, "crawl", CrawlerService().crawl, url)
+            job.pages_crawled = crawl.total_pages
+            events.publish(job_id, "crawled", pages_crawled=crawl.total_pages)
+
+            job.status = JobStatus.COMPREHENDING
+            checkpoint()
+
+            raw = await queue.run_stage(job, "comprehend", ComprehensionService().extract, crawl, job_id=job_id)
+            job.boilerplate_bytes_removed = raw.get("boilerplate_bytes_removed", 0)
+
+            confidence = calculate_confidence(raw)
+            rb = RegistryBuilder()
+            registry = rb.build(domain, raw, confidence, settings.base_api_url)
+
+            job.status = JobStatus.STORING
+            checkpoint()
+            await queue.run_stage(job, "store", storage.save_registry, registry)
+            changed = storage.record_crawl(domain, content_fingerprint(crawl.pages))
+            if settings.refresh_probe_enabled:
+                try:
+                    await probe.snapshot(domain, url, crawl.pages)
+                except Exception as e:
+                    logger.warning(f"Change probe baseline for {domain} failed: {e}")
 
-        comp = ComprehensionService()
-        raw = await comp.extract(crawl)
-
-        confidence = calculate_confidence(raw)
-        rb = RegistryBuilder()
-        registry = rb.build(domain, raw, confidence, settings.base_api_url)
+            job.status = JobStatus.COMPLETE
+            job.completed_at = datetime.utcnow()
+            job.confidence_score = confidence
+            checkpoint()
+            events.publish(job_id, "complete", duration_ms=round((time.monotonic() - start) * 1000))
 
-        storage.save_registry(registry)
+            logger.info(f"Auto-refreshed {domain} (confidence={confidence}, content_changed={changed})")
+            return None
 
-        job.status = JobStatus.COMPLETE
-        job.completed_at = datetime.utcnow()
-        job.confidence_score = confidence
-        job.pages_crawled = crawl.total_pages
-        storage.save_job(job)
+        except (Exception, asyncio.CancelledError) as e:
+            job.status = JobStatus.FAILED
+            job.error = "Cancelled: refresh run deadline reached" if isinstance(e, asyncio.CancelledError) else str(e)
+            job.completed_at = datetime.utcnow()
+            checkpoint()
+            events.publish(job_id, "failed", error=job.error, duration_ms=round((time.monotonic() - start) * 1000))
+            raise
 
-        logger.info(f"Auto-refreshed {domain} (confidence={confidence})")
 
-    except Exception as e:
-        job.status = JobStatus.FAILED
-        job.error = str(e)
-        job.completed_at = datetime.utcnow()
-        storage.save_job(job)
-        raise
+def refresh_stats() -> Optional[dict]:
+    """Summary of the last stale-domain refresh run (None until one has run)."""
+    return _last_refresh
 
 
 def _reset_daily_usage():
@@ -185,6 +325,27 @@ def _purge_old_citation_results():
         logger.error(f"Citation purge job error: {e}", exc_info=True)
 
 
+def _enforce_analytics_retention():
+    """
+    Daily 03:00 UTC: drop analytics partitions older than
+    analytics_retention_months. Whole-month DROP TABLEs, no row deletes.
+    """
+    from app.services.analytics import AnalyticsService
+    try:
+        AnalyticsService().enforce_retention()
+    except Exception as e:
+        logger.error(f"Analytics retention job error: {e}", exc_info=True)
+
+
+def _materialize_attention_scores():
+    """Recompute every domain's AI Attention Score into analytics_attention_scores."""
+    from app.services.analytics import AnalyticsService
+    try:
+        AnalyticsService().materialize_attention_scores()
+    except Exception as e:
+        logger.error(f"Attention score job error: {e}", exc_info=True)
+
+
 def _run_citation_checks():
     """
     Weekly: run citation checks for all Pro+ tenants with configured queries.
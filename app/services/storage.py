@@ -1,11 +1,12 @@
 import sqlite3
 import json
 import logging
-import os
-from datetime import datetime
+import random
+from datetime import datetime, timedelta
 from typing import Optional, List
 from app.models.registry import CapabilityRegistry
 from app.models.jobs import IngestJob, JobStatus
+from app.services.db import get_conn
 
 logger = logging.getLogger(__name__)
 
@@ -29,29 +30,98 @@ CREATE TABLE IF NOT EXISTS ingest_jobs (
     completed_at TEXT,
     error TEXT,
     pages_crawled INTEGER DEFAULT 0,
-    confidence_score REAL DEFAULT 0.0
+    confidence_score REAL DEFAULT 0.0,
+    boilerplate_bytes_removed INTEGER DEFAULT 0,
+    kind TEXT NOT NULL DEFAULT 'ingest',
+    payload TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    stage TEXT,
+    available_at INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires_at INTEGER,
+    heartbeat_at INTEGER
 )
 """
 
+# Queue columns, added to databases created before the job queue (migration 12)
+JOB_QUEUE_COLUMNS = [
+    ("kind", "TEXT NOT NULL DEFAULT 'ingest'"),
+    ("payload", "TEXT"),
+    ("attempts", "INTEGER NOT NULL DEFAULT 0"),
+    ("stage", "TEXT"),
+    ("available_at", "INTEGER NOT NULL DEFAULT 0"),
+    ("lease_owner", "TEXT"),
+    ("lease_expires_at", "INTEGER"),
+    ("heartbeat_at", "INTEGER"),
+]
+
+CREATE_JOB_QUEUE_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_jobs_claim ON ingest_jobs(status, available_at, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_jobs_lease ON ingest_jobs(lease_expires_at) WHERE lease_owner IS NOT NULL",
+]
+
+# One unfinished full ingest per domain (job_queue.SINGLE_FLIGHT_KINDS)
+CREATE_JOB_INFLIGHT_INDEX = """
+CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_inflight_domain ON ingest_jobs(domain)
+WHERE kind = 'ingest' AND status NOT IN ('complete', 'failed')
+"""
+
 CREATE_CRAWL_SCHEDULE = """
 CREATE TABLE IF NOT EXISTS crawl_schedule (
     domain TEXT PRIMARY KEY,
     last_crawl TEXT NOT NULL,
     next_crawl TEXT NOT NULL,
-    interval_hours INTEGER NOT NULL DEFAULT 168
+    interval_hours INTEGER NOT NULL DEFAULT 168,
+    content_hash TEXT,                  -- fingerprint of the last crawl's page text
+    last_changed TEXT,                  -- last crawl whose fingerprint differed
+    last_probe TEXT,                    -- last change probe that skipped the crawl (last_crawl stays put)
+    sitemap_seen INTEGER NOT NULL DEFAULT 0   -- the probe baseline found a /sitemap.xml
 )
 """
 
+# Added in migration 14, when the scheduler started driving off this table
+CRAWL_SCHEDULE_ADDED_COLUMNS = [
+    ("content_hash", "TEXT"),
+    ("last_changed", "TEXT"),
+]
+
+# Added in migration 16, when probe-only passes stopped moving last_crawl
+CRAWL_SCHEDULE_PROBE_COLUMNS = [
+    ("last_probe", "TEXT"),
+    ("sitemap_seen", "INTEGER NOT NULL DEFAULT 0"),
+]
+
+CREATE_CRAWL_SCHEDULE_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_crawl_schedule_next ON crawl_schedule(next_crawl)",
+]
+
 CREATE_PAGE_HASHES = """
 CREATE TABLE IF NOT EXISTS page_hashes (
     domain   TEXT NOT NULL,
     page_url TEXT NOT NULL,
     hash     TEXT NOT NULL,
     updated_at TEXT NOT NULL,
+    probe_hash TEXT,                    -- change probe: text hash of the page as last fetched
+    etag TEXT,                          -- change probe: validators for the next conditional GET
+    last_modified TEXT,
     PRIMARY KEY (domain, page_url)
 )
 """
 
+# Added in migration 15 for the refresh change probe. Kept apart from `hash`,
+# which push ingest owns and computes from galui.js page data.
+PAGE_HASHES_PROBE_COLUMNS = [
+    ("probe_hash", "TEXT"),
+    ("etag", "TEXT"),
+    ("last_modified", "TEXT"),
+]
+
+
+def jittered_next_crawl(now: datetime, interval_hours: float, jitter: float) -> str:
+    """now + interval, randomly stretched or shrunk by up to ±jitter of it."""
+    hours = interval_hours * random.uniform(1 - jitter, 1 + jitter)
+    return (now + timedelta(hours=hours)).isoformat()
+
 
 class StorageService:
     """
@@ -59,6 +129,9 @@ class StorageService:
 
     Upgrade path to Postgres: swap sqlite3 for asyncpg, keep same interface.
     All SQL is standard and compatible with Postgres without modification.
+
+    Tables are created by app/services/migrations.py at startup, so building
+    an instance per request costs nothing.
     """
 
     def __init__(self, db_path: str = None):
@@ -66,25 +139,9 @@ class StorageService:
             from app.config import settings
             db_path = settings.database_url
         self.db_path = db_path
-        # Ensure data directory exists
-        db_dir = os.path.dirname(db_path)
-        if db_dir:
-            os.makedirs(db_dir, exist_ok=True)
-        self._init_db()
 
     def _get_conn(self) -> sqlite3.Connection:
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
-
-    def _init_db(self):
-        with self._get_conn() as conn:
-            conn.execute(CREATE_REGISTRIES)
-            conn.execute(CREATE_JOBS)
-            conn.execute(CREATE_CRAWL_SCHEDULE)
-            conn.execute(CREATE_PAGE_HASHES)
-            conn.commit()
-        logger.info(f"Storage initialized: {self.db_path}")
+        return get_conn(self.db_path)
 
     # --- Registry ---
 
@@ -105,9 +162,25 @@ class StorageService:
                 now,
                 registry.crawl_id,
             ))
+            # First registry for a domain → put it on the refresh schedule
+            conn.execute(
+                """INSERT INTO crawl_schedule (domain, last_crawl, next_crawl, interval_hours)
+                   VALUES (?, ?, ?, ?)
+                   ON CONFLICT(domain) DO NOTHING""",
+                (registry.domain, now, *self._initial_schedule())
+            )
             conn.commit()
         logger.info(f"Saved registry for {registry.domain}")
 
+    def touch_registry(self, domain: str):
+        """Bump updated_at without rewriting the registry (a refresh found nothing new)."""
+        with self._get_conn() as conn:
+            conn.execute(
+                "UPDATE registries SET updated_at = ? WHERE domain = ?",
+                (datetime.utcnow().isoformat(), domain)
+            )
+            conn.commit()
+
     def get_registry(self, domain: str) -> Optional[CapabilityRegistry]:
         with self._get_conn() as conn:
             row = conn.execute(
@@ -134,6 +207,7 @@ class StorageService:
     def delete_registry(self, domain: str) -> bool:
         with self._get_conn() as conn:
             cursor = conn.execute("DELETE FROM registries WHERE domain = ?", (domain,))
+            conn.execute("DELETE FROM crawl_schedule WHERE domain = ?", (domain,))
             conn.commit()
             return cursor.rowcount > 0
 
@@ -159,14 +233,16 @@ class StorageService:
         with self._get_conn() as conn:
             conn.execute("""
                 INSERT INTO ingest_jobs
-                    (job_id, domain, url, status, created_at, completed_at, error, pages_crawled, confidence_score)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    (job_id, domain, url, status, created_at, completed_at, error, pages_crawled, confidence_score,
+                     boilerplate_bytes_removed)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 ON CONFLICT(job_id) DO UPDATE SET
                     status = excluded.status,
                     completed_at = excluded.completed_at,
                     error = excluded.error,
                     pages_crawled = excluded.pages_crawled,
-                    confidence_score = excluded.confidence_score
+                    confidence_score = excluded.confidence_score,
+                    boilerplate_bytes_removed = excluded.boilerplate_bytes_removed
             """, (
                 job.job_id,
                 job.domain,
@@ -177,6 +253,7 @@ class StorageService:
                 job.error,
                 job.pages_crawled,
                 job.confidence_score,
+                job.boilerplate_bytes_removed,
             ))
             conn.commit()
 
@@ -200,9 +277,130 @@ class StorageService:
             rows = conn.execute(
                 "SELECT * FROM ingest_jobs ORDER BY created_at DESC LIMIT ?", (limit,)
             ).fetchall()
-            return [dict(r) for r in rows]
+            # payload is the queue's handler input, not part of the job's public view
+            return [{k: r[k] for k in r.keys() if k != "payload"} for r in rows]
+
+    # --- Crawl schedule (per-domain refresh timing) ---
 
-    # --- Page hashes (change detection for push ingest) ---
+    def _initial_schedule(self) -> tuple:
+        from app.config import settings
+        interval = settings.auto_refresh_interval_hours
+        return jittered_next_crawl(datetime.utcnow(), interval, settings.refresh_jitter), interval
+
+    def get_crawl_schedule(self, domain: str) -> Optional[dict]:
+        with self._get_conn() as conn:
+            row = conn.execute("SELECT * FROM crawl_schedule WHERE domain = ?", (domain,)).fetchone()
+            return dict(row) if row else None
+
+    def due_for_crawl(self, limit: int) -> List[str]:
+        """Domains whose next_crawl has passed, most overdue first."""
+        with self._get_conn() as conn:
+            rows = conn.execute(
+                """SELECT domain FROM crawl_schedule
+                   WHERE next_crawl <= ? ORDER BY next_crawl LIMIT ?""",
+                (datetime.utcnow().isoformat(), limit)
+            ).fetchall()
+            return [r["domain"] for r in rows]
+
+    def record_crawl(self, domain: str, content_hash: Optional[str], adapt: bool = True) -> bool:
+        """
+        Note a completed crawl and schedule the next one. The interval adapts
+        to the site: halved when the content fingerprint changed, stretched
+        by half when it didn't, within refresh_min/max_interval_hours; the
+        next crawl is then jittered so domains don't move in lockstep.
+        content_hash=None means the change probe found the site unchanged
+        and no crawl ran: it counts as unchanged and is stamped in last_probe,
+        but last_crawl keeps the time of the last real crawl, which the
+        probe's sitemap check compares against. adapt=False (manual ingests) restarts the current
+        interval without changing it, so on-demand re-ingests don't skew a
+        domain's schedule. Returns whether the content changed.
+        """
+        from app.config import settings
+        now = datetime.utcnow()
+        with self._get_conn() as conn:
+            row = conn.execute(
+                "SELECT last_crawl, interval_hours, content_hash FROM crawl_schedule WHERE domain = ?",
+                (domain,)
+            ).fetchone()
+            interval = row["interval_hours"] if row else settings.auto_refresh_interval_hours
+            probe_only = content_hash is None and row is not None
+            if probe_only:
+                content_hash = row["content_hash"]
+            changed = row is None or row["content_hash"] != content_hash
+            if adapt and row is not None and row["content_hash"] is not None:
+                interval = interval / 2 if changed else interval * 1.5
+            interval = round(min(max(interval, settings.refresh_min_interval_hours),
+                                 settings.refresh_max_interval_hours))
+            conn.execute(
+                """INSERT INTO crawl_schedule
+                       (domain, last_crawl, next_crawl, interval_hours, content_hash, last_changed, last_probe)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(domain) DO UPDATE SET
+                       last_crawl = excluded.last_crawl,
+                       next_crawl = excluded.next_crawl,
+                       interval_hours = excluded.interval_hours,
+                       content_hash = excluded.content_hash,
+                       last_changed = COALESCE(excluded.last_changed, crawl_schedule.last_changed),
+                       last_probe = COALESCE(excluded.last_probe, crawl_schedule.last_probe)""",
+                (domain, row["last_crawl"] if probe_only else now.isoformat(),
+                 jittered_next_crawl(now, interval, settings.refresh_jitter),
+                 interval, content_hash, now.isoformat() if changed else None,
+                 now.isoformat() if probe_only else None)
+            )
+            conn.commit()
+        return changed
+
+    def defer_crawl(self, domain: str, hours: float):
+        """Push a domain's next crawl out (e.g. after a failed refresh) without touching its interval."""
+        from app.config import settings
+        with self._get_conn() as conn:
+            conn.execute(
+                "UPDATE crawl_schedule SET next_crawl = ? WHERE domain = ?",
+                (jittered_next_crawl(datetime.utcnow(), hours, settings.refresh_jitter), domain)
+            )
+            conn.commit()
+
+    def set_sitemap_seen(self, domain: str, seen: bool):
+        """Whether the change probe found a /sitemap.xml; a later fetch failure then counts as a change."""
+        with self._get_conn() as conn:
+            conn.execute("UPDATE crawl_schedule SET sitemap_seen = ? WHERE domain = ?", (int(seen), domain))
+            conn.commit()
+
+    # --- Page hashes (change detection for push ingest and the refresh probe) ---
+
+    def get_probe_state(self, domain: str) -> dict:
+        """page_url → {probe_hash, etag, last_modified} for the domain's probed pages."""
+        with self._get_conn() as conn:
+            rows = conn.execute(
+                """SELECT page_url, probe_hash, etag, last_modified FROM page_hashes
+                   WHERE domain = ? AND probe_hash IS NOT NULL""",
+                (domain,)
+            ).fetchall()
+            return {r["page_url"]: {k: r[k] for k in ("probe_hash", "etag", "last_modified")} for r in rows}
+
+    def save_probe_state(self, domain: str, pages: dict):
+        """Replace the domain's probe baseline with pages (same shape as get_probe_state)."""
+        now = datetime.utcnow().isoformat()
+        with self._get_conn() as conn:
+            conn.execute(
+                """UPDATE page_hashes SET probe_hash = NULL, etag = NULL, last_modified = NULL
+                   WHERE domain = ?""",
+                (domain,)
+            )
+            # Rows the probe created on its own (no push hash) and no longer needs
+            conn.execute("DELETE FROM page_hashes WHERE domain = ? AND hash = ''", (domain,))
+            conn.executemany("""
+                INSERT INTO page_hashes (domain, page_url, hash, updated_at, probe_hash, etag, last_modified)
+                VALUES (?, ?, '', ?, ?, ?, ?)
+                ON CONFLICT(domain, page_url) DO UPDATE SET
+                    probe_hash = excluded.probe_hash,
+                    etag = excluded.etag,
+                    last_modified = excluded.last_modified
+            """, [
+                (domain, url, now, p["probe_hash"], p.get("etag"), p.get("last_modified"))
+                for url, p in pages.items()
+            ])
+            conn.commit()
 
     def get_page_hash(self, domain: str, page_url: str) -> Optional[str]:
         with self._get_conn() as conn:
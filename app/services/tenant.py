@@ -16,11 +16,17 @@ import secrets
 import string
 import hashlib
 import logging
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Optional, List
 from pydantic import BaseModel
 from passlib.context import CryptContext
 
+from app.services.db import get_conn
+from app.services.usage_buffer import get_usage_buffer
+
 # Argon2id is the NIST-recommended password hashing algorithm (SP 800-63B).
 # Legacy SHA-256 scheme retained for backward compat — existing passwords still verify.
 _pwd_context = CryptContext(
@@ -99,6 +105,14 @@ PLAN_LIMITS = {
     "enterprise": {"domains": 999, "rate_per_min": 300, "requests_today": 50000, "js_enabled": 1},
 }
 
+# Columns added to tenants after the first release — applied by migrations.py
+TENANT_ADDED_COLUMNS = [
+    ("password_hash", "TEXT"),
+    ("stripe_customer_id", "TEXT"),
+    ("stripe_subscription_id", "TEXT"),
+    ("js_enabled", "INTEGER NOT NULL DEFAULT 0"),
+]
+
 KEY_ALPHABET = string.ascii_letters + string.digits
 
 
@@ -125,6 +139,78 @@ class Tenant(BaseModel):
     js_enabled: bool = False
 
 
+class TenantCache:
+    """
+    Process-local TTL + LRU cache of api_key → Tenant, used by the auth middleware.
+
+    Unknown/inactive keys are cached too (as None, with a shorter TTL) so a
+    client hammering us with a bad key doesn't cost a SELECT per request.
+
+    Every TenantService method that changes what get_tenant() would return
+    invalidates the affected keys. Other workers only see the change once
+    their entry expires — keep ttl_seconds short.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, negative_ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key → (expires_at, tenant|None)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, api_key: str) -> tuple:
+        """Returns (found, tenant). found=False means the caller must hit the DB."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(api_key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._entries[api_key]
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(api_key)
+            self.hits += 1
+            return True, entry[1]
+
+    def put(self, api_key: str, tenant: Optional["Tenant"]):
+        ttl = self.ttl_seconds if tenant is not None else self.negative_ttl_seconds
+        with self._lock:
+            self._entries[api_key] = (time.monotonic() + ttl, tenant)
+            self._entries.move_to_end(api_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *api_keys: str):
+        with self._lock:
+            for key in api_keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+_tenant_cache: Optional[TenantCache] = None
+
+
+def get_tenant_cache() -> TenantCache:
+    global _tenant_cache
+    if _tenant_cache is None:
+        from app.config import settings
+        _tenant_cache = TenantCache(
+            max_entries=settings.tenant_cache_max_entries,
+            ttl_seconds=settings.tenant_cache_ttl_seconds,
+            negative_ttl_seconds=settings.tenant_cache_negative_ttl_seconds,
+        )
+    return _tenant_cache
+
+
 class TenantCreateRequest(BaseModel):
     name: str
     email: str
@@ -139,32 +225,9 @@ class TenantService:
             from app.config import settings
             db_path = settings.database_url
         self.db_path = db_path
-        self._init_db()
 
     def _get_conn(self) -> sqlite3.Connection:
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
-
-    def _init_db(self):
-        with self._get_conn() as conn:
-            conn.execute(CREATE_TENANTS)
-            conn.execute(CREATE_USAGE_LOG)
-            conn.execute(CREATE_TENANT_DOMAINS)
-            conn.execute(CREATE_MAGIC_TOKENS)
-            conn.execute(CREATE_AUDIT_LOG)
-            # Migrate: add new columns if they don't exist yet (safe ALTER TABLE)
-            for col, defn in [
-                ("password_hash", "TEXT"),
-                ("stripe_customer_id", "TEXT"),
-                ("stripe_subscription_id", "TEXT"),
-                ("js_enabled", "INTEGER NOT NULL DEFAULT 0"),
-            ]:
-                try:
-                    conn.execute(f"ALTER TABLE tenants ADD COLUMN {col} {defn}")
-                except Exception:
-                    pass  # Column already exists
-            conn.commit()
+        return get_conn(self.db_path)
 
     # ── Password helpers ────────────────────────────────────────────────────
     @staticmethod
@@ -208,6 +271,7 @@ class TenantService:
                   pw_hash, limits["js_enabled"]))
             conn.commit()
 
+        get_tenant_cache().invalidate(api_key)
         logger.info(f"Created tenant: {email} ({plan}) → {api_key[:20]}...")
         tenant = self.get_tenant(api_key)
         self.log_audit("system", "tenant.create", f"tenant:{api_key}",
@@ -280,6 +344,7 @@ class TenantService:
             """, (plan, limits["domains"], limits["rate_per_min"],
                   ls_subscription_id, limits["js_enabled"], email))
             conn.commit()
+        get_tenant_cache().invalidate(tenant.api_key)
         logger.info(f"✅ LS: activated {plan} for {email} (sub {ls_subscription_id})")
         self.log_audit("system", "plan.upgrade", f"tenant:{tenant.api_key}",
                        json.dumps({"plan": plan, "ls_subscription_id": ls_subscription_id, "email": email}))
@@ -299,6 +364,7 @@ class TenantService:
                 WHERE email=?
             """, (limits["domains"], limits["rate_per_min"], email))
             conn.commit()
+        get_tenant_cache().invalidate(tenant.api_key)
         logger.info(f"⬇️ LS: deactivated subscription for {email}")
         self.log_audit("system", "plan.downgrade", f"tenant:{tenant.api_key}",
                        json.dumps({"plan": "free", "email": email}))
@@ -312,6 +378,7 @@ class TenantService:
                 (stripe_customer_id, api_key)
             )
             conn.commit()
+        get_tenant_cache().invalidate(api_key)
 
     def activate_subscription(self, stripe_customer_id: str, plan: str, subscription_id: str):
         """Called from Stripe webhook on checkout.session.completed."""
@@ -325,6 +392,7 @@ class TenantService:
             """, (plan, limits["domains"], limits["rate_per_min"],
                   subscription_id, limits["js_enabled"], stripe_customer_id))
             conn.commit()
+        self._invalidate_stripe_customer(stripe_customer_id)
         logger.info(f"Activated {plan} for Stripe customer {stripe_customer_id}")
 
     def deactivate_subscription(self, stripe_customer_id: str):
@@ -338,8 +406,31 @@ class TenantService:
                 WHERE stripe_customer_id=?
             """, (limits["domains"], limits["rate_per_min"], stripe_customer_id))
             conn.commit()
+        self._invalidate_stripe_customer(stripe_customer_id)
         logger.info(f"Deactivated subscription for Stripe customer {stripe_customer_id}")
 
+    def _invalidate_stripe_customer(self, stripe_customer_id: str):
+        """Stripe webhooks only know the customer id — map it back to api keys."""
+        with self._get_conn() as conn:
+            rows = conn.execute(
+                "SELECT api_key FROM tenants WHERE stripe_customer_id=?", (stripe_customer_id,)
+            ).fetchall()
+        get_tenant_cache().invalidate(*[r["api_key"] for r in rows])
+
+    def get_tenant_cached(self, api_key: str) -> Optional[Tenant]:
+        """
+        get_tenant() behind the in-process TenantCache — used on the auth hot path.
+        Counters on the returned Tenant (requests_today, last_seen) may lag by up
+        to the cache TTL; plan, limits and is_active are invalidated on change.
+        """
+        cache = get_tenant_cache()
+        found, tenant = cache.get(api_key)
+        if found:
+            return tenant
+        tenant = self.get_tenant(api_key)
+        cache.put(api_key, tenant)
+        return tenant
+
     def get_tenant(self, api_key: str) -> Optional[Tenant]:
         with self._get_conn() as conn:
             row = conn.execute(
@@ -416,22 +507,12 @@ class TenantService:
         return self.register_domain(api_key, domain)
 
     def record_request(self, api_key: str, endpoint: str, domain: str = None, status: int = 200):
-        """Track usage. Fire-and-forget — never blocks the request."""
-        now = datetime.utcnow().isoformat()
+        """
+        Track usage. Fire-and-forget — never blocks the request.
+        Rows are buffered in memory and written in batches (see usage_buffer.py).
+        """
         try:
-            with self._get_conn() as conn:
-                conn.execute("""
-                    INSERT INTO usage_log (api_key, endpoint, domain, status_code, ts)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (api_key, endpoint, domain, status, now))
-                conn.execute("""
-                    UPDATE tenants
-                    SET requests_today = requests_today + 1,
-                        requests_total = requests_total + 1,
-                        last_seen = ?
-                    WHERE api_key = ?
-                """, (now, api_key))
-                conn.commit()
+            get_usage_buffer(self.db_path).add(api_key, endpoint, domain, status)
         except Exception as e:
             logger.warning(f"Usage tracking failed: {e}")
 
@@ -448,6 +529,7 @@ class TenantService:
         with self._get_conn() as conn:
             conn.execute("UPDATE tenants SET is_active = 0 WHERE api_key = ?", (api_key,))
             conn.commit()
+        get_tenant_cache().invalidate(api_key)
         self.log_audit(actor, "tenant.deactivate", f"tenant:{api_key}")
 
     def update_plan(self, api_key: str, plan: str, actor: str = "admin"):
@@ -459,6 +541,7 @@ class TenantService:
                 WHERE api_key = ?
             """, (plan, limits["domains"], limits["rate_per_min"], api_key))
             conn.commit()
+        get_tenant_cache().invalidate(api_key)
         self.log_audit(actor, "plan.admin_update", f"tenant:{api_key}",
                        json.dumps({"plan": plan}))
 
@@ -467,6 +550,7 @@ class TenantService:
         with self._get_conn() as conn:
             conn.execute("UPDATE tenants SET requests_today = 0")
             conn.commit()
+        get_tenant_cache().clear()
         logger.info("Daily usage counters reset for all tenants")
 
     def log_audit(self, actor: str, action: str, resource: str,
@@ -508,6 +592,7 @@ class TenantService:
             )
             conn.execute("DELETE FROM tenants WHERE api_key = ?", (api_key,))
             conn.commit()
+        get_tenant_cache().invalidate(api_key)
         logger.info(f"Tenant erased: {api_key[:20]}…")
 
     def _row_to_tenant(self, row: dict) -> Tenant:
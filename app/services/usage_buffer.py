@@ -0,0 +1,228 @@
+"""
+Write-behind buffer for tenant usage accounting.
+
+TenantService.record_request() used to INSERT into usage_log and UPDATE the
+tenants counters in its own transaction for every push/API call — one
+synchronous write per page view of every customer site.
+
+Now it just appends to this in-memory buffer. A background thread flushes
+every `usage_flush_interval_ms`, or sooner once `usage_flush_max_events`
+are pending, in ONE transaction:
+  - usage_log rows         → executemany INSERT
+  - tenants counters       → one UPDATE per api_key, increments coalesced
+                             (requests_today/requests_total += n, last_seen = max)
+
+The buffer is flushed on app shutdown (lifespan → stop_all()). A hard crash
+loses at most one flush interval of usage rows — acceptable for metering
+data that was already best-effort ("fire-and-forget").
+"""
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from app.services.db import get_conn
+
+logger = logging.getLogger(__name__)
+
+
+class UsageBuffer:
+
+    def __init__(self, db_path: str, flush_interval_ms: int, flush_max_events: int, max_pending: int):
+        self.db_path = db_path
+        self.flush_interval = flush_interval_ms / 1000
+        self.flush_max_events = flush_max_events
+        self.max_pending = max_pending
+
+        self._lock = threading.Lock()
+        self._rows: List[Tuple] = []                      # (api_key, endpoint, domain, status, ts)
+        self._counters: Dict[str, List] = {}              # api_key → [count, last_seen]
+        self._oldest_pending: Optional[float] = None      # monotonic time of oldest unflushed event
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+        # Metrics
+        self.events_recorded = 0
+        self.events_flushed = 0
+        self.events_dropped = 0
+        self.flushes = 0
+        self.flush_failures = 0
+        self.last_flush_at: Optional[str] = None
+        self.last_flush_ms = 0.0
+        self.last_flush_lag_ms = 0.0
+        self.max_flush_lag_ms = 0.0
+
+    # ── Producer side ───────────────────────────────────────────────────────
+
+    def add(self, api_key: str, endpoint: str, domain: Optional[str], status: int):
+        now = datetime.utcnow().isoformat()
+        with self._lock:
+            if len(self._rows) >= self.max_pending:
+                self.events_dropped += 1
+                return
+            self._rows.append((api_key, endpoint, domain, status, now))
+            counter = self._counters.get(api_key)
+            if counter is None:
+                self._counters[api_key] = [1, now]
+            else:
+                counter[0] += 1
+                counter[1] = now
+            if self._oldest_pending is None:
+                self._oldest_pending = time.monotonic()
+            self.events_recorded += 1
+            pending = len(self._rows)
+        self._ensure_thread()
+        if pending >= self.flush_max_events:
+            self._wake.set()
+
+    # ── Flusher ─────────────────────────────────────────────────────────────
+
+    def _ensure_thread(self):
+        if self._thread is not None or self._stopping:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="usage-buffer-flush", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        """Write everything pending in one transaction. Returns rows written."""
+        with self._lock:
+            if not self._rows:
+                return 0
+            rows, self._rows = self._rows, []
+            counters, self._counters = self._counters, {}
+            oldest, self._oldest_pending = self._oldest_pending, None
+
+        start = time.monotonic()
+        try:
+            with get_conn(self.db_path) as conn:
+                conn.executemany(
+                    "INSERT INTO usage_log (api_key, endpoint, domain, status_code, ts) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+                conn.executemany(
+                    """
+                    UPDATE tenants
+                    SET requests_today = requests_today + ?,
+                        requests_total = requests_total + ?,
+                        last_seen = ?
+                    WHERE api_key = ?
+                    """,
+                    [(n, n, last_seen, key) for key, (n, last_seen) in counters.items()],
+                )
+        except Exception as e:
+            self.flush_failures += 1
+            logger.warning(f"Usage flush failed ({len(rows)} rows) — will retry: {e}")
+            self._requeue(rows, counters, oldest)
+            return 0
+
+        done = time.monotonic()
+        lag_ms = (done - oldest) * 1000 if oldest else 0.0
+        self.flushes += 1
+        self.events_flushed += len(rows)
+        self.last_flush_at = datetime.utcnow().isoformat()
+        self.last_flush_ms = round((done - start) * 1000, 2)
+        self.last_flush_lag_ms = round(lag_ms, 2)
+        self.max_flush_lag_ms = max(self.max_flush_lag_ms, self.last_flush_lag_ms)
+        return len(rows)
+
+    def _requeue(self, rows: List[Tuple], counters: Dict[str, List], oldest: Optional[float]):
+        """
+        Put a failed batch back in front of anything recorded meanwhile. Rows
+        beyond max_pending are dropped oldest first, and their increments
+        come off the counters with them — so the counter map never holds a
+        key without a pending row, and stays within max_pending keys.
+        """
+        with self._lock:
+            room = max(0, self.max_pending - len(self._rows))
+            kept = rows[-room:] if room else []
+            dropped = len(rows) - len(kept)
+            self.events_dropped += dropped
+            for key, *_ in rows[:dropped]:
+                counters[key][0] -= 1
+            self._rows = kept + self._rows
+            for key, (n, last_seen) in counters.items():
+                if n <= 0:
+                    continue
+                counter = self._counters.get(key)
+                if counter is None:
+                    self._counters[key] = [n, last_seen]
+                else:
+                    counter[0] += n
+                    counter[1] = max(counter[1], last_seen)
+            if oldest is not None:
+                self._oldest_pending = min(oldest, self._oldest_pending or oldest)
+
+    def stop(self):
+        """Stop the flusher thread and write whatever is left."""
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = len(self._rows)
+            oldest = self._oldest_pending
+        return {
+            "pending": pending,
+            "pending_lag_ms": round((time.monotonic() - oldest) * 1000, 2) if oldest else 0.0,
+            "events_recorded": self.events_recorded,
+            "events_flushed": self.events_flushed,
+            "events_dropped": self.events_dropped,
+            "flushes": self.flushes,
+            "flush_failures": self.flush_failures,
+            "last_flush_at": self.last_flush_at,
+            "last_flush_ms": self.last_flush_ms,
+            "last_flush_lag_ms": self.last_flush_lag_ms,
+            "max_flush_lag_ms": self.max_flush_lag_ms,
+        }
+
+
+_buffers: Dict[str, UsageBuffer] = {}
+_buffers_lock = threading.Lock()
+
+
+def get_usage_buffer(db_path: str) -> UsageBuffer:
+    buf = _buffers.get(db_path)
+    if buf is None:
+        from app.config import settings
+        with _buffers_lock:
+            buf = _buffers.get(db_path)
+            if buf is None:
+                buf = _buffers[db_path] = UsageBuffer(
+                    db_path,
+                    flush_interval_ms=settings.usage_flush_interval_ms,
+                    flush_max_events=settings.usage_flush_max_events,
+                    max_pending=settings.usage_buffer_max_pending,
+                )
+    return buf
+
+
+def stop_all():
+    """Flush and stop every buffer. Called from app lifespan shutdown."""
+    with _buffers_lock:
+        buffers = list(_buffers.values())
+        _buffers.clear()
+    for buf in buffers:
+        try:
+            buf.stop()
+        except Exception as e:
+            logger.error(f"Usage buffer final flush failed: {e}")
+
+
+def all_stats() -> dict:
+    return {path: buf.stats() for path, buf in list(_buffers.items())}
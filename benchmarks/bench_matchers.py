@@ -0,0 +1,139 @@
+"""
+Micro-benchmark for the analytics topic / agent matchers.
+
+Compares the precompiled, LRU-cached _infer_topic and detect_agent in
+app/services/analytics.py with the original per-call versions (kept inline
+below as `legacy_*`), and checks that both give identical results.
+
+    python benchmarks/bench_matchers.py [--repeat 3] [--seed 0]
+
+Corpus (synthetic, seeded):
+  - 20k distinct URLs           → _infer_topic, uncached
+  - 100k rows over 2k URLs      → _infer_topic, as dashboards call it
+  - 50k UAs over 16 distinct    → detect_agent
+Reported as rows/s, best of --repeat runs.
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from typing import Callable, List, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services.analytics import AI_AGENTS, TOPIC_PATTERNS, _infer_topic, detect_agent  # noqa: E402
+
+_SEGMENTS = [
+    "blog", "post", "pricing", "plans", "about", "docs", "api", "guide", "customers",
+    "support", "changelog", "careers", "privacy", "login", "features", "integrations",
+    "company", "news", "enterprise", "security", "partners", "events", "webinars",
+]
+_BROWSER_UAS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/124.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 14_4) AppleWebKit/605.1.15 Version/17.4 Safari/605.1.15",
+    "Mozilla/5.0 (X11; Linux x86_64; rv:125.0) Gecko/20100101 Firefox/125.0",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_4 like Mac OS X) AppleWebKit/605.1.15 Mobile/15E148",
+]
+
+
+# ── The pre-optimization implementations ──────────────────────────────────────
+
+def legacy_infer_topic(page_url: str) -> str:
+    try:
+        path = re.sub(r"^https?://[^/]+", "", page_url).lower()
+        if not path or path == "/":
+            return "Homepage"
+        for pattern, label in TOPIC_PATTERNS:
+            if re.search(pattern, path):
+                return label
+        segment = path.strip("/").split("/")[0]
+        segment = re.sub(r"[-_]", " ", segment).title()
+        return segment or "Other"
+    except Exception:
+        return "Other"
+
+
+def legacy_detect_agent(user_agent: str) -> Optional[tuple]:
+    ua = user_agent.lower()
+    for pattern, (name, agent_type) in AI_AGENTS.items():
+        if pattern in ua:
+            return name, agent_type
+    return None
+
+
+# ── Corpus ────────────────────────────────────────────────────────────────────
+
+def _urls(rng: random.Random, n: int) -> List[str]:
+    urls = []
+    for i in range(n):
+        depth = rng.randint(0, 3)
+        parts = [rng.choice(_SEGMENTS) + (f"-{rng.randint(1, 999)}" if rng.random() < 0.5 else "")
+                 for _ in range(depth)]
+        urls.append(f"https://site{i % 50}.example.com/" + "/".join(parts))
+    return urls
+
+
+def _uas(rng: random.Random) -> List[str]:
+    bots = [f"Mozilla/5.0 (compatible; {key}/1.0; +https://example.com/bot)" for key in list(AI_AGENTS)[:12]]
+    return bots + _BROWSER_UAS
+
+
+# ── Harness ───────────────────────────────────────────────────────────────────
+
+def _rate(fn: Callable[[str], object], rows: List[str], repeat: int, clear: Callable[[], None] = None) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        if clear:
+            clear()
+        start = time.perf_counter()
+        for row in rows:
+            fn(row)
+        best = min(best, time.perf_counter() - start)
+    return len(rows) / best
+
+
+def _fmt(rate: float) -> str:
+    return f"{rate / 1e6:.1f}M rows/s" if rate >= 1e6 else f"{rate / 1e3:.0f}k rows/s"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    distinct_urls = _urls(rng, 20_000)
+    hot_urls = distinct_urls[:2_000]
+    url_rows = [rng.choice(hot_urls) for _ in range(100_000)]
+    ua_pool = _uas(rng)
+    ua_rows = [rng.choice(ua_pool) for _ in range(50_000)]
+
+    infer_uncached = _infer_topic.__wrapped__
+    mismatches = sum(legacy_infer_topic(u) != infer_uncached(u) for u in distinct_urls)
+    mismatches += sum(legacy_detect_agent(u) != detect_agent(u) for u in ua_rows)
+    if mismatches:
+        print(f"FAIL: {mismatches} results differ from the legacy implementations")
+        sys.exit(1)
+
+    cases = [
+        ("_infer_topic, uncached (20k URLs)",
+         _rate(legacy_infer_topic, distinct_urls, args.repeat),
+         _rate(infer_uncached, distinct_urls, args.repeat)),
+        ("_infer_topic, 100k rows / 2k URLs",
+         _rate(legacy_infer_topic, url_rows, args.repeat),
+         _rate(_infer_topic, url_rows, args.repeat, _infer_topic.cache_clear)),
+        ("detect_agent, 50k UAs / 16 distinct",
+         _rate(legacy_detect_agent, ua_rows, args.repeat),
+         _rate(detect_agent, ua_rows, args.repeat, detect_agent.cache_clear)),
+    ]
+
+    print(f"{'':40}{'before':>16}{'after':>16}{'speedup':>10}")
+    for name, before, after in cases:
+        print(f"{name:40}{_fmt(before):>16}{_fmt(after):>16}{after / before:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
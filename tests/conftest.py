@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """A fresh registry DB (and citations DB) migrated to the current schema."""
+    from app.config import settings
+    from app.services import citation_tracker, db, job_events, job_queue, llm_cache, migrations
+
+    path = str(tmp_path / "registry.db")
+    monkeypatch.setattr(settings, "database_url", path)
+    # Process-wide singletons are bound to the database they were created with
+    monkeypatch.setattr(job_queue, "_job_queue", None)
+    monkeypatch.setattr(job_events, "_job_events", None)
+    monkeypatch.setattr(llm_cache, "_llm_cache", None)
+    monkeypatch.setattr(citation_tracker, "DEFAULT_DB_PATH", str(tmp_path / "citations.db"))
+    migrations.run_all()
+    yield path
+    db.close_all()
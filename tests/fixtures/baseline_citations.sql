@@ -0,0 +1,34 @@
+-- Schema as created by the services before versioned migrations (baseline commit).
+CREATE TABLE citation_queries (
+                    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+                    api_key     TEXT NOT NULL,
+                    domain      TEXT NOT NULL,
+                    type        TEXT NOT NULL DEFAULT 'keyword',
+                    value       TEXT NOT NULL,
+                    created_at  TEXT NOT NULL,
+                    UNIQUE(api_key, domain, value)
+                );
+CREATE INDEX idx_cq_key_domain
+                    ON citation_queries(api_key, domain);
+CREATE TABLE citation_results (
+                    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+                    api_key       TEXT NOT NULL,
+                    domain        TEXT NOT NULL,
+                    query_id      INTEGER NOT NULL,
+                    question      TEXT NOT NULL,
+                    engine        TEXT NOT NULL,
+                    cited         INTEGER NOT NULL DEFAULT 0,
+                    snippet       TEXT,
+                    full_response TEXT,
+                    checked_at    TEXT NOT NULL,
+                    run_id        TEXT NOT NULL,
+                    engine_model  TEXT,
+                    error         TEXT,
+                    status        TEXT DEFAULT 'complete'
+                );
+CREATE INDEX idx_cr_key_domain
+                    ON citation_results(api_key, domain);
+CREATE INDEX idx_cr_checked_at
+                    ON citation_results(checked_at);
+CREATE INDEX idx_cr_run_id
+                    ON citation_results(run_id);
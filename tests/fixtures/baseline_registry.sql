@@ -0,0 +1,92 @@
+-- Schema as created by the services before versioned migrations (baseline commit).
+CREATE TABLE registries (
+    domain TEXT PRIMARY KEY,
+    registry_json TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    crawl_id TEXT NOT NULL
+);
+CREATE TABLE ingest_jobs (
+    job_id TEXT PRIMARY KEY,
+    domain TEXT NOT NULL,
+    url TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    completed_at TEXT,
+    error TEXT,
+    pages_crawled INTEGER DEFAULT 0,
+    confidence_score REAL DEFAULT 0.0
+);
+CREATE TABLE crawl_schedule (
+    domain TEXT PRIMARY KEY,
+    last_crawl TEXT NOT NULL,
+    next_crawl TEXT NOT NULL,
+    interval_hours INTEGER NOT NULL DEFAULT 168
+);
+CREATE TABLE page_hashes (
+    domain   TEXT NOT NULL,
+    page_url TEXT NOT NULL,
+    hash     TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (domain, page_url)
+);
+CREATE TABLE tenants (
+    api_key     TEXT PRIMARY KEY,
+    name        TEXT NOT NULL,
+    email       TEXT NOT NULL UNIQUE,
+    plan        TEXT NOT NULL DEFAULT 'free',
+    created_at  TEXT NOT NULL,
+    last_seen   TEXT,
+    is_active   INTEGER NOT NULL DEFAULT 1,
+    domains_limit INTEGER NOT NULL DEFAULT 3,
+    requests_today INTEGER NOT NULL DEFAULT 0,
+    requests_total INTEGER NOT NULL DEFAULT 0,
+    rate_limit_per_min INTEGER NOT NULL DEFAULT 10,
+    password_hash TEXT,
+    stripe_customer_id TEXT,
+    stripe_subscription_id TEXT,
+    js_enabled INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE usage_log (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    api_key     TEXT NOT NULL,
+    endpoint    TEXT NOT NULL,
+    domain      TEXT,
+    status_code INTEGER,
+    ts          TEXT NOT NULL
+);
+CREATE TABLE tenant_domains (
+    api_key     TEXT NOT NULL,
+    domain      TEXT NOT NULL,
+    registered_at TEXT NOT NULL,
+    PRIMARY KEY (api_key, domain)
+);
+CREATE TABLE magic_tokens (
+    token       TEXT PRIMARY KEY,
+    email       TEXT NOT NULL,
+    expires_at  TEXT NOT NULL,
+    used        INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE audit_log (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    actor       TEXT NOT NULL,
+    action      TEXT NOT NULL,
+    resource    TEXT NOT NULL,
+    detail      TEXT,
+    ip_address  TEXT,
+    ts          TEXT NOT NULL
+);
+CREATE TABLE agent_events (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    domain      TEXT NOT NULL,
+    page_url    TEXT NOT NULL,
+    agent_name  TEXT NOT NULL,
+    agent_type  TEXT NOT NULL,
+    user_agent  TEXT,
+    referrer    TEXT,
+    ts          TEXT NOT NULL
+);
+CREATE INDEX idx_ae_domain ON agent_events(domain);
+CREATE INDEX idx_ae_ts     ON agent_events(ts);
+CREATE INDEX idx_ae_agent  ON agent_events(agent_name);
+CREATE INDEX idx_ae_domain_ts ON agent_events(domain, ts);
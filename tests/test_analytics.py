@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta
+
+from app.services.analytics import AnalyticsService
+
+
+def _seed(service: AnalyticsService, pages: int = 40, hits: int = 200):
+    now = datetime.utcnow()
+    events = [
+        {
+            "domain": "example.com",
+            "page_url": f"https://example.com/page-{i % pages}",
+            "agent_name": "ClaudeBot" if i % 2 else "GPTBot",
+            "agent_type": "crawler",
+            "user_agent": "bot",
+            "ts": (now - timedelta(hours=i % 72)).isoformat(),
+        }
+        for i in range(hits)
+    ]
+    assert service.record_events(events) == hits
+
+
+def test_single_domain_unique_pages_agree_across_endpoints(db_path):
+    service = AnalyticsService(db_path)
+    _seed(service)
+
+    breakdown = {a["agent_name"]: a["unique_pages"] for a in service.get_agent_breakdown("example.com")["agents"]}
+    depth = service.get_per_llm_depth("example.com")
+
+    assert depth["unique_pages_approximate"] is False
+    assert {a["agent_name"]: a["unique_pages"] for a in depth["agents"]} == breakdown == {"GPTBot": 20, "ClaudeBot": 20}
+    score = service.get_ai_attention_score("example.com")
+    assert score["unique_pages_approximate"] is False
+
+
+def test_estimates_are_flagged_and_close_to_exact(db_path):
+    service = AnalyticsService(db_path)
+    _seed(service)
+
+    approx = service.get_per_llm_depth("example.com", exact=False)
+    assert approx["unique_pages_approximate"] is True
+    for agent in approx["agents"]:
+        assert abs(agent["unique_pages"] - 20) <= 1
+    assert service.get_ai_attention_score("example.com", exact=False)["unique_pages_approximate"] is True
+
+
+def test_partition_ddl_runs_once_per_month(db_path, monkeypatch):
+    from app.services import analytics
+
+    calls = []
+    real_ddl = analytics._partition_ddl
+    monkeypatch.setattr(analytics, "_partition_ddl", lambda month: calls.append(month) or real_ddl(month))
+    service = AnalyticsService(db_path)
+    _seed(service, hits=20)
+    _seed(service, hits=20)
+    assert calls and len(calls) == len(set(calls))   # once per new month, not per batch
+
+    # Retention dropping a partition makes the next write for that month recreate it
+    month = analytics._month_of(int(datetime.utcnow().timestamp()))
+    analytics._forget_partitions(db_path, [month])
+    with analytics.get_conn(db_path) as conn:
+        for table in analytics._PARTITIONED_TABLES:
+            conn.execute(f"DROP TABLE {table}_p{month}")
+    calls.clear()
+    _seed(service, hits=1)
+    assert calls == [month]
+
+
+def test_dashboard_entries_keyed_like_standalone_endpoints(db_path):
+    service = AnalyticsService(db_path)
+    _seed(service)
+    bundle = service.get_dashboard("example.com")
+
+    standalone = {
+        "summary": service.get_summary("example.com", exact=True),
+        "agents": service.get_agent_breakdown("example.com"),
+        "pages": service.get_page_breakdown("example.com"),
+        "topics": service.get_topic_map("example.com"),
+        "attention": service.get_ai_attention_score("example.com"),
+        "llm_depth": service.get_per_llm_depth("example.com"),
+    }
+    for name, response in standalone.items():
+        assert set(bundle[name]) == set(response), name
+    assert bundle["attention"]["unique_pages_approximate"] is False
+    assert bundle["llm_depth"]["unique_pages_approximate"] is False
+    assert bundle["attention"]["score"] == standalone["attention"]["score"]
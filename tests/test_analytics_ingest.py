@@ -0,0 +1,66 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from app.services.analytics import AnalyticsService
+from app.services.analytics_ingest import AnalyticsIngestQueue
+
+
+def _event(i: int) -> dict:
+    return {
+        "domain": "example.com",
+        "page_url": f"https://example.com/p{i}",
+        "agent_name": "GPTBot",
+        "agent_type": "crawler",
+        "user_agent": "GPTBot/1.0",
+        "ts": datetime.utcnow().isoformat(),
+    }
+
+
+def _count_hits(service: AnalyticsService) -> int:
+    return sum(a["hits"] for a in service.get_agent_breakdown("example.com", days=1)["agents"])
+
+
+@pytest.mark.asyncio
+async def test_stop_flushes_the_batch_being_collected(db_path):
+    service = AnalyticsService(db_path)
+    queue = AnalyticsIngestQueue(max_size=1000, batch_size=500, flush_interval_ms=60_000)
+    await queue.start(service)
+
+    for i in range(50):
+        assert await queue.enqueue(_event(i))
+    await asyncio.sleep(0.05)  # writer has taken the events and is waiting for a fuller batch
+    assert queue.stats()["queued"] == 0
+
+    await queue.stop()
+
+    stats = queue.stats()
+    assert stats["flushed"] == 50
+    assert stats["failed"] == 0 and stats["dropped"] == 0
+    assert _count_hits(service) == 50
+
+
+@pytest.mark.asyncio
+async def test_stop_drains_events_still_queued(db_path):
+    service = AnalyticsService(db_path)
+    queue = AnalyticsIngestQueue(max_size=1000, batch_size=10, flush_interval_ms=60_000)
+    await queue.start(service)
+    for i in range(35):
+        await queue.enqueue(_event(i))
+
+    await queue.stop()
+
+    assert queue.stats()["flushed"] == 35
+    assert _count_hits(service) == 35
+
+
+@pytest.mark.asyncio
+async def test_drop_newest_when_full(db_path):
+    queue = AnalyticsIngestQueue(max_size=2, batch_size=10, flush_interval_ms=60_000)
+    queue._queue = asyncio.Queue(maxsize=2)  # not started: nothing drains it
+
+    results = [await queue.enqueue(_event(i)) for i in range(3)]
+
+    assert results == [True, True, False]
+    assert queue.stats()["dropped"] == 1
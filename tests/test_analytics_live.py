@@ -0,0 +1,78 @@
+import random
+
+from app.services.analytics_live import LiveCounters, _Ring
+
+SPANS = (5, 60, 1440)
+SIZE = 1440
+
+
+def _expected(hits, head, span):
+    return sum(n for m, n in hits if head - span < m <= head)
+
+
+def test_window_sums_expire_minute_by_minute():
+    ring = _Ring(SIZE, len(SPANS), minute=1000, agent_type="crawler")
+    ring.add(1000, 3, SPANS)
+    assert ring.sums == [3, 3, 3]
+
+    ring.advance(1004, SPANS)
+    assert ring.sums == [3, 3, 3]   # still inside the 5-minute window
+    ring.advance(1005, SPANS)
+    assert ring.sums == [0, 3, 3]   # minute 1000 left the 5-minute window
+    ring.advance(1059, SPANS)
+    assert ring.sums == [0, 3, 3]
+    ring.advance(1060, SPANS)
+    assert ring.sums == [0, 0, 3]
+    ring.advance(1000 + 1440, SPANS)
+    assert ring.sums == [0, 0, 0]
+
+
+def test_advance_past_whole_ring_resets():
+    ring = _Ring(SIZE, len(SPANS), minute=0, agent_type="crawler")
+    ring.add(0, 7, SPANS)
+    ring.advance(10 * SIZE, SPANS)
+    assert ring.sums == [0, 0, 0] and ring.head == 10 * SIZE
+    ring.add(10 * SIZE, 1, SPANS)
+    assert ring.sums == [1, 1, 1]
+
+
+def test_advance_backwards_is_a_no_op():
+    ring = _Ring(SIZE, len(SPANS), minute=500, agent_type="crawler")
+    ring.add(500, 2, SPANS)
+    ring.advance(400, SPANS)
+    assert ring.head == 500 and ring.sums == [2, 2, 2]
+
+
+def test_late_hits_only_count_in_windows_they_fall_in():
+    ring = _Ring(SIZE, len(SPANS), minute=2000, agent_type="crawler")
+    ring.add(2000 - 30, 1, SPANS)     # 30 min ago: not in 5m
+    ring.add(2000 - 2000, 1, SPANS)   # older than the ring: ignored
+    assert ring.sums == [0, 1, 1]
+
+
+def test_matches_brute_force_over_random_traffic():
+    rng = random.Random(42)
+    head = 10_000
+    ring = _Ring(SIZE, len(SPANS), minute=head, agent_type="crawler")
+    hits = []
+    for _ in range(3000):
+        head += rng.choice((0, 0, 1, 1, 2, 7, 90, 400))
+        ring.advance(head, SPANS)
+        minute = head - rng.randint(0, 100)
+        ring.add(minute, 1, SPANS)
+        hits.append((minute, 1))
+        assert ring.sums == [_expected(hits, head, span) for span in SPANS]
+
+
+def test_snapshot_reports_window_totals():
+    counters = LiveCounters(window_minutes=1440)
+    now = 1_700_000_000
+    counters.record("example.com", "GPTBot", "crawler", now - 60, now=now)
+    counters.record("example.com", "GPTBot", "crawler", now - 3600, now=now)
+    counters.record("example.com", "ClaudeBot", "crawler", now, now=now)
+
+    snap = counters.snapshot("example.com", now=now)
+    assert snap["hits"]["5m"] == 2 and snap["hits"]["1h"] == 2 and snap["hits"]["24h"] == 3
+
+    later = counters.snapshot("example.com", now=now + 86_400)
+    assert later["agents"] == []
@@ -0,0 +1,98 @@
+from datetime import datetime
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.auth import APIKeyMiddleware
+from app.api.routes import analytics as analytics_routes
+from app.config import settings
+from app.services.analytics import AnalyticsService
+from app.services.tenant import TenantService
+
+MASTER = "master-key"
+
+
+@pytest.fixture
+def client(db_path, monkeypatch):
+    monkeypatch.setattr(settings, "registry_api_key", MASTER)
+    monkeypatch.setattr(analytics_routes, "analytics", AnalyticsService(db_path))
+    app = FastAPI()
+    app.add_middleware(APIKeyMiddleware)
+    app.include_router(analytics_routes.router, prefix="/api/v1/analytics")
+    return TestClient(app)
+
+
+@pytest.fixture
+def tenants(db_path):
+    service = TenantService(db_path)
+    agency = service.create_tenant("Agency", "agency@example.com", plan="agency")
+    service.register_domain(agency.api_key, "mine.com")
+    other = service.create_tenant("Other", "other@example.com", plan="agency")
+    service.register_domain(other.api_key, "theirs.com")
+    return agency, other
+
+
+def _record(domain: str):
+    analytics_routes.analytics.record_event(domain, f"https://{domain}/", "GPTBot", "crawler", "GPTBot/1.0")
+
+
+def test_bulk_attention_requires_admin_key(client, tenants):
+    agency, _ = tenants
+    _record("mine.com")
+    _record("theirs.com")
+
+    resp = client.get("/api/v1/analytics/attention/bulk", params={"live": True},
+                      headers={"X-API-Key": agency.api_key})
+    assert resp.status_code == 403
+
+    resp = client.get("/api/v1/analytics/attention/bulk", params={"live": True}, headers={"X-API-Key": MASTER})
+    assert resp.status_code == 200
+    assert {d["domain"] for d in resp.json()["domains"]} == {"mine.com", "theirs.com"}
+
+
+def test_export_only_for_own_domains(client, tenants):
+    agency, _ = tenants
+    _record("mine.com")
+    _record("theirs.com")
+    headers = {"X-API-Key": agency.api_key}
+
+    resp = client.get("/api/v1/analytics/www.Mine.com/export", headers=headers)
+    assert resp.status_code == 200
+    assert resp.headers["X-Export-Complete"] == "true"
+    assert resp.text.count("\n") == 1 and '"domain":"mine.com"' in resp.text
+
+    assert client.get("/api/v1/analytics/theirs.com/export", headers=headers).status_code == 403
+    assert client.get("/api/v1/analytics/theirs.com/export", headers={"X-API-Key": MASTER}).status_code == 200
+
+
+def test_export_requires_agency_plan(client, db_path):
+    service = TenantService(db_path)
+    pro = service.create_tenant("Pro", "pro@example.com", plan="pro")
+    service.register_domain(pro.api_key, "mine.com")
+    resp = client.get("/api/v1/analytics/mine.com/export", headers={"X-API-Key": pro.api_key})
+    assert resp.status_code == 403
+
+
+def test_export_flags_rows_still_in_legacy_table(client, tenants, db_path):
+    from app.services import db
+    from app.services.analytics import CREATE_AGENT_EVENTS
+
+    agency, _ = tenants
+    conn = db.get_conn(db_path)
+    with conn:
+        conn.execute(CREATE_AGENT_EVENTS)
+        conn.executemany(
+            "INSERT INTO agent_events (domain, page_url, agent_name, agent_type, user_agent, ts) "
+            "VALUES (?, 'https://mine.com/', 'GPTBot', 'crawler', 'GPTBot/1.0', ?)",
+            [(d, datetime.utcnow().isoformat()) for d in ("mine.com", "mine.com", "theirs.com")],
+        )
+
+    resp = client.get("/api/v1/analytics/mine.com/export", headers={"X-API-Key": agency.api_key})
+    assert resp.headers["X-Export-Complete"] == "false"
+    assert resp.headers["X-Export-Pending-Rows"] == "2"
+
+    while analytics_routes.analytics.copy_legacy_events():
+        pass
+    resp = client.get("/api/v1/analytics/mine.com/export", headers={"X-API-Key": agency.api_key})
+    assert resp.headers["X-Export-Complete"] == "true" and resp.text.count("\n") == 2
@@ -0,0 +1,63 @@
+import pytest
+
+from app.models.crawl import PageContent
+from app.services.boilerplate import MIN_PAGES, strip_boilerplate
+
+NAV = "Home | Product | Pricing | Docs"
+FOOTER = "© 2024 Example Inc. All rights reserved."
+
+
+def _pages(bodies, chrome=(NAV, FOOTER)):
+    return [
+        PageContent(url=f"https://example.com/{i}", text="\n".join([chrome[0], body, chrome[1]]), status_code=200)
+        for i, body in enumerate(bodies)
+    ]
+
+
+def test_repeated_lines_kept_on_first_page_only():
+    pages = _pages(["Welcome to Example", "Plans from $9", "API reference", "Our team"])
+    out, saved = strip_boilerplate(pages)
+
+    assert out[0].text == pages[0].text
+    for page, body in zip(out[1:], ["Plans from $9", "API reference", "Our team"]):
+        assert page.text == body
+    assert saved == 3 * (len(NAV.encode()) + 1 + len(FOOTER.encode()) + 1)
+
+
+def test_match_ignores_case_and_whitespace():
+    pages = _pages(["a", "b", "c"])
+    pages[2] = PageContent(url=pages[2].url, text="  HOME |  product | PRICING | docs \nc", status_code=200)
+    out, _ = strip_boilerplate(pages)
+    assert out[2].text == "c"
+
+
+def test_lines_below_share_are_kept():
+    # "Contact sales" is on 2 of 6 pages: below the 50% share
+    bodies = ["Contact sales", "Contact sales", "x", "y", "z", "w"]
+    out, _ = strip_boilerplate(_pages(bodies))
+    assert "Contact sales" in out[0].text.splitlines()
+    assert out[1].text == "Contact sales"
+    assert out[5].text == "w"
+
+
+@pytest.mark.parametrize("n", range(1, MIN_PAGES))
+def test_small_crawls_left_alone(n):
+    pages = _pages(["same"] * n)
+    out, saved = strip_boilerplate(pages)
+    assert saved == 0 and out == pages
+
+
+def test_stripped_from_exactly_min_pages():
+    out, saved = strip_boilerplate(_pages(["a", "b", "c"][:MIN_PAGES]))
+    assert saved > 0 and out[-1].text == "c"
+
+
+def test_disabled_with_zero_share():
+    pages = _pages(["a", "b", "c", "d"])
+    assert strip_boilerplate(pages, min_share=0) == (pages, 0)
+
+
+def test_unchanged_pages_are_not_copied():
+    pages = _pages(["a", "b", "c"]) + [PageContent(url="https://example.com/solo", text="unique", status_code=200)]
+    out, _ = strip_boilerplate(pages)
+    assert out[3] is pages[3]
@@ -0,0 +1,124 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+
+from app.models.crawl import PageContent
+from app.services.change_probe import ChangeProbe
+from app.services.storage import StorageService
+
+SEED = "https://example.com/"
+PRICING = "https://example.com/pricing"
+
+
+class Site:
+    """A fake example.com behind httpx.MockTransport; pages honour If-None-Match."""
+
+    def __init__(self):
+        self.pages = {SEED: "<p>Home</p>", PRICING: "<p>$9 a month</p>"}
+        self.sitemap = None              # body, or None for a 404
+        self.sitemap_error = False       # connection failure instead of a response
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        url = str(request.url)
+        if url.endswith("/sitemap.xml"):
+            if self.sitemap_error:
+                raise httpx.ConnectError("connection refused", request=request)
+            if self.sitemap is None:
+                return httpx.Response(404)
+            return httpx.Response(200, text=self.sitemap, headers={"content-type": "application/xml"})
+        body = self.pages[url]
+        etag = f'"{hash(body)}"'
+        if request.headers.get("if-none-match") == etag:
+            return httpx.Response(304)
+        return httpx.Response(200, text=f"<html><body>{body}</body></html>",
+                              headers={"content-type": "text/html", "etag": etag})
+
+
+@pytest.fixture
+def site(monkeypatch):
+    site = Site()
+    monkeypatch.setattr(ChangeProbe, "_client",
+                        lambda self: httpx.AsyncClient(transport=httpx.MockTransport(site.handler)))
+    return site
+
+
+@pytest.fixture
+def storage(db_path):
+    return StorageService(db_path)
+
+
+def _baseline(storage, probe):
+    storage.record_crawl("example.com", "fingerprint")
+    pages = [PageContent(url=SEED, text="Home", status_code=200),
+             PageContent(url=PRICING, text="$9 a month", status_code=200)]
+    asyncio.run(probe.snapshot("example.com", SEED, pages))
+
+
+def _sitemap(lastmod: datetime) -> str:
+    return f"<urlset><url><loc>{SEED}</loc><lastmod>{lastmod.strftime('%Y-%m-%dT%H:%M:%SZ')}</lastmod></url></urlset>"
+
+
+def test_no_baseline_counts_as_changed(site, storage):
+    result = asyncio.run(ChangeProbe(storage).check("example.com", SEED))
+    assert result.changed and result.reason == "no probe baseline"
+
+
+def test_not_modified_pages_are_unchanged(site, storage):
+    probe = ChangeProbe(storage)
+    _baseline(storage, probe)
+
+    result = asyncio.run(probe.check("example.com", SEED))
+
+    assert not result.changed
+    assert result.pages_probed == 2 and result.not_modified == 2
+    assert set(result.pages) == {SEED, PRICING}
+
+
+def test_changed_text_is_detected(site, storage):
+    probe = ChangeProbe(storage)
+    _baseline(storage, probe)
+    site.pages[PRICING] = "<p>$12 a month</p>"
+
+    result = asyncio.run(probe.check("example.com", SEED))
+
+    assert result.changed and result.reason == f"page changed: {PRICING}"
+
+
+def test_sitemap_lastmod_compared_with_last_real_crawl(site, storage):
+    probe = ChangeProbe(storage)
+    site.sitemap = _sitemap(datetime.utcnow() - timedelta(days=30))
+    _baseline(storage, probe)
+    last_crawl = storage.get_crawl_schedule("example.com")["last_crawl"]
+
+    # A probe-only pass moves the schedule on but not last_crawl
+    assert not asyncio.run(probe.check("example.com", SEED)).changed
+    assert storage.record_crawl("example.com", None) is False
+    schedule = storage.get_crawl_schedule("example.com")
+    assert schedule["last_crawl"] == last_crawl and schedule["last_probe"] > last_crawl
+
+    # Updated after the real crawl but before the probe-only pass: still a change
+    site.sitemap = _sitemap(datetime.fromisoformat(last_crawl) + timedelta(seconds=1))
+    result = asyncio.run(probe.check("example.com", SEED))
+    assert result.changed and result.reason.startswith("sitemap lastmod")
+
+
+def test_sitemap_failure_is_a_change_only_if_one_was_seen(site, storage):
+    probe = ChangeProbe(storage)
+    _baseline(storage, probe)
+    assert storage.get_crawl_schedule("example.com")["sitemap_seen"] == 0
+    site.sitemap_error = True
+    assert not asyncio.run(probe.check("example.com", SEED)).changed
+
+    site.sitemap_error = False
+    site.sitemap = _sitemap(datetime.utcnow() - timedelta(days=30))
+    _baseline(storage, probe)
+    assert storage.get_crawl_schedule("example.com")["sitemap_seen"] == 1
+
+    site.sitemap_error = True
+    result = asyncio.run(probe.check("example.com", SEED))
+    assert result.changed and result.reason == "sitemap no longer fetchable"
+
+    site.sitemap_error, site.sitemap = False, None
+    assert asyncio.run(probe.check("example.com", SEED)).changed
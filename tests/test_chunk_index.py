@@ -0,0 +1,69 @@
+from types import SimpleNamespace
+
+from app.services.chunk_index import ChunkIndex, estimate_tokens, render, tokenize
+from app.services.comprehension import PASS_QUERIES
+
+FILLER = "Teams love how simple the product feels day to day. "
+
+
+def _page(url: str, *paragraphs: str):
+    return SimpleNamespace(url=url, text="\n".join(paragraphs))
+
+
+def _site():
+    return [
+        _page("https://example.com/", "Example is an API for sending invoices.", FILLER * 20),
+        _page("https://example.com/blog", FILLER * 20, FILLER * 20),
+        _page("https://example.com/pricing", FILLER * 20,
+              "Pricing: the Pro plan costs $29 per month, billed annually. Free trial for 14 days."),
+        _page("https://example.com/docs/limits", FILLER * 20,
+              "Rate limit: 100 requests per second. Maximum payload size 10 MB; requests time out after 30s."),
+    ]
+
+
+def test_tokenize_drops_stopwords_and_punctuation():
+    assert tokenize("The Pro plan is $29/month, billed annually!") == [
+        "pro", "plan", "29", "month", "billed", "annually",
+    ]
+
+
+def test_chunks_are_paragraph_aligned_and_bounded():
+    index = ChunkIndex([_page("https://example.com/", "a" * 50, "b" * 50, "c" * 300)], chunk_chars=120)
+    assert [c.text for c in index.chunks] == ["a" * 50 + "\n" + "b" * 50, "c" * 120, "c" * 120, "c" * 60]
+    assert [c.seq for c in index.chunks] == [0, 1, 2, 3]
+
+
+def test_pass_query_ranks_its_chunk_first():
+    index = ChunkIndex(_site(), chunk_chars=400)
+    for name, needle in (("pricing", "$29 per month"), ("limitations", "Rate limit")):
+        for query in PASS_QUERIES[name][:1]:
+            scores = index.scores(query)
+            best = index.chunks[max(range(len(scores)), key=scores.__getitem__)]
+            assert needle in best.text, (name, query)
+
+
+def test_select_keeps_best_chunks_within_budget():
+    index = ChunkIndex(_site(), chunk_chars=400)
+    budget = 200
+    assert sum(estimate_tokens(c.text) for c in index.chunks) > budget
+
+    chosen = index.select(PASS_QUERIES["pricing"] + PASS_QUERIES["limitations"], budget)
+
+    texts = [c.text for c in chosen]
+    assert sum(estimate_tokens(t) for t in texts) <= budget
+    assert index.chunks[0] in chosen                       # homepage lead always goes first
+    assert any("$29 per month" in t for t in texts)
+    assert any("Rate limit" in t for t in texts)
+    assert [(c.page, c.seq) for c in chosen] == sorted((c.page, c.seq) for c in chosen)
+
+
+def test_select_everything_when_it_fits():
+    index = ChunkIndex(_site(), chunk_chars=400)
+    assert index.select(["pricing"], budget_tokens=10**6) == index.chunks
+
+
+def test_render_groups_by_page_and_marks_gaps():
+    index = ChunkIndex([_page("https://example.com/a", "one", "two", "three")], chunk_chars=5)
+    chunks = index.chunks
+    assert render([chunks[0], chunks[2]]) == "=== PAGE: https://example.com/a ===\none\n[…]\nthree"
+    assert render(chunks[:2]) == "=== PAGE: https://example.com/a ===\none\ntwo"
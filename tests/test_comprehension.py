@@ -0,0 +1,113 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.models.crawl import CrawlResult, PageContent
+from app.services.comprehension import (
+    CAPABILITIES_PROMPT, LIMITATIONS_PROMPT, METADATA_PROMPT, PRICING_PROMPT, ComprehensionService,
+)
+
+PASS_OF = {
+    METADATA_PROMPT.strip(): "metadata",
+    CAPABILITIES_PROMPT.strip(): "capabilities",
+    PRICING_PROMPT.strip(): "pricing",
+    LIMITATIONS_PROMPT.strip(): "limitations",
+}
+
+
+def _message(name: str):
+    return SimpleNamespace(
+        usage=SimpleNamespace(input_tokens=10, output_tokens=5,
+                              cache_creation_input_tokens=0, cache_read_input_tokens=0),
+        content=[SimpleNamespace(text=json.dumps({"pass": name}))],
+    )
+
+
+class FakeMessages:
+    """Records when each pass starts, begins responding and finishes."""
+
+    def __init__(self, prefill: float = 0.02, generate: float = 0.2):
+        self.prefill, self.generate = prefill, generate
+        self.log = []
+
+    def _name(self, messages) -> str:
+        return PASS_OF[messages[0]["content"][-1]["text"]]
+
+    async def create(self, model, max_tokens, messages):
+        name = self._name(messages)
+        self.log.append(("start", name))
+        await asyncio.sleep(self.prefill + self.generate)
+        self.log.append(("done", name))
+        return _message(name)
+
+    def stream(self, model, max_tokens, messages):
+        fake, name = self, self._name(messages)
+
+        class Stream:
+            async def __aenter__(self):
+                fake.log.append(("start", name))
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            async def __aiter__(self):
+                await asyncio.sleep(fake.prefill)
+                fake.log.append(("message_start", name))
+                yield SimpleNamespace(type="message_start")
+                await asyncio.sleep(fake.generate)
+                yield SimpleNamespace(type="message_stop")
+
+            async def get_final_message(self):
+                fake.log.append(("done", name))
+                return _message(name)
+
+        return Stream()
+
+
+@pytest.fixture
+def service(db_path, monkeypatch):
+    monkeypatch.setattr(ComprehensionService, "__init__", lambda self: None)
+    svc = ComprehensionService()
+    svc.client = SimpleNamespace(messages=FakeMessages())
+    svc.fast_model, svc.deep_model = "fast", "deep"
+    return svc
+
+
+def _crawl():
+    pages = [
+        PageContent(url="https://example.com/", text="Example API for developers. " * 20, status_code=200),
+        PageContent(url="https://example.com/pricing", text="Pro plan $29 per month. " * 20, status_code=200),
+    ]
+    return CrawlResult(domain="example.com", seed_url="https://example.com/", pages=pages, total_pages=2,
+                       crawl_duration_ms=1, used_playwright=False)
+
+
+def test_sibling_pass_starts_once_first_response_begins(service):
+    raw = asyncio.run(service.extract(_crawl()))
+    log = service.client.messages.log
+
+    assert {raw[name]["pass"] for name in PASS_OF.values()} == set(PASS_OF.values())
+    for first, sibling in (("metadata", "pricing"), ("capabilities", "limitations")):
+        # Prefix cached by message_start; the sibling overlaps the first pass's generation
+        assert log.index(("message_start", first)) < log.index(("start", sibling)) < log.index(("done", first))
+
+
+def test_comprehension_wall_time_close_to_slowest_pass(service):
+    import time
+
+    start = time.monotonic()
+    asyncio.run(service.extract(_crawl()))
+    elapsed = time.monotonic() - start
+    # one prefill (0.02) + one pass (0.22); run back to back it would be ~0.44
+    assert elapsed < 0.4
+
+
+def test_second_run_served_from_llm_cache(service):
+    asyncio.run(service.extract(_crawl()))
+    service.client.messages.log.clear()
+    raw = asyncio.run(service.extract(_crawl()))
+    assert service.client.messages.log == []
+    assert raw["metadata"] == {"pass": "metadata"}
@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.config import settings
+from app.services.storage import StorageService
+
+
+@pytest.fixture
+def storage(db_path, monkeypatch):
+    monkeypatch.setattr(settings, "refresh_jitter", 0.0)
+    monkeypatch.setattr(settings, "auto_refresh_interval_hours", 168)
+    monkeypatch.setattr(settings, "refresh_min_interval_hours", 24)
+    monkeypatch.setattr(settings, "refresh_max_interval_hours", 720)
+    return StorageService(db_path)
+
+
+def _schedule(storage, domain="example.com"):
+    return storage.get_crawl_schedule(domain)
+
+
+def _hours_until(iso: str) -> float:
+    return (datetime.fromisoformat(iso) - datetime.utcnow()).total_seconds() / 3600
+
+
+def test_first_crawl_keeps_starting_interval(storage):
+    assert storage.record_crawl("example.com", "h1") is True
+    row = _schedule(storage)
+    assert row["interval_hours"] == 168 and row["content_hash"] == "h1"
+    assert _hours_until(row["next_crawl"]) == pytest.approx(168, abs=0.01)
+
+
+def test_unchanged_content_stretches_interval(storage):
+    storage.record_crawl("example.com", "h1")
+    assert storage.record_crawl("example.com", "h1") is False
+    assert _schedule(storage)["interval_hours"] == 252
+    storage.record_crawl("example.com", "h1")
+    assert _schedule(storage)["interval_hours"] == 378
+
+
+def test_changed_content_halves_interval(storage):
+    storage.record_crawl("example.com", "h1")
+    assert storage.record_crawl("example.com", "h2") is True
+    row = _schedule(storage)
+    assert row["interval_hours"] == 84 and row["last_changed"] is not None
+
+
+def test_interval_is_clamped(storage):
+    storage.record_crawl("example.com", "h0")
+    for i in range(10):
+        storage.record_crawl("example.com", f"changed-{i}")
+    assert _schedule(storage)["interval_hours"] == 24
+    for _ in range(20):
+        storage.record_crawl("example.com", "stable")
+    assert _schedule(storage)["interval_hours"] == 720
+
+
+def test_manual_crawl_restarts_clock_without_adapting(storage):
+    storage.record_crawl("example.com", "h1")
+    storage.record_crawl("example.com", "h1", adapt=False)
+    storage.record_crawl("example.com", "h2", adapt=False)
+    row = _schedule(storage)
+    assert row["interval_hours"] == 168 and row["content_hash"] == "h2"
+    assert _hours_until(row["next_crawl"]) == pytest.approx(168, abs=0.01)
+
+
+def test_jitter_stays_within_bounds(storage, monkeypatch):
+    monkeypatch.setattr(settings, "refresh_jitter", 0.1)
+    for i in range(50):
+        storage.record_crawl(f"d{i}.com", "h")
+    hours = [_hours_until(_schedule(storage, f"d{i}.com")["next_crawl"]) for i in range(50)]
+    assert all(168 * 0.9 - 0.01 <= h <= 168 * 1.1 + 0.01 for h in hours)
+    assert len({round(h, 3) for h in hours}) > 1
+
+
+def test_due_for_crawl_orders_by_next_crawl_and_respects_defer(storage, db_path):
+    from app.services import db
+
+    for domain in ("a.com", "b.com", "c.com"):
+        storage.record_crawl(domain, "h")
+    conn = db.get_conn(db_path)
+    past = datetime.utcnow() - timedelta(hours=1)
+    with conn:
+        conn.execute("UPDATE crawl_schedule SET next_crawl = ? WHERE domain = 'b.com'", (past.isoformat(),))
+        conn.execute("UPDATE crawl_schedule SET next_crawl = ? WHERE domain = 'c.com'",
+                     ((past - timedelta(hours=1)).isoformat(),))
+
+    assert storage.due_for_crawl(10) == ["c.com", "b.com"]
+    assert storage.due_for_crawl(1) == ["c.com"]
+
+    storage.defer_crawl("c.com", 6)
+    assert storage.due_for_crawl(10) == ["b.com"]
+    assert _schedule(storage, "c.com")["interval_hours"] == 168
@@ -0,0 +1,66 @@
+import gc
+import sqlite3
+import threading
+
+import pytest
+
+from app.services import db
+
+
+def _conn_in_thread(path: str) -> sqlite3.Connection:
+    out = []
+    t = threading.Thread(target=lambda: out.append(db.get_conn(path)))
+    t.start()
+    t.join()
+    return out[0]
+
+
+def _is_closed(conn: sqlite3.Connection) -> bool:
+    try:
+        conn.execute("SELECT 1")
+        return False
+    except sqlite3.ProgrammingError:
+        return True
+
+
+def test_same_thread_reuses_connection(tmp_path):
+    path = str(tmp_path / "a.db")
+    assert db.get_conn(path) is db.get_conn(path)
+    assert db.get_conn(path).execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    db.close_all()
+
+
+def test_exited_thread_connections_are_closed(tmp_path):
+    path = str(tmp_path / "a.db")
+    conn = _conn_in_thread(path)
+    gc.collect()
+    assert _is_closed(conn)
+
+
+def test_close_all_closes_and_resets_other_threads(tmp_path):
+    path = str(tmp_path / "a.db")
+    ready, release = threading.Event(), threading.Event()
+    seen = []
+
+    def worker():
+        seen.append(db.get_conn(path))
+        ready.set()
+        release.wait()
+        seen.append(db.get_conn(path))  # after close_all: must be a fresh, usable connection
+        seen.append(seen[-1].execute("SELECT 1").fetchone()[0])
+
+    t = threading.Thread(target=worker)
+    t.start()
+    ready.wait()
+    main_conn = db.get_conn(path)
+    assert db.pool_size() >= 2
+
+    db.close_all()
+    assert _is_closed(seen[0]) and _is_closed(main_conn)
+    assert db.pool_size() == 0
+
+    release.set()
+    t.join()
+    assert seen[1] is not seen[0] and seen[2] == 1
+    assert not _is_closed(db.get_conn(path))
+    db.close_all()
@@ -0,0 +1,41 @@
+import random
+
+import pytest
+
+from app.services.hll import HyperLogLog
+
+# Standard error at precision 12 is ~1.6%; allow a few sigma
+TOLERANCE = 0.05
+
+
+@pytest.mark.parametrize("n", [1, 10, 100, 1_000, 10_000, 100_000])
+def test_count_matches_exact_within_tolerance(n):
+    values = random.Random(n).sample(range(10**9), n)
+    sketch = HyperLogLog()
+    sketch.update(values)
+    assert abs(sketch.count() - n) <= max(1, n * TOLERANCE)
+
+
+def test_duplicates_do_not_inflate_count():
+    sketch = HyperLogLog()
+    sketch.update(list(range(500)) * 20)
+    assert abs(sketch.count() - 500) <= 500 * TOLERANCE
+
+
+def test_merge_equals_union():
+    rng = random.Random(7)
+    a_vals = set(rng.sample(range(10**6), 3_000))
+    b_vals = set(rng.sample(range(10**6), 3_000))
+    a, b = HyperLogLog(), HyperLogLog()
+    a.update(a_vals)
+    b.update(b_vals)
+    a.merge(b)
+    union = len(a_vals | b_vals)
+    assert abs(a.count() - union) <= union * TOLERANCE
+
+
+@pytest.mark.parametrize("n", [50, 5_000])  # sparse and dense encodings
+def test_serialization_round_trip(n):
+    sketch = HyperLogLog()
+    sketch.update(range(n))
+    assert HyperLogLog.from_bytes(sketch.to_bytes()).count() == sketch.count()
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from app.services import job_events
+from app.services.job_events import JobEventBus
+
+
+def test_history_is_replayed_then_dropped_after_retention(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(job_events.time, "monotonic", lambda: clock[0])
+    bus = JobEventBus(history=3, retain_seconds=60)
+
+    for i in range(5):
+        bus.publish("j1", "stage", n=i)
+    assert [e["n"] for e in bus._history["j1"]] == [2, 3, 4]
+
+    bus.publish("j1", "complete")
+    clock[0] += 61
+    bus.publish("j2", "claimed")
+    assert "j1" not in bus._history and "j2" in bus._history
+
+
+def test_jobs_without_terminal_event_expire_when_stale(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(job_events.time, "monotonic", lambda: clock[0])
+    bus = JobEventBus(retain_seconds=60, stale_seconds=600)
+
+    bus.publish("orphan", "stage", stage="crawl")   # worker died: never finishes
+    clock[0] += 300
+    bus.publish("active", "stage", stage="crawl")
+    clock[0] += 301
+    bus.publish("active", "stage", stage="comprehend")
+
+    assert list(bus._history) == ["active"]
+    assert bus.stats()["evicted"] == 1
+
+
+def test_history_is_capped_at_max_jobs_least_recently_active_first():
+    bus = JobEventBus(max_jobs=3)
+    for job_id in ("a", "b", "c"):
+        bus.publish(job_id, "claimed")
+    bus.publish("a", "stage")          # a is now the most recently active
+    bus.publish("d", "claimed")
+
+    assert list(bus._history) == ["c", "a", "d"]
+    assert len(bus._last_event) == 3
+
+
+@pytest.mark.asyncio
+async def test_stream_replays_backlog_then_live_events():
+    bus = JobEventBus()
+    bus.publish("j1", "claimed")
+    received = []
+
+    async def consume():
+        async for event in bus.stream("j1", idle_timeout=1):
+            received.append(event["type"])
+            if event["type"] == "complete":
+                return
+
+    task = asyncio.create_task(consume())
+    await asyncio.sleep(0.01)
+    await asyncio.to_thread(bus.publish, "j1", "stage")   # from another thread, like the scheduler
+    bus.publish("j1", "complete")
+    await asyncio.wait_for(task, 2)
+
+    assert received == ["claimed", "stage", "complete"]
+    assert bus.stats()["subscribers"] == 0
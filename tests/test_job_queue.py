@@ -0,0 +1,250 @@
+import asyncio
+import time
+from datetime import datetime
+
+import pytest
+
+from app.models.jobs import IngestJob, JobStatus
+from app.services import db
+from app.services.job_queue import JobQueue
+
+
+def _queue(db_path: str, **overrides) -> JobQueue:
+    opts = dict(workers=1, lease_seconds=30, poll_interval=0.05, stage_retries=2,
+                retry_backoff=0.01, max_attempts=2)
+    opts.update(overrides)
+    return JobQueue(db_path, **opts)
+
+
+def _job(job_id: str, domain: str = "example.com") -> IngestJob:
+    return IngestJob(job_id=job_id, domain=domain, url=f"https://{domain}", created_at=datetime.utcnow())
+
+
+def _row(db_path: str, job_id: str) -> dict:
+    return dict(db.get_conn(db_path).execute("SELECT * FROM ingest_jobs WHERE job_id = ?", (job_id,)).fetchone())
+
+
+async def _wait_for(predicate, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.02)
+
+
+def _expire_lease(db_path: str, job_id: str):
+    conn = db.get_conn(db_path)
+    with conn:
+        conn.execute("UPDATE ingest_jobs SET lease_expires_at = ? WHERE job_id = ?", (int(time.time()) - 1, job_id))
+
+
+# ── Lease expiry ────────────────────────────────────────────────────────────
+
+def test_expired_lease_is_requeued_then_failed_after_max_attempts(db_path):
+    queue = _queue(db_path, max_attempts=2)
+    queue.register_handler("ingest", lambda job, payload: None)
+    queue.enqueue(_job("j1"), "ingest")
+
+    # First worker claims it and dies
+    assert queue._claim("dead-worker")["job_id"] == "j1"
+    assert queue._reclaim_expired() == 0          # lease still valid
+    _expire_lease(db_path, "j1")
+    assert queue._reclaim_expired() == 1
+    row = _row(db_path, "j1")
+    assert (row["status"], row["lease_owner"], row["attempts"]) == ("pending", None, 1)
+
+    # Second claim dies too: out of attempts
+    assert queue._claim("dead-worker-2")["attempts"] == 2
+    _expire_lease(db_path, "j1")
+    queue._reclaim_expired()
+    row = _row(db_path, "j1")
+    assert row["status"] == "failed" and "2 attempt" in row["error"]
+    assert queue._claim("worker") is None
+
+
+def test_lost_lease_cannot_be_renewed_or_finished_by_old_owner(db_path):
+    queue = _queue(db_path)
+    queue.register_handler("ingest", lambda job, payload: None)
+    queue.enqueue(_job("j1"), "ingest")
+    queue._claim("old")
+    _expire_lease(db_path, "j1")
+    queue._reclaim_expired()
+    queue._claim("new")
+
+    assert queue._renew("j1", "old") is False
+    queue._finish("j1", "old", "late failure")
+    assert _row(db_path, "j1")["lease_owner"] == "new" and _row(db_path, "j1")["error"] is None
+
+
+@pytest.mark.asyncio
+async def test_worker_picks_up_reclaimed_job(db_path):
+    queue = _queue(db_path)
+    ran = []
+
+    async def handler(job, payload):
+        ran.append((job.job_id, payload))
+
+    queue.register_handler("ingest", handler)
+    queue.enqueue(_job("j1"), "ingest", {"force": True})
+    queue._claim("crashed-process")
+    _expire_lease(db_path, "j1")
+
+    await queue.start()
+    try:
+        await _wait_for(lambda: _row(db_path, "j1")["status"] == JobStatus.COMPLETE.value)
+    finally:
+        await queue.stop()
+    assert ran == [("j1", {"force": True})]
+    assert queue.stats()["reclaimed"] == 1
+
+
+# ── Stages and shutdown ─────────────────────────────────────────────────────
+
+@pytest.mark.asyncio
+async def test_stage_is_retried_alone(db_path):
+    queue = _queue(db_path, stage_retries=2)
+    calls = {"crawl": 0, "store": 0}
+
+    def crawl():
+        calls["crawl"] += 1
+        if calls["crawl"] < 3:
+            raise RuntimeError("flaky")
+        return "pages"
+
+    async def handler(job, payload):
+        assert await queue.run_stage(job, "crawl", crawl) == "pages"
+        await queue.run_stage(job, "store", lambda: calls.__setitem__("store", calls["store"] + 1))
+
+    queue.register_handler("ingest", handler)
+    queue.enqueue(_job("j1"), "ingest")
+    await queue.start()
+    try:
+        await _wait_for(lambda: _row(db_path, "j1")["status"] == JobStatus.COMPLETE.value)
+    finally:
+        await queue.stop()
+    assert calls == {"crawl": 3, "store": 1}
+    assert _row(db_path, "j1")["stage"] == "store"
+
+
+@pytest.mark.asyncio
+async def test_stop_hands_running_job_back_without_spending_an_attempt(db_path):
+    queue = _queue(db_path)
+    started = asyncio.Event()
+
+    async def handler(job, payload):
+        started.set()
+        await asyncio.sleep(60)
+
+    queue.register_handler("ingest", handler)
+    queue.enqueue(_job("j1"), "ingest")
+    await queue.start()
+    await asyncio.wait_for(started.wait(), 5)
+    await queue.stop()
+
+    row = _row(db_path, "j1")
+    assert (row["status"], row["lease_owner"], row["attempts"]) == ("pending", None, 0)
+
+
+# ── Inline jobs (scheduled refreshes) ───────────────────────────────────────
+
+def _inline_job(job_id: str = "auto_1") -> IngestJob:
+    job = _job(job_id)
+    job.status = JobStatus.CRAWLING
+    return job
+
+
+@pytest.mark.asyncio
+async def test_inline_job_is_leased_and_not_taken_by_another_process(db_path):
+    scheduler_queue = _queue(db_path)
+    scheduler_queue.lease_seconds = 1           # heartbeat every ~0.33s
+    other = _queue(db_path)
+    other.register_handler("ingest", lambda job, payload: None)
+
+    job = scheduler_queue.enqueue(_inline_job(), "ingest", run_inline=True)
+    assert _row(db_path, "auto_1")["lease_owner"] == scheduler_queue.inline_owner
+
+    async with scheduler_queue.inline_lease(job):
+        await asyncio.sleep(1.5)                # past the initial lease; renewed meanwhile
+        assert other._recover_orphans() == 0
+        assert other._reclaim_expired() == 0
+        assert other._claim("worker") is None
+        assert _row(db_path, "auto_1")["status"] == JobStatus.CRAWLING.value
+
+    row = _row(db_path, "auto_1")
+    assert row["lease_owner"] is None and row["status"] == JobStatus.CRAWLING.value
+
+
+def test_inline_job_of_dead_process_is_failed_not_requeued(db_path):
+    queue = _queue(db_path, max_attempts=3)
+    queue.enqueue(_inline_job(), "ingest", run_inline=True)
+    _expire_lease(db_path, "auto_1")
+
+    restarted = _queue(db_path, max_attempts=3)
+    restarted.register_handler("ingest", lambda job, payload: None)
+    assert restarted._recover_orphans() == 0
+    assert restarted._reclaim_expired() == 1
+    row = _row(db_path, "auto_1")
+    assert row["status"] == "failed" and row["lease_owner"] is None
+    assert restarted._claim("worker") is None
+
+
+# ── Single-flight ingests ───────────────────────────────────────────────────
+
+def test_second_ingest_for_domain_coalesces_onto_running_job(db_path):
+    queue = _queue(db_path)
+    queue.register_handler("ingest", lambda job, payload: None)
+    first = queue.enqueue(_job("j1"), "ingest")
+    second = queue.enqueue(_job("j2"), "ingest")
+
+    assert first.job_id == second.job_id == "j1"
+    assert db.get_conn(db_path).execute("SELECT COUNT(*) FROM ingest_jobs").fetchone()[0] == 1
+    assert queue.stats()["coalesced"] == 1
+    # Other domains are unaffected
+    assert queue.enqueue(_job("j3", "other.com"), "ingest").job_id == "j3"
+
+
+def test_new_ingest_allowed_once_previous_finished(db_path):
+    queue = _queue(db_path)
+    queue.register_handler("ingest", lambda job, payload: None)
+    queue.enqueue(_job("j1"), "ingest")
+    queue._claim("w")
+    queue._finish("j1", "w", None)
+
+    assert queue.enqueue(_job("j2"), "ingest").job_id == "j2"
+
+
+def test_inline_run_coalesces_with_queued_job(db_path):
+    queue = _queue(db_path)
+    queue.register_handler("ingest", lambda job, payload: None)
+    queue.enqueue(_job("j1"), "ingest")
+
+    inline = _job("auto_1")
+    inline.status = JobStatus.CRAWLING
+    assert queue.enqueue(inline, "ingest", run_inline=True).job_id == "j1"
+
+
+def test_push_jobs_are_not_coalesced(db_path):
+    queue = _queue(db_path)
+    queue.register_handler("push", lambda job, payload: None)
+    assert queue.enqueue(_job("p1"), "push").job_id == "p1"
+    assert queue.enqueue(_job("p2"), "push").job_id == "p2"
+
+
+def test_concurrent_enqueues_from_threads_yield_one_job(db_path):
+    import threading
+
+    queue = _queue(db_path)
+    queue.register_handler("ingest", lambda job, payload: None)
+    results, barrier = [], threading.Barrier(8)
+
+    def submit(i):
+        barrier.wait()
+        results.append(queue.enqueue(_job(f"j{i}"), "ingest").job_id)
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(set(results)) == 1
+    assert db.get_conn(db_path).execute("SELECT COUNT(*) FROM ingest_jobs").fetchone()[0] == 1
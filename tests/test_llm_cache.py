@@ -0,0 +1,67 @@
+from app.services import db
+from app.services.llm_cache import LLMCache
+
+
+def _rows(db_path: str) -> int:
+    return db.get_conn(db_path).execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+
+def test_round_trip_and_counters(db_path):
+    cache = LLMCache(db_path, max_entries=100)
+    assert cache.get("m", "metadata", 1, "abc") is None
+    cache.put("m", "metadata", 1, "abc", {"name": "Acme"})
+    assert cache.get("m", "metadata", 1, "abc") == {"name": "Acme"}
+    assert cache.get("m", "metadata", 2, "abc") is None  # prompt version is part of the key
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["stores"]) == (1, 2, 1)
+
+
+def test_evicts_least_recently_used_over_bound(db_path, monkeypatch):
+    monkeypatch.setattr("app.services.llm_cache.EVICT_SLACK", 0)
+    cache = LLMCache(db_path, max_entries=5)
+    for i in range(5):
+        cache.put("m", "p", 1, f"k{i}", i)
+    conn = db.get_conn(db_path)
+    with conn:
+        conn.execute("UPDATE llm_cache SET last_used_at = last_used_at - 100 + CAST(substr(content_sha256, 2) AS INT)")
+        conn.execute("UPDATE llm_cache SET last_used_at = last_used_at + 1000 WHERE content_sha256 = 'k0'")
+
+    cache.put("m", "p", 1, "k5", 5)
+    cache.put("m", "p", 1, "k6", 6)
+
+    assert _rows(db_path) == 5
+    assert cache.get("m", "p", 1, "k0") == 0                       # recently used: kept
+    assert cache.get("m", "p", 1, "k1") is None and cache.get("m", "p", 1, "k2") is None
+    assert cache.stats()["evictions"] == 2
+
+
+def test_counts_table_only_when_tracked_size_crosses_bound(db_path, monkeypatch):
+    cache = LLMCache(db_path, max_entries=100)
+    counts = []
+    real_get_conn = db.get_conn
+
+    class Spy:
+        def __init__(self, conn):
+            self.conn = conn
+
+        def __enter__(self):
+            self.conn.__enter__()
+            return self
+
+        def __exit__(self, *exc):
+            return self.conn.__exit__(*exc)
+
+        def execute(self, sql, *args):
+            if "COUNT(*)" in sql:
+                counts.append(sql)
+            return self.conn.execute(sql, *args)
+
+    monkeypatch.setattr("app.services.llm_cache.get_conn", lambda path: Spy(real_get_conn(path)))
+    for i in range(200):
+        cache.put("m", "p", 1, f"k{i}", i)
+
+    # Once on the first write, then each time the bound is crossed: eviction
+    # goes 5% below it, so that's every 6 writes here rather than every write
+    assert len(counts) == 1 + 17
+    assert 95 <= _rows(db_path) <= 100
@@ -0,0 +1,93 @@
+import sqlite3
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+from app.config import settings
+from app.services import citation_tracker, db, migrations
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def _columns(conn, table):
+    return {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+
+
+@pytest.fixture
+def baseline_db(tmp_path, monkeypatch):
+    """Registry + citations DBs in the pre-migrations schema, with some data."""
+    path = str(tmp_path / "registry.db")
+    citations = str(tmp_path / "citations.db")
+    monkeypatch.setattr(settings, "database_url", path)
+    monkeypatch.setattr(citation_tracker, "DEFAULT_DB_PATH", citations)
+
+    now = datetime.utcnow()
+    conn = sqlite3.connect(path)
+    conn.executescript((FIXTURES / "baseline_registry.sql").read_text())
+    conn.execute(
+        "INSERT INTO registries VALUES ('old.com', '{}', ?, ?, 'c1')",
+        ((now - timedelta(days=30)).isoformat(),) * 2,
+    )
+    conn.execute(
+        "INSERT INTO ingest_jobs (job_id, domain, url, status, created_at) VALUES (?, ?, ?, ?, ?)",
+        ("j1", "old.com", "https://old.com", "crawling", now.isoformat()),
+    )
+    conn.execute(
+        "INSERT INTO ingest_jobs (job_id, domain, url, status, created_at) VALUES (?, ?, ?, ?, ?)",
+        ("j2", "old.com", "https://old.com", "comprehending", now.isoformat()),
+    )
+    conn.execute(
+        "INSERT INTO tenants (api_key, name, email, created_at) VALUES ('k1', 'T', 't@x.com', ?)",
+        (now.isoformat(),),
+    )
+    conn.executemany(
+        """INSERT INTO agent_events (domain, page_url, agent_name, agent_type, user_agent, ts)
+           VALUES ('old.com', ?, 'GPTBot', 'crawler', 'GPTBot/1.0', ?)""",
+        [(f"https://old.com/p{i % 3}", (now - timedelta(hours=i)).isoformat()) for i in range(5)],
+    )
+    conn.commit()
+    conn.close()
+    sqlite3.connect(citations).executescript((FIXTURES / "baseline_citations.sql").read_text())
+    yield path
+    db.close_all()
+
+
+def test_run_all_upgrades_baseline_schema(baseline_db):
+    migrations.run_all()
+
+    latest = max(v for v, _, _ in migrations.MAIN_MIGRATIONS)
+    assert migrations.current_version(baseline_db) == latest
+    assert migrations.current_version(citation_tracker.DEFAULT_DB_PATH) == max(
+        v for v, _, _ in migrations.CITATION_MIGRATIONS
+    )
+
+    conn = db.get_conn(baseline_db)
+    assert {"kind", "payload", "attempts", "lease_owner", "boilerplate_bytes_removed"} <= _columns(conn, "ingest_jobs")
+    assert {"content_hash", "last_changed", "last_probe", "sitemap_seen"} <= _columns(conn, "crawl_schedule")
+    assert {"probe_hash", "etag", "last_modified"} <= _columns(conn, "page_hashes")
+
+    # Existing data survives; duplicate in-flight ingests are settled to one
+    assert conn.execute("SELECT COUNT(*) FROM registries").fetchone()[0] == 1
+    statuses = dict(conn.execute("SELECT job_id, status FROM ingest_jobs").fetchall())
+    assert statuses == {"j1": "failed", "j2": "comprehending"}
+
+    # Overdue registry is put on the schedule within the next minimum interval
+    row = conn.execute("SELECT next_crawl FROM crawl_schedule WHERE domain = 'old.com'").fetchone()
+    next_crawl = datetime.fromisoformat(row[0])
+    assert datetime.utcnow() <= next_crawl <= datetime.utcnow() + timedelta(hours=settings.refresh_min_interval_hours)
+
+
+def test_run_all_is_idempotent(baseline_db):
+    migrations.run_all()
+    assert migrations.migrate(baseline_db, migrations.MAIN_MIGRATIONS) == 0
+
+
+def test_online_copy_moves_legacy_events(baseline_db):
+    from app.services.analytics import AnalyticsService
+
+    migrations.run_all()
+    migrations._run_online_migrations(baseline_db, batch_size=2, pause=0)
+
+    agents = AnalyticsService(baseline_db).get_agent_breakdown("old.com", days=30)["agents"]
+    assert [(a["agent_name"], a["hits"], a["unique_pages"]) for a in agents] == [("GPTBot", 5, 3)]
@@ -0,0 +1,35 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from app.api.routes import ingest, push
+from app.models.jobs import IngestJob
+from app.services.comprehension import ComprehensionService
+from app.services.job_events import get_job_events
+from app.services.storage import StorageService
+
+
+@pytest.fixture
+def storage(db_path, monkeypatch):
+    storage = StorageService(db_path)
+    monkeypatch.setattr(push, "storage", storage)
+    monkeypatch.setattr(ingest, "storage", storage)
+
+    async def extract(self, crawl_result, job_id=None):
+        return {"metadata": {"name": "Example", "description": "An example service"}}
+
+    monkeypatch.setattr(ComprehensionService, "__init__", lambda self: None)
+    monkeypatch.setattr(ComprehensionService, "extract", extract)
+    return storage
+
+
+def test_push_pipeline_publishes_each_status(storage):
+    job = IngestJob(job_id="push_1", domain="example.com", url="https://example.com/", created_at=datetime.utcnow())
+    storage.save_job(job)
+
+    asyncio.run(push._run_push_pipeline(job, {"page": {"url": "https://example.com/", "title": "Example"}}))
+
+    statuses = [e["status"] for e in get_job_events()._history["push_1"] if e["type"] == "status"]
+    assert statuses == ["comprehending", "storing", "complete"]
+    assert storage.get_registry("example.com") is not None
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from app.config import settings
+from app.models.crawl import CrawlResult, PageContent
+from app.services import scheduler
+from app.services.comprehension import ComprehensionService
+from app.services.crawler import CrawlerService
+from app.services.job_events import get_job_events
+from app.services.registry_builder import RegistryBuilder
+from app.services.storage import StorageService
+
+RAW = {"metadata": {"name": "Example", "description": "An example service"}}
+
+
+@pytest.fixture
+def storage(db_path, monkeypatch):
+    monkeypatch.setattr(settings, "refresh_probe_enabled", False)
+    monkeypatch.setattr(settings, "job_retry_backoff_seconds", 0.0)
+    storage = StorageService(db_path)
+    storage.save_registry(RegistryBuilder().build("example.com", RAW))
+    return storage
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    """Crawler and comprehension replaced by canned results; crawl can be made to fail."""
+    state = {"crawl_error": None, "text": "hello"}
+
+    async def crawl(self, url):
+        if state["crawl_error"]:
+            raise state["crawl_error"]
+        page = PageContent(url=url, text=state["text"], status_code=200)
+        return CrawlResult(domain="example.com", seed_url=url, pages=[page], total_pages=1,
+                           crawl_duration_ms=1, used_playwright=False)
+
+    async def extract(self, crawl_result, job_id=None):
+        return dict(RAW)
+
+    monkeypatch.setattr(CrawlerService, "crawl", crawl)
+    monkeypatch.setattr(ComprehensionService, "__init__", lambda self: None)
+    monkeypatch.setattr(ComprehensionService, "extract", extract)
+    return state
+
+
+def _auto_job(storage):
+    jobs = [j for j in storage.list_jobs() if j["job_id"].startswith("auto_")]
+    assert len(jobs) == 1
+    return jobs[0]
+
+
+def _event_types(job_id):
+    return [e["type"] for e in get_job_events()._history.get(job_id, ())]
+
+
+def test_scheduled_refresh_publishes_job_events(storage, pipeline):
+    assert asyncio.run(scheduler._refresh_one("example.com", storage, settings)) is None
+
+    job = _auto_job(storage)
+    assert job["status"] == "complete" and job["pages_crawled"] == 1
+    assert job["lease_owner"] is None                 # inline lease dropped once settled
+    types = _event_types(job["job_id"])
+    assert types[0] == "status" and types[-1] == "complete"
+    assert {"stage", "stage_done", "crawled"} <= set(types)
+    stages = [e["stage"] for e in get_job_events()._history[job["job_id"]] if e["type"] == "stage_done"]
+    assert stages == ["crawl", "comprehend", "store"]
+
+
+def test_failed_scheduled_refresh_publishes_failed(storage, pipeline, monkeypatch):
+    monkeypatch.setattr(settings, "job_stage_retries", 0)
+    pipeline["crawl_error"] = RuntimeError("site down")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(scheduler._refresh_one("example.com", storage, settings))
+
+    job = _auto_job(storage)
+    assert job["status"] == "failed" and job["error"] == "site down"
+    events = get_job_events()._history[job["job_id"]]
+    assert events[-1]["type"] == "failed" and events[-1]["error"] == "site down"
+
+
+def test_domain_with_ingest_in_flight_is_skipped_and_deferred(storage, pipeline):
+    from datetime import datetime
+
+    from app.models.jobs import IngestJob
+    from app.services.job_queue import get_job_queue
+
+    queue = get_job_queue()
+    queue.register_handler("ingest", lambda job, payload: None)
+    queue.enqueue(IngestJob(job_id="manual", domain="example.com", url="https://example.com",
+                            created_at=datetime.utcnow()), "ingest")
+
+    reason = asyncio.run(scheduler._refresh_one("example.com", storage, settings))
+
+    assert reason == "job manual already in flight"
+    assert storage.due_for_crawl(10) == []
+    next_crawl = datetime.fromisoformat(storage.get_crawl_schedule("example.com")["next_crawl"])
+    assert next_crawl > datetime.utcnow()
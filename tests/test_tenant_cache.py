@@ -0,0 +1,105 @@
+import time
+
+import pytest
+
+from app.services import tenant as tenant_module
+from app.services.tenant import TenantCache, TenantService
+
+
+@pytest.fixture
+def service(db_path, monkeypatch):
+    monkeypatch.setattr(tenant_module, "_tenant_cache", None)
+    return TenantService(db_path)
+
+
+@pytest.fixture
+def key(service):
+    api_key = service.create_tenant("Acme", "ops@acme.test").api_key
+    assert service.get_tenant_cached(api_key).plan == "free"     # now cached
+    return api_key
+
+
+def _cached(api_key: str):
+    found, tenant = tenant_module.get_tenant_cache().get(api_key)
+    assert found, "expected a cache entry"
+    return tenant
+
+
+# ── TenantCache ─────────────────────────────────────────────────────────────
+
+def test_negative_entries_cached_with_their_own_ttl():
+    cache = TenantCache(max_entries=10, ttl_seconds=60, negative_ttl_seconds=0.05)
+    cache.put("cr_live_unknown", None)
+    assert cache.get("cr_live_unknown") == (True, None)
+    time.sleep(0.06)
+    assert cache.get("cr_live_unknown") == (False, None)
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_lru_evicts_least_recently_used():
+    cache = TenantCache(max_entries=2, ttl_seconds=60, negative_ttl_seconds=60)
+    cache.put("a", None)
+    cache.put("b", None)
+    cache.get("a")
+    cache.put("c", None)
+    assert cache.get("b") == (False, None)
+    assert cache.get("a")[0] and cache.get("c")[0]
+
+
+def test_unknown_key_lookup_is_served_from_negative_cache(service, monkeypatch):
+    assert service.get_tenant_cached("cr_live_nope") is None
+    monkeypatch.setattr(service, "get_tenant", lambda api_key: pytest.fail("hit the database"))
+    assert service.get_tenant_cached("cr_live_nope") is None
+
+
+# ── Every mutation invalidates ──────────────────────────────────────────────
+
+def test_update_plan_invalidates(service, key):
+    service.update_plan(key, "pro")
+    assert tenant_module.get_tenant_cache().get(key) == (False, None)
+    assert service.get_tenant_cached(key).plan == "pro"
+
+
+def test_deactivate_invalidates(service, key):
+    service.deactivate(key)
+    assert service.get_tenant_cached(key) is None
+    assert _cached(key) is None            # now negatively cached
+
+
+def test_ls_subscription_changes_invalidate(service, key):
+    assert service.activate_ls_subscription("ops@acme.test", "agency", "sub_1")
+    assert service.get_tenant_cached(key).plan == "agency"
+    assert service.deactivate_ls_subscription("ops@acme.test")
+    assert service.get_tenant_cached(key).plan == "free"
+
+
+def test_stripe_changes_invalidate(service, key):
+    service.set_stripe_customer(key, "cus_1")
+    assert service.get_tenant_cached(key).stripe_customer_id == "cus_1"
+    service.activate_subscription("cus_1", "pro", "sub_1")
+    assert service.get_tenant_cached(key).plan == "pro"
+    service.deactivate_subscription("cus_1")
+    assert service.get_tenant_cached(key).plan == "free"
+
+
+def test_reset_daily_usage_clears_cache(service, key, db_path):
+    from app.services import db
+
+    conn = db.get_conn(db_path)
+    with conn:
+        conn.execute("UPDATE tenants SET requests_today = 42 WHERE api_key = ?", (key,))
+    service.reset_daily_usage()
+    assert tenant_module.get_tenant_cache().stats()["entries"] == 0
+    assert service.get_tenant_cached(key).requests_today == 0
+
+
+def test_erase_invalidates(service, key):
+    service.erase_tenant(key)
+    assert service.get_tenant_cached(key) is None
+
+
+def test_create_drops_stale_negative_entry(service, monkeypatch):
+    monkeypatch.setattr(tenant_module, "_generate_key", lambda prefix="cr_live_": "cr_live_fixed")
+    assert service.get_tenant_cached("cr_live_fixed") is None
+    service.create_tenant("New", "new@acme.test")
+    assert service.get_tenant_cached("cr_live_fixed").email == "new@acme.test"
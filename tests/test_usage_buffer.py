@@ -0,0 +1,103 @@
+import pytest
+
+from app.services import db, usage_buffer
+from app.services.tenant import TenantService
+from app.services.usage_buffer import UsageBuffer
+
+
+@pytest.fixture
+def tenants(db_path):
+    service = TenantService(db_path)
+    return [service.create_tenant(f"T{i}", f"t{i}@example.com").api_key for i in range(3)]
+
+
+@pytest.fixture
+def buffer(db_path):
+    # Long interval, large batch: nothing flushes unless the test asks
+    buf = UsageBuffer(db_path, flush_interval_ms=60_000, flush_max_events=10_000, max_pending=100)
+    yield buf
+    buf.stop()
+
+
+def _counters(db_path: str, api_key: str) -> tuple:
+    row = db.get_conn(db_path).execute(
+        "SELECT requests_today, requests_total FROM tenants WHERE api_key = ?", (api_key,)
+    ).fetchone()
+    return tuple(row)
+
+
+def _logged(db_path: str) -> int:
+    return db.get_conn(db_path).execute("SELECT COUNT(*) FROM usage_log").fetchone()[0]
+
+
+def test_flush_writes_rows_and_coalesced_counters(db_path, tenants, buffer):
+    a, b, _ = tenants
+    for _ in range(3):
+        buffer.add(a, "/push", "example.com", 200)
+    buffer.add(b, "/ingest", None, 202)
+
+    assert _logged(db_path) == 0
+    assert buffer.flush() == 4
+    assert _logged(db_path) == 4
+    assert _counters(db_path, a) == (3, 3) and _counters(db_path, b) == (1, 1)
+    assert buffer.stats()["pending"] == 0 and buffer.flush() == 0
+
+
+def test_failed_flush_is_requeued_and_retried(db_path, tenants, buffer, monkeypatch):
+    a, b, _ = tenants
+    buffer.add(a, "/push", "example.com", 200)
+    buffer.add(a, "/push", "example.com", 200)
+
+    real_get_conn = usage_buffer.get_conn
+
+    def failing_get_conn(path):
+        buffer.add(b, "/push", "other.com", 200)     # recorded while the write is in flight
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(usage_buffer, "get_conn", failing_get_conn)
+    assert buffer.flush() == 0
+    assert buffer.flush_failures == 1 and buffer.stats()["pending"] == 3
+
+    monkeypatch.setattr(usage_buffer, "get_conn", real_get_conn)
+    assert buffer.flush() == 3
+    assert _counters(db_path, a) == (2, 2) and _counters(db_path, b) == (1, 1)
+
+
+def test_requeue_overflow_trims_rows_and_counters(db_path, tenants, monkeypatch):
+    a, b, c = tenants
+    buf = UsageBuffer(db_path, flush_interval_ms=60_000, flush_max_events=10_000, max_pending=3)
+    try:
+        buf.add(a, "/push", None, 200)
+        buf.add(a, "/push", None, 200)
+        buf.add(b, "/push", None, 200)
+
+        def failing_get_conn(path):
+            buf.add(c, "/push", None, 200)
+            buf.add(c, "/push", None, 200)
+            raise RuntimeError("disk I/O error")
+
+        monkeypatch.setattr(usage_buffer, "get_conn", failing_get_conn)
+        buf.flush()
+
+        # Room for one of the failed batch: the newest (b) is kept, both of a's go
+        assert buf.events_dropped == 2
+        assert {key: n for key, (n, _) in buf._counters.items()} == {b: 1, c: 2}
+        assert buf.stats()["pending"] == 3
+    finally:
+        monkeypatch.undo()
+        buf.stop()
+    assert _counters(db_path, a) == (0, 0)
+    assert _counters(db_path, b) == (1, 1) and _counters(db_path, c) == (2, 2)
+
+
+def test_stop_all_drains_every_buffer(db_path, tenants):
+    a, _, _ = tenants
+    buf = usage_buffer.get_usage_buffer(db_path)
+    for _ in range(5):
+        buf.add(a, "/push", "example.com", 200)
+
+    usage_buffer.stop_all()
+
+    assert _logged(db_path) == 5 and _counters(db_path, a) == (5, 5)
+    assert usage_buffer.all_stats() == {}
+    assert not buf._thread.is_alive()